@@ -0,0 +1,124 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # 不需要螢幕,必須在匯入 pyplot 之前設定
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import create_pie_chart as chart
+from record_columns import RecordColumns
+from storage import open_store
+
+FORMATS = ('png', 'svg', 'pdf')
+ALL_MONTHS = 'all'  # 「全部月份」總表的檔名
+
+
+def collect_jobs(store, first=None, last=None, include_all=False):
+    """讀取一次記帳資料,整理出每個月份的繪圖資料
+
+    每個工作只包含該月份的類別總額,以及金額最高的類別的記錄(詳細資料區用),
+    子程序不需要再讀取記帳檔。
+    """
+    store.load_cache()
+    store.refresh()
+    store.save_cache()
+    _, _, months = store.query(None)
+    selected = [m for m in sorted(months)
+                if (not first or m >= first) and (not last or m <= last)]
+    if include_all:
+        selected.append(None)
+
+    jobs = []
+    for month in selected:
+        categories, records, _ = store.query(month)
+        top = max(categories, key=categories.get) if categories else None
+        jobs.append({
+            'month': month,
+            'categories': dict(categories),
+            'top': top,
+            'records': records[top].compact() if top else RecordColumns(),
+        })
+    return jobs
+
+
+def draw_report(job, dpi=100):
+    """以圖表視窗的配置畫出一份報表(圓餅圖與詳細資料區),回傳 Figure
+
+    job 的 month 也可以是 (區間代號, 起日, 迄日);可另外指定 hint(標題提示)
+    與 offset(詳細資料從第幾筆開始)。
+    """
+    fig = Figure(figsize=chart.FIGURE_SIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(chart.BG_COLOR)
+
+    ax_pie = fig.add_axes(chart.PIE_RECT)
+    ax_pie.set_facecolor(chart.CARD_BG)
+    pie = chart.PieRenderer(ax_pie)
+    detail = chart.DetailPanel(fig.add_axes(chart.DETAIL_RECT))
+
+    month = job['month']
+    categories = job['categories']
+    if categories:
+        pie.draw(list(categories), list(categories.values()))
+        chart.set_pie_title(ax_pie, month, sum(categories.values()), job.get('hint', ''))
+        detail.show(job['top'], job['records'], month)
+        if job.get('offset'):
+            detail.scroll(job['offset'])
+    else:
+        pie.show_message("尚無消費記錄")
+    return fig
+
+
+def render_month(job, out_dir, fmt, dpi=100):
+    """在子程序中繪製一個月份的報表,回傳輸出檔案路徑"""
+    fig = draw_report(job, dpi)
+    month = job['month']
+    path = os.path.join(out_dir, f"{month or ALL_MONTHS}.{fmt}")
+    fig.savefig(path, facecolor=fig.get_facecolor())
+    return path
+
+
+def render_reports(jobs, out_dir, fmt='png', workers=None, dpi=100):
+    """把各月份分配給多個程序繪製,依完成順序產生輸出檔案路徑"""
+    os.makedirs(out_dir, exist_ok=True)
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield render_month(job, out_dir, fmt, dpi)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_month, job, out_dir, fmt, dpi) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批次產生每月消費報表(不需要螢幕)")
+    parser.add_argument('--from', dest='first', metavar='YYYY-MM', help="起始月份(含)")
+    parser.add_argument('--to', dest='last', metavar='YYYY-MM', help="結束月份(含)")
+    parser.add_argument('--all', action='store_true', help="另外產生全部月份的總表")
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--out', default='reports', help="輸出資料夾(預設 reports)")
+    parser.add_argument('--workers', type=int, default=None, help="程序數(預設為 CPU 數)")
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--store', default=None,
+                        help="儲存方式,例如 csv:expenses.csv(預設讀取環境變數 EXPENSE_STORE)")
+    parser.add_argument('--engine', choices=['python', 'numpy'], default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = open_store(args.store, args.engine)
+    try:
+        jobs = collect_jobs(store, args.first, args.last, args.all)
+    finally:
+        store.close()
+    if not jobs:
+        raise SystemExit("❌ 指定範圍內沒有消費記錄")
+
+    for path in render_reports(jobs, args.out, args.format, args.workers, args.dpi):
+        print(f"  ✓ {path}")
+    print(f"✅ 已產生 {len(jobs)} 份報表,耗時 {time.perf_counter() - started:.1f} 秒")
@@ -0,0 +1,300 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import warnings
+from datetime import date as Date
+
+import matplotlib
+matplotlib.use('Agg')  # 圖表情境在背景繪製,不開視窗
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import create_pie_chart as chart
+from columnar_ledger import csv_to_columnar
+from date_range import RANGE_PRESETS, preset_range
+from expense_data import CATEGORIES
+from storage import CSV_HEADER, STORE_TYPES, migrate_csv_to_sqlite, open_store
+
+# 缺字型時每次重繪都會發出警告,會干擾計時
+warnings.filterwarnings('ignore', message=r'Glyph \d+')
+
+CACHE_DIR = 'bench_data'
+DEFAULT_ROWS = 100000
+DEFAULT_REPEAT = 5
+REGRESSION_RATIO = 1.2  # 比基準慢超過 20% 視為退步
+DATA_END = Date(2024, 12, 31)  # 測試資料的最後一天(日期區間情境以此為「今天」)
+SEARCH_TERMS = ['計程車', '午餐', 'netflix', '3c', '便利商']  # 備註搜尋情境的查詢
+
+# 各類別(與輸入視窗相同)的出現比例、金額範圍與常見備註
+CATEGORY_PROFILES = {
+    '食物': (40, (40, 600), ['早餐', '午餐', '晚餐', '咖啡', '便利商店', '手搖飲', '聚餐', '']),
+    '交通': (18, (20, 1500), ['捷運', '公車', '計程車', '高鐵', '加油', '停車費', '']),
+    '娛樂': (10, (100, 3000), ['電影', 'KTV', '遊戲', 'Netflix', '演唱會', '']),
+    '購物': (14, (100, 8000), ['衣服', '網購', '日用品', '3C 配件', '書', '']),
+    '居住': (6, (500, 25000), ['房租', '水費', '電費', '瓦斯', '網路費', '管理費']),
+    '醫療': (4, (100, 3000), ['看診', '藥局', '牙醫', '健檢', '']),
+    '其他': (8, (50, 5000), ['禮物', '捐款', '雜支', '紅包', '']),
+}
+
+
+# === 測試資料 ===
+
+def generate_ledger(path, rows, seed=0, months=24, end_month='2024-12'):
+    """產生固定亂數種子的記帳檔(逐批寫入,千萬筆也不會佔用大量記憶體)
+
+    日期分布在 end_month 往前 months 個月內,約 1% 的資料沒有日期;
+    記錄編號為資料列序號。
+    """
+    rng = random.Random(seed)
+    year, month = (int(part) for part in end_month.split('-'))
+    last = year * 12 + month - 1  # 月份編號
+    first = last - (months - 1)
+    first_day = Date(first // 12, first % 12 + 1, 1).toordinal()
+    last_day = Date((last + 1) // 12, (last + 1) % 12 + 1, 1).toordinal() - 1
+    day_strings = [Date.fromordinal(d).isoformat() for d in range(first_day, last_day + 1)]
+
+    names = CATEGORIES
+    weights = [CATEGORY_PROFILES[name][0] for name in names]
+    with open(path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        remaining = rows
+        record_id = 0
+        while remaining:
+            batch = min(remaining, 50000)
+            picks = rng.choices(names, weights, k=batch)
+            out = []
+            for category in picks:
+                _, (low, high), notes = CATEGORY_PROFILES[category]
+                # 小額消費居多:取兩個亂數的最小值
+                amount = round(low + (high - low) * min(rng.random(), rng.random()))
+                day = rng.choice(day_strings) if rng.random() > 0.01 else ''
+                record_id += 1
+                out.append((day, amount, category, rng.choice(notes), record_id))
+            writer.writerows(out)
+            remaining -= batch
+
+
+def prepare_store(rows, seed, kind):
+    """取得(必要時產生)指定筆數的測試資料,回傳儲存規格字串"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    base = os.path.join(CACHE_DIR, f'ledger-{rows}-{seed}')
+    csv_path = base + '.csv'
+    if not os.path.exists(csv_path):
+        generate_ledger(csv_path, rows, seed)
+    if kind == 'csv':
+        return f'csv:{csv_path}'
+    path = f'{base}.{"db" if kind == "sqlite" else "col"}'
+    if not os.path.exists(path):
+        if kind == 'sqlite':
+            migrate_csv_to_sqlite(csv_path, path)
+        else:
+            csv_to_columnar(csv_path, path)
+    return f'{kind}:{path}'
+
+
+# === 情境 ===
+
+def timed(func, repeat):
+    """執行 repeat 次,回傳每次的毫秒數"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def setup_chart(spec, engine):
+    """在 Agg 後端建立與 run_chart 相同配置的圖表(不開視窗)"""
+    fig = Figure(figsize=chart.FIGURE_SIZE)
+    FigureCanvasAgg(fig)
+    # 同步載入,計時包含讀取與重繪
+    chart.build_chart(fig, open_store(spec, engine), threaded=False)
+    chart.current_month = None
+    chart.current_range = None
+    chart.current_search = ''
+    chart.selected_category = None
+    chart.last_fingerprint = None
+    chart.force_refresh = True
+
+
+def run_scenarios(spec, engine, repeat):
+    """執行所有情境,回傳 {情境: 每輪的毫秒數}
+
+    冷啟動是整次載入的時間,其餘情境都換算成單次操作(一次計時器回呼、
+    一次月份或區間切換、一次類別點選、一筆存檔)的時間。
+    """
+    results = {}
+
+    def cold_load():
+        store = open_store(spec, engine)
+        store.refresh()
+        store.query(None)
+        store.close()
+
+    results['cold_load'] = timed(cold_load, repeat)
+
+    def cached_load():
+        store = open_store(spec, engine)
+        store.load_cache()
+        store.refresh()
+        store.query(None)
+        store.close()
+
+    # 先建立快取檔,計時的是從快取還原的啟動時間
+    warm = open_store(spec, engine)
+    warm.refresh()
+    warm.save_cache()
+    warm.close()
+    results['cached_load'] = timed(cached_load, repeat)
+
+    setup_chart(spec, engine)
+    chart.animate(0)
+    # 資料沒有變動時的計時器/監看回呼:應該只比對指紋就返回
+    results['steady_tick'] = [t / 100 for t in
+                              timed(lambda: [chart.animate(None) for _ in range(100)], repeat)]
+
+    months = chart.available_months[:6]
+
+    def month_switch():
+        for month in months + [None]:
+            chart.current_month = month
+            chart.request_refresh()
+
+    results['month_switch'] = [t / (len(months) + 1) for t in timed(month_switch, repeat)]
+
+    def range_switch():
+        chart.current_month = None
+        for kind, _ in RANGE_PRESETS:
+            chart.current_range = (kind,) + preset_range(kind, DATA_END)
+            chart.request_refresh()
+        chart.current_range = None
+        chart.request_refresh()
+
+    results['range_switch'] = [t / (len(RANGE_PRESETS) + 1) for t in timed(range_switch, repeat)]
+
+    def note_search():
+        for text in SEARCH_TERMS + ['']:
+            chart.on_search(text)
+
+    # 第一次搜尋會建立延遲建立的備註索引(NumPy、欄位式),不列入計時
+    chart.on_search(SEARCH_TERMS[0])
+    chart.on_search('')
+    results['note_search'] = [t / (len(SEARCH_TERMS) + 1) for t in timed(note_search, repeat)]
+
+    categories = list(chart.current_data)
+
+    def category_select():
+        for category in categories:
+            chart.select_category(category)
+
+    results['category_select'] = [t / max(1, len(categories))
+                                  for t in timed(category_select, repeat)]
+    chart.loader.close()
+    chart.store.close()
+
+    kind = spec.partition(':')[0]
+    scratch = tempfile.mkdtemp(prefix='expense-bench-')
+    try:
+        def save(count=200):
+            target = os.path.join(scratch, f'save-{time.perf_counter_ns()}')
+            store = STORE_TYPES[kind](target, engine=engine)
+            for i in range(count):
+                store.append('2024-12-01', str(i + 1), '食物', '午餐')
+            store.close()
+
+        results['save'] = [t / 200 for t in timed(save, repeat)]
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def summarize(results):
+    return {name: {'median_ms': round(statistics.median(times), 4),
+                   'min_ms': round(min(times), 4),
+                   'runs': len(times)}
+            for name, times in results.items()}
+
+
+def compare(current, baseline, ratio=REGRESSION_RATIO):
+    """與基準比較中位數,回傳 (說明列表, 是否有退步)"""
+    lines = []
+    regressed = False
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base['median_ms']:
+            lines.append(f"  {name:16s} {result['median_ms']:10.3f} ms  (基準無此項目)")
+            continue
+        change = result['median_ms'] / base['median_ms']
+        mark = '✓'
+        if change > ratio:
+            mark = '❌'
+            regressed = True
+        elif change < 1 / ratio:
+            mark = '🚀'
+        lines.append(f"  {mark} {name:16s} {result['median_ms']:10.3f} ms  "
+                     f"基準 {base['median_ms']:10.3f} ms  ({change:.2f}x)")
+    if current['meta'].get('rows') != baseline.get('meta', {}).get('rows'):
+        lines.append("  ⚠️ 資料筆數與基準不同,比較結果僅供參考")
+    return lines, regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="記帳工具效能測試")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help="產生測試用記帳檔")
+    gen.add_argument('path')
+    gen.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--months', type=int, default=24)
+
+    run = sub.add_parser('run', help="執行效能測試")
+    run.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="資料筆數(1000 ~ 10000000)")
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--store', choices=list(STORE_TYPES), default='csv')
+    run.add_argument('--engine', choices=['python', 'numpy'], default='python')
+    run.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    run.add_argument('--output', help="結果 JSON 輸出路徑")
+    run.add_argument('--baseline', help="與此基準 JSON 比較,退步時結束代碼為 1")
+    run.add_argument('--ratio', type=float, default=REGRESSION_RATIO,
+                     help="比基準慢幾倍視為退步(預設 1.2)")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        start = time.perf_counter()
+        generate_ledger(args.path, args.rows, args.seed, args.months)
+        print(f"✅ 已產生 {args.rows:,} 筆記錄到 {args.path}"
+              f"({time.perf_counter() - start:.1f} 秒)")
+        raise SystemExit(0)
+
+    spec = prepare_store(args.rows, args.seed, args.store)
+    report = {
+        'meta': {'rows': args.rows, 'seed': args.seed, 'store': args.store,
+                 'engine': args.engine, 'repeat': args.repeat,
+                 'python': platform.python_version(), 'machine': platform.machine()},
+        'results': summarize(run_scenarios(spec, args.engine, args.repeat)),
+    }
+
+    for name, result in report['results'].items():
+        print(f"  {name:16s} 中位數 {result['median_ms']:10.3f} ms  最快 {result['min_ms']:10.3f} ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            lines, regressed = compare(report, json.load(file), args.ratio)
+        print("與基準比較:")
+        print('\n'.join(lines))
+        if regressed:
+            raise SystemExit(1)
@@ -0,0 +1,267 @@
+import argparse
+import codecs
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime
+
+from columnar_ledger import format_amount
+from expense_data import CATEGORIES, parse_amount
+from storage import open_store
+
+BATCH_SIZE = 5000
+FALLBACK_CATEGORY = '其他'
+
+# 常見帳單欄位名稱(依序比對,不分大小寫)
+COLUMN_ALIASES = {
+    'date': ['Date', '日期', '交易日期', '消費日期', '入帳日期', 'Transaction Date', 'Posting Date'],
+    'amount': ['Amount', '金額', '交易金額', '消費金額', '新臺幣金額', '支出', 'Debit'],
+    'note': ['Note', '備註', '摘要', '說明', '交易說明', '消費明細', '商店名稱',
+             'Description', 'Merchant'],
+    'category': ['Category', '類別'],
+}
+
+# 依備註關鍵字對應類別(依序比對,第一個符合的為準)
+DEFAULT_CATEGORY_RULES = {
+    '食物': ['餐', '食', '飲', '咖啡', '超商', '7-eleven', '全家', '麥當勞', 'starbucks',
+           'mcdonald', 'foodpanda', 'ubereats', 'uber eats'],
+    '交通': ['uber', 'taxi', '計程車', '高鐵', '台鐵', '捷運', '悠遊卡', '加油', '中油', '停車'],
+    '娛樂': ['netflix', 'spotify', 'steam', '電影', '影城', 'ktv'],
+    '購物': ['momo', 'pchome', '蝦皮', 'shopee', 'amazon', 'costco', '好市多', '百貨'],
+    '居住': ['房租', '管理費', '電費', '水費', '瓦斯', '電信'],
+    '醫療': ['醫院', '診所', '藥局'],
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y%m%d', '%m/%d/%Y', '%m/%d/%y')
+
+
+class ImportStats:
+    """匯入統計"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = Counter()  # 原因 -> 筆數
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        lines = [f"讀取 {self.read} 筆,匯入 {self.imported} 筆,"
+                 f"重複略過 {self.duplicates} 筆,錯誤 {sum(self.rejected.values())} 筆",
+                 f"耗時 {self.elapsed:.2f} 秒({self.rows_per_second:,.0f} 筆/秒)"]
+        for reason, count in self.rejected.most_common():
+            lines.append(f"  - {reason}: {count} 筆")
+        return '\n'.join(lines)
+
+
+def detect_encoding(path):
+    """判斷帳單檔的編碼:UTF-8(含 BOM)或台灣銀行常見的 Big5 (cp950)"""
+    with open(path, 'rb') as file:
+        head = file.read(65536)
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # 截斷處可能切在多位元組字元中間,只檢查到最後一個換行
+        head[:head.rfind(b'\n') + 1 or len(head)].decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp950'
+
+
+def open_source(path, encoding=None):
+    """開啟帳單 CSV,回傳 (欄位名稱, 逐列產生 dict 的 generator)"""
+    file = open(path, mode='r', newline='', encoding=encoding or detect_encoding(path))
+    reader = csv.DictReader(file)
+    fieldnames = reader.fieldnames or []
+
+    def rows():
+        with file:
+            yield from reader
+
+    return fieldnames, rows()
+
+
+def resolve_columns(fieldnames, columns=None):
+    """決定各欄位對應的來源欄名;columns 可明確指定,其餘依常見名稱猜測"""
+    columns = dict(columns or {})
+    lowered = {name.strip().lower(): name for name in fieldnames if name}
+    for key, aliases in COLUMN_ALIASES.items():
+        if columns.get(key):
+            continue
+        for alias in aliases:
+            if alias.lower() in lowered:
+                columns[key] = lowered[alias.lower()]
+                break
+    missing = [key for key in ('date', 'amount') if not columns.get(key)]
+    if missing:
+        raise ValueError(f"找不到必要欄位: {', '.join(missing)}(現有欄位: {', '.join(fieldnames)})")
+    return columns
+
+
+def normalize_date(text):
+    """各種帳單日期格式轉成 YYYY-MM-DD
+
+    接受三位數的民國年(例如 113/01/05);開頭兩位數的 01/05/24 視為 MM/DD/YY。
+    """
+    text = (text or '').strip()
+    parts = text.replace('.', '/').replace('-', '/').split('/')
+    # 只有三位數才當作民國年,兩位數開頭無法和 MM/DD/YY 區分
+    if len(parts) == 3 and len(parts[0]) == 3 and parts[0].isdigit():
+        parts[0] = str(int(parts[0]) + 1911)
+        text = '/'.join(parts)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError("日期格式無法辨識")
+
+
+# === 匯入流程(每一步都是 generator,整份檔案不會同時存在記憶體中) ===
+
+def map_columns(rows, columns, stats):
+    """來源欄位 → (日期, 金額, 類別, 備註) 原始文字"""
+    for row in rows:
+        stats.read += 1
+        yield (row.get(columns['date']), row.get(columns['amount']),
+               row.get(columns['category']) if columns.get('category') else None,
+               (row.get(columns['note']) or '').strip() if columns.get('note') else '')
+
+
+def validate(rows, stats):
+    """與輸入視窗相同的驗證規則;不合格的記錄計入 stats.rejected"""
+    for date_text, amount_text, category, note in rows:
+        try:
+            date = normalize_date(date_text)
+            # 帳單常見的千分位與貨幣符號先去掉
+            amount = parse_amount((amount_text or '').replace(',', '').replace('NT$', '')
+                                  .replace('$', ''))
+        except ValueError as e:
+            stats.rejected[str(e)] += 1
+            continue
+        yield date, amount, category, note
+
+
+def map_categories(rows, rules=None):
+    """決定類別:來源已有合法類別就沿用,否則依備註關鍵字對應"""
+    rules = DEFAULT_CATEGORY_RULES if rules is None else rules
+    lowered_rules = [(cat, [k.lower() for k in keywords]) for cat, keywords in rules.items()]
+    for date, amount, category, note in rows:
+        category = (category or '').split()[-1] if (category or '').strip() else ''
+        if category not in CATEGORIES:
+            text = note.lower()
+            category = next((cat for cat, keywords in lowered_rules
+                             if any(k in text for k in keywords)), FALLBACK_CATEGORY)
+        yield date, amount, category, note
+
+
+def record_key(date, amount, category, note):
+    return (date, round(float(amount), 2), category, note or '')
+
+
+def existing_keys(store):
+    """記帳檔中已有的記錄(可重複,因此用 Counter 計數)"""
+    store.refresh()
+    _, records, _ = store.query(None)
+    keys = Counter()
+    for category, category_records in records.items():
+        for date, amount, note in category_records.rows():
+            keys[record_key(date, amount, category, note)] += 1
+    return keys
+
+
+def drop_duplicates(rows, existing, stats):
+    """略過已存在的記錄
+
+    同一天同金額的消費可能真的有兩筆,所以每筆既有記錄只抵銷一筆匯入資料;
+    重複匯入同一份帳單時會全部略過,新帳單中的相同消費則會保留。
+    """
+    for row in rows:
+        key = record_key(*row)
+        if existing[key] > 0:
+            existing[key] -= 1
+            stats.duplicates += 1
+            continue
+        yield row
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_statement(path, store, columns=None, rules=None, encoding=None,
+                     batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """把帳單 CSV 匯入記帳資料,回傳 ImportStats
+
+    progress(stats) 會在每批寫入後呼叫,可用來更新畫面。
+    """
+    stats = ImportStats()
+    fieldnames, source = open_source(path, encoding)
+    columns = resolve_columns(fieldnames, columns)
+
+    rows = map_columns(source, columns, stats)
+    rows = validate(rows, stats)
+    rows = map_categories(rows, rules)
+    rows = drop_duplicates(rows, existing_keys(store), stats)
+
+    for batch in batched(rows, batch_size):
+        if not dry_run:
+            store.append_many([(date, format_amount(amount), category, note)
+                               for date, amount, category, note in batch])
+        stats.imported += len(batch)
+        stats.elapsed = time.perf_counter() - stats.started
+        if progress:
+            progress(stats)
+
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="匯入銀行/信用卡帳單 CSV")
+    parser.add_argument('files', nargs='+', help="帳單 CSV 檔")
+    parser.add_argument('--store', default=None,
+                        help="匯入目的地,例如 csv:expenses.csv(預設讀取環境變數 EXPENSE_STORE)")
+    parser.add_argument('--encoding', default=None, help="帳單編碼(預設自動判斷 UTF-8 / Big5)")
+    parser.add_argument('--date-col', help="日期欄名稱")
+    parser.add_argument('--amount-col', help="金額欄名稱")
+    parser.add_argument('--note-col', help="備註欄名稱")
+    parser.add_argument('--category-col', help="類別欄名稱")
+    parser.add_argument('--category-map', help="類別關鍵字對應 JSON 檔,格式 {類別: [關鍵字, ...]}")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="只檢查,不寫入")
+    args = parser.parse_args()
+
+    columns = {'date': args.date_col, 'amount': args.amount_col,
+               'note': args.note_col, 'category': args.category_col}
+    rules = None
+    if args.category_map:
+        with open(args.category_map, encoding='utf-8') as file:
+            rules = json.load(file)
+
+    store = open_store(args.store)
+    try:
+        for path in args.files:
+            try:
+                stats = import_statement(path, store, columns, rules, args.encoding,
+                                         args.batch_size, args.dry_run)
+            except (OSError, ValueError, csv.Error) as e:
+                print(f"❌ {path}: {e}")
+                continue
+            print(f"{'🔍' if args.dry_run else '✅'} {path}")
+            print(stats.summary())
+    finally:
+        store.close()
@@ -0,0 +1,187 @@
+import threading
+import time
+import traceback
+from collections import Counter
+
+CACHE_SAVE_BYTES = 4 * 1024 * 1024  # 第一次載入解析超過這個大小時立即寫入快取
+STOP_TIMEOUT = 2.0
+
+
+def freeze_records(records, category):
+    """把 store.query() 的類別記錄轉成介面執行緒可以安全使用的形式
+
+    記憶體中的記錄改成固定長度的唯讀檢視(不複製);延遲查詢的記錄(SQLite、
+    欄位式、NumPy)不能在介面執行緒中查詢,只在背景執行緒取出目前選取的類別。
+    """
+    if isinstance(records, dict):
+        return {cat: columns.frozen() for cat, columns in records.items()}
+    if category in records:
+        return {category: records[category].frozen()}
+    return {}
+
+
+def query_view(store, view, search=''):
+    """依 view(月份 YYYY-MM、None 或 (起日, 迄日))與搜尋文字查詢,回傳 (類別總額, 類別記錄, 月份列表)"""
+    if search.strip():
+        return store.search(search, view)
+    if isinstance(view, tuple):
+        return store.query_range(*view)
+    return store.query(view)
+
+
+class Snapshot:
+    """一次載入的結果,建立後不再修改"""
+
+    def __init__(self, generation, view, search, data, records, months, timings, scan_stats):
+        self.generation = generation
+        self.view = view
+        self.search = search          # 備註搜尋文字,沒有搜尋時為 ''
+        self.data = data
+        self.records = records
+        self.months = months
+        self.timings = timings        # 階段 -> 毫秒
+        self.scan_stats = scan_stats  # (累計解析列數, 略過原因 -> 筆數)
+
+
+class SnapshotLoader:
+    """在背景執行緒讀取記帳資料,完成後發布快照給介面執行緒
+
+    store 交給載入器後只在它的執行緒中使用。介面執行緒以 request() 要求載入,
+    以 take() 取得最新完成的快照;新的要求會讓還沒完成的舊要求作廢,
+    切換月份時不會先畫出上一個月份。修改、刪除記錄也以 submit() 交給這個執行緒寫入。
+    threaded=False 時直接在呼叫 request() 的執行緒載入(效能測試用)。
+    """
+
+    def __init__(self, store, threaded=True):
+        self.store = store
+        self.threaded = threaded
+        self.generation = 0
+        self._cond = threading.Condition()
+        self._request = None   # (代數, 月份或日期區間, 選取的類別, 搜尋文字)
+        self._pushed = []
+        self._writes = []      # (store 方法名稱, 參數),在下一次載入前執行
+        self._latest = None
+        self._busy = False
+        self._closed = False
+        self._started = False  # 是否已經從快取還原過
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name='chart-loader', daemon=True)
+            self._thread.start()
+
+    def request(self, view, category, search=''):
+        """要求載入 view 的資料(取代還沒完成的要求)
+
+        view 為月份 YYYY-MM、None(全部)或 (起日, 迄日);
+        search 不是空白時只載入備註符合的記錄。
+        """
+        with self._cond:
+            self.generation += 1
+            self._request = (self.generation, view, category, search)
+            self._cond.notify()
+        if not self.threaded:
+            self._load_pending()
+
+    def push(self, message):
+        """輸入視窗推送的記錄,在下一次載入前套用"""
+        with self._cond:
+            self._pushed.append(message)
+
+    def submit(self, name, *args):
+        """在背景執行緒執行 store.<name>(*args)(修改、刪除記錄),於下一次載入前寫入
+
+        寫入後被取代的資料列比例過高時順便壓縮記帳檔。
+        """
+        with self._cond:
+            self._writes.append((name, args))
+
+    def take(self):
+        """取出最新完成且仍有效的快照,沒有時回傳 None"""
+        with self._cond:
+            snapshot, self._latest = self._latest, None
+            if snapshot is None or snapshot.generation != self.generation:
+                return None
+            return snapshot
+
+    def pending(self):
+        """是否還有要求在排隊、載入中或還沒取走的快照"""
+        with self._cond:
+            return self._request is not None or self._busy or self._latest is not None
+
+    def _current(self, generation):
+        with self._cond:
+            return generation == self.generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            self._load_pending()
+
+    def _load_pending(self):
+        with self._cond:
+            request, self._request = self._request, None
+            pushed, self._pushed = self._pushed, []
+            if request is None:
+                return
+            writes, self._writes = self._writes, []
+            self._busy = True
+        try:
+            snapshot = self._load(*request, pushed, writes)
+        except Exception:
+            # 讀取失敗時保留上一個畫面,下一次要求再試
+            traceback.print_exc()
+            snapshot = None
+        with self._cond:
+            self._busy = False
+            if snapshot is not None:
+                self._latest = snapshot
+
+    def _load(self, generation, view, category, search, pushed, writes=()):
+        store = self.store
+        start = time.perf_counter()
+        if not self._started:
+            self._started = True
+            store.load_cache()
+            if store.pending_bytes() >= CACHE_SAVE_BYTES:
+                store.refresh()
+                store.save_cache()
+        for name, args in writes:
+            try:
+                pushed.append(getattr(store, name)(*args))
+            except (OSError, ValueError):
+                traceback.print_exc()
+        for message in pushed:
+            store.apply_pushed(message)
+        store.refresh()
+        if writes and store.maybe_compact():
+            store.refresh()
+        parsed = time.perf_counter()
+        # 已有新的要求:解析結果留在 store 中,下一次要求直接沿用
+        if not self._current(generation):
+            return None
+
+        data, records, months = query_view(store, view, search)
+        records = freeze_records(records, category)
+        scanned, rejected = store.scan_stats()
+        done = time.perf_counter()
+        if not self._current(generation):
+            return None
+        timings = {'parse': (parsed - start) * 1000, 'aggregate': (done - parsed) * 1000}
+        return Snapshot(generation, view, search, data, records, months, timings,
+                        (scanned, Counter(rejected)))
+
+    def close(self):
+        """停止背景執行緒並寫入快取(逾時仍在載入時略過寫入)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(STOP_TIMEOUT)
+            if self._thread.is_alive():
+                return
+        if self._started:
+            self.store.save_cache()
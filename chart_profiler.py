@@ -0,0 +1,175 @@
+import cProfile
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# 開啟效能監看的環境變數(也可以用 create_pie_chart.py 的命令列參數)
+PROFILE_ENV = 'EXPENSE_PROFILE'              # 設為 1 顯示效能資訊
+PROFILE_LOG_ENV = 'EXPENSE_PROFILE_LOG'      # 每次更新寫一行 JSON 到此檔案
+PROFILE_FRAMES_ENV = 'EXPENSE_PROFILE_FRAMES'  # 以 cProfile 記錄前 N 次更新
+PROFILE_DUMP = 'chart.prof'
+
+
+class TickProfiler:
+    """圖表更新的效能監看
+
+    每次套用新的快照時記錄解析、彙總(在背景載入執行緒中)與更新圖形各花多少時間,
+    解析了幾列、略過幾列(依原因分類);畫面實際重繪的時間另外記錄。
+    結果顯示在圖表左下角,也可以同時寫到 JSON lines 記錄檔。
+    """
+
+    def __init__(self, log_path=None, profile_frames=0, profile_path=PROFILE_DUMP):
+        self.log = open(log_path, 'a', encoding='utf-8') if log_path else None
+        self.profile_path = profile_path
+        self.tick = None
+        self.ticks = 0
+        self.skipped = 0       # 資料沒有變動而略過的次數
+        self.last_draw_ms = None
+        self.last_tick = {}
+        self._scanned = 0
+        self._rejected = Counter()
+        self.hud = None
+        self._profile = None
+        self._profile_left = 0
+        if profile_frames:
+            self.capture(profile_frames)
+
+    @classmethod
+    def from_options(cls, enabled=False, log_path=None, profile_frames=None):
+        """依命令列參數建立,未指定的部分讀取環境變數;都沒開啟時回傳 None"""
+        log_path = log_path or os.environ.get(PROFILE_LOG_ENV)
+        if profile_frames is None:
+            profile_frames = int(os.environ.get(PROFILE_FRAMES_ENV) or 0)
+        enabled = enabled or os.environ.get(PROFILE_ENV) not in (None, '', '0')
+        if not (enabled or log_path or profile_frames):
+            return None
+        return cls(log_path, profile_frames)
+
+    # === 掛到圖表上 ===
+
+    def attach(self, fig):
+        """在圖表左下角建立資訊文字,並記錄每次實際重繪的時間"""
+        self.hud = fig.text(0.005, 0.005, "效能監看中…", ha='left', va='bottom',
+                            fontsize=8, family='monospace', color='#7f8c8d',
+                            bbox=dict(boxstyle='round,pad=0.4', facecolor='white',
+                                      edgecolor='#ddd', alpha=0.85))
+        canvas = fig.canvas
+        draw = canvas.draw
+
+        def timed_draw(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return draw(*args, **kwargs)
+            finally:
+                self.last_draw_ms = (time.perf_counter() - start) * 1000
+                self._write({'event': 'draw', 'time': time.time(),
+                             'draw_ms': round(self.last_draw_ms, 3)})
+                self._finish_capture()
+
+        canvas.draw = timed_draw
+
+    # === 每次更新 ===
+
+    def skip(self):
+        self.skipped += 1
+
+    def begin(self):
+        self.tick = {'event': 'tick', 'time': time.time(), 'tick': self.ticks + 1}
+        if self._profile is not None and self._profile_left:
+            self._profile.enable()
+
+    def add_phases(self, timings):
+        """加入在其他執行緒量好的階段耗時(階段 -> 毫秒)"""
+        if self.tick is not None:
+            for name, ms in timings.items():
+                self.tick[f'{name}_ms'] = round(ms, 3)
+
+    @contextmanager
+    def phase(self, name):
+        """記錄一個階段的耗時(毫秒)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.tick is not None:
+                self.tick[f'{name}_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    def end(self, scan_stats):
+        """結束這次更新:計算解析列數與略過原因,更新畫面上的資訊
+
+        scan_stats 為 store.scan_stats() 的結果(累計解析列數, 略過原因 -> 筆數)。
+        """
+        if self.tick is None:
+            return
+        tick, self.tick = self.tick, None
+        self.ticks += 1
+
+        scanned, rejected = scan_stats
+        # 檔案被改寫時讀取器會從頭計算
+        tick['rows_scanned'] = scanned - self._scanned if scanned >= self._scanned else scanned
+        new_rejects = rejected - self._rejected if scanned >= self._scanned else Counter(rejected)
+        tick['rows_rejected'] = sum(new_rejects.values())
+        if new_rejects:
+            tick['reject_reasons'] = dict(new_rejects)
+        self._scanned = scanned
+        self._rejected = Counter(rejected)
+        tick['skipped_before'] = self.skipped
+        self.skipped = 0
+
+        self.last_tick = tick
+        self._write(tick)
+        if self._profile_left:
+            # 維持開啟到下一次重繪結束,重繪的耗時也一起記錄
+            self._profile_left -= 1
+        self._update_hud()
+
+    def _update_hud(self):
+        if self.hud is None:
+            return
+        tick = self.last_tick
+        draw = f"{self.last_draw_ms:.1f}ms" if self.last_draw_ms is not None else "-"
+        lines = [f"#{self.ticks}  解析 {tick.get('parse_ms', 0):.1f}ms ({tick['rows_scanned']} 列)"
+                 f"  彙總 {tick.get('aggregate_ms', 0):.1f}ms"
+                 f"  更新 {tick.get('update_ms', 0):.1f}ms  上次重繪 {draw}"
+                 f"  略過 {tick['skipped_before']} 次"]
+        if self._rejected:
+            reasons = ', '.join(f"{reason}×{count}"
+                                for reason, count in self._rejected.most_common(3))
+            lines.append(f"格式錯誤 {sum(self._rejected.values())} 列: {reasons}")
+        if self._profile is not None:
+            lines.append(f"cProfile 記錄中(剩 {self._profile_left} 次更新)")
+        self.hud.set_text('\n'.join(lines))
+
+    # === cProfile ===
+
+    def capture(self, frames):
+        """以 cProfile 記錄接下來 frames 次更新(含其後的重繪),完成後寫到 profile_path"""
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+        self._profile_left = frames
+
+    def _finish_capture(self):
+        if self._profile is None:
+            return
+        if self._profile_left:
+            return
+        self._profile.disable()
+        self._profile.dump_stats(self.profile_path)
+        print(f"📊 cProfile 結果已寫入 {self.profile_path}"
+              f"(python -m pstats {self.profile_path})")
+        self._profile = None
+
+    def _write(self, record):
+        if self.log:
+            self.log.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.log.flush()
+
+    def close(self):
+        if self._profile is not None:
+            self._profile_left = 0
+            self._finish_capture()
+        if self.log:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,273 @@
+import argparse
+import array
+import csv
+import mmap
+import os
+from datetime import date as Date
+from functools import lru_cache
+
+from expense_data import PARSE_ERRORS, day_number, parse_row
+from ledger_compact import live_rows
+
+# === 欄位檔案 ===
+# 每個欄位一個固定寬度的陣列檔(機器原生位元組順序),只會附加不會改寫:
+#   date.i32      日期的日序號(date.toordinal(),0 代表沒有日期)
+#   amount.i64    金額,以「分」為單位的整數
+#   category.u8   類別代碼,對應 categories.txt 的行號
+#   note_end.u64  備註在 notes.heap 中的結束位置(開始位置 = 上一筆的結束位置)
+#   notes.heap    所有備註的 UTF-8 位元組串接
+# 寫入時 date.i32 最後寫,因此它的長度就是已完整寫入的筆數。
+COLUMNS = {
+    'date': ('date.i32', 'i'),
+    'amount': ('amount.i64', 'q'),
+    'category': ('category.u8', 'B'),
+    'note_end': ('note_end.u64', 'Q'),
+}
+HEAP_FILE = 'notes.heap'
+CATEGORY_FILE = 'categories.txt'
+MAX_CATEGORIES = 256
+BATCH_ROWS = 65536  # 大量寫入時每批的筆數
+
+
+@lru_cache(maxsize=8192)
+def day_to_date(day):
+    """日序號轉回 YYYY-MM-DD 字串(0 代表沒有日期)"""
+    return Date.fromordinal(day).isoformat() if day else ''
+
+
+@lru_cache(maxsize=8192)
+def day_to_month(day):
+    """日序號轉成月份 YYYY-MM(0 代表沒有日期)"""
+    return day_to_date(day)[:7] if day else None
+
+
+def _itemsize(typecode):
+    return array.array(typecode).itemsize
+
+
+def format_amount(amount):
+    """金額轉成 CSV 文字(整數不帶小數點)"""
+    return f'{amount:.2f}'.rstrip('0').rstrip('.')
+
+
+class ColumnarLedger:
+    """欄位式、只附加的二進位記帳檔
+
+    讀取時以 mmap 對應各欄位檔,直接在固定寬度陣列上彙總,
+    不需要逐列解析文字或建立 dict。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.categories = []
+        self.category_codes = {}
+        self._maps = []
+        self._exports = []
+        self.views = {}
+        self.count = 0
+        self._load_categories()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_categories(self):
+        try:
+            with open(self._file(CATEGORY_FILE), encoding='utf-8') as file:
+                self.categories = file.read().splitlines()
+        except FileNotFoundError:
+            self.categories = []
+        self.category_codes = {name: code for code, name in enumerate(self.categories)}
+
+    def committed_rows(self):
+        """已完整寫入的筆數"""
+        filename, typecode = COLUMNS['date']
+        try:
+            return os.path.getsize(self._file(filename)) // _itemsize(typecode)
+        except OSError:
+            return 0
+
+    # === 寫入 ===
+
+    def _category_code(self, name):
+        code = self.category_codes.get(name)
+        if code is None:
+            if len(self.categories) >= MAX_CATEGORIES:
+                raise ValueError(f"類別數量超過 {MAX_CATEGORIES} 個")
+            code = len(self.categories)
+            with open(self._file(CATEGORY_FILE), 'a', encoding='utf-8') as file:
+                file.write(name + '\n')
+            self.categories.append(name)
+            self.category_codes[name] = code
+        return code
+
+    def _repair(self, rows):
+        """截掉上次寫到一半(超過 rows 筆)的欄位資料"""
+        heap_end = 0
+        if rows:
+            with open(self._file(COLUMNS['note_end'][0]), 'rb') as file:
+                file.seek((rows - 1) * _itemsize('Q'))
+                heap_end = memoryview(file.read(_itemsize('Q'))).cast('Q')[0]
+        for filename, typecode in COLUMNS.values():
+            with open(self._file(filename), 'ab') as file:
+                file.truncate(rows * _itemsize(typecode))
+        with open(self._file(HEAP_FILE), 'ab') as file:
+            file.truncate(heap_end)
+        return heap_end
+
+    def append_many(self, rows):
+        """附加多筆 (日期, 金額, 類別, 備註),回傳寫入筆數
+
+        每 BATCH_ROWS 筆寫入一次,大量轉換時不會把整份資料留在記憶體中。
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self._load_categories()
+        heap_end = self._repair(self.committed_rows())
+
+        written = 0
+        columns, heap = self._new_batch()
+        for date_str, amount, category, note in rows:
+            note_bytes = (note or '').encode('utf-8')
+            heap += note_bytes
+            heap_end += len(note_bytes)
+            columns['date'].append(day_number(date_str))
+            columns['amount'].append(round(float(amount) * 100))
+            columns['category'].append(self._category_code(category))
+            columns['note_end'].append(heap_end)
+            if len(columns['date']) >= BATCH_ROWS:
+                written += self._write_batch(columns, heap)
+                columns, heap = self._new_batch()
+        return written + self._write_batch(columns, heap)
+
+    def _new_batch(self):
+        return {name: array.array(typecode) for name, (_, typecode) in COLUMNS.items()}, bytearray()
+
+    def _write_batch(self, columns, heap):
+        """寫出一批資料,回傳筆數"""
+        if not columns['date']:
+            return 0
+        with open(self._file(HEAP_FILE), 'ab') as file:
+            file.write(heap)
+        # date 欄最後寫入,作為這批資料已完整寫入的標記
+        for name in ('amount', 'category', 'note_end', 'date'):
+            filename, _ = COLUMNS[name]
+            with open(self._file(filename), 'ab') as file:
+                file.write(columns[name].tobytes())
+        return len(columns['date'])
+
+    def append(self, date_str, amount, category, note):
+        """附加一筆記錄"""
+        return self.append_many([(date_str, amount, category, note)])
+
+    # === 讀取 ===
+
+    def close(self):
+        """釋放所有 mmap"""
+        for view in reversed(self._exports):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+        self._exports = []
+        self.views = {}
+        self.count = 0
+
+    def refresh(self):
+        """重新對應檔案(有新資料時),回傳筆數是否改變"""
+        rows = self.committed_rows()
+        if rows == self.count and self.views:
+            return False
+        self.close()
+        self._load_categories()
+        if rows == 0:
+            return True
+
+        for name, (filename, typecode) in COLUMNS.items():
+            view = self._map(filename)[:rows * _itemsize(typecode)]
+            self._exports.append(view)
+            self.views[name] = view.cast(typecode)
+            self._exports.append(self.views[name])
+        self.views['heap'] = self._map(HEAP_FILE)
+        self.count = rows
+        return True
+
+    def _map(self, filename):
+        """以唯讀 mmap 對應一個欄位檔,回傳 memoryview"""
+        with open(self._file(filename), 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return memoryview(b'')
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped)
+        self._exports.append(view)
+        return view
+
+    def note(self, index):
+        """第 index 筆的備註"""
+        ends = self.views['note_end']
+        start = ends[index - 1] if index else 0
+        return bytes(self.views['heap'][start:ends[index]]).decode('utf-8', errors='replace')
+
+    def record(self, index):
+        """第 index 筆記錄的 (日期, 金額, 備註)"""
+        return (day_to_date(self.views['date'][index]),
+                self.views['amount'][index] / 100,
+                self.note(index))
+
+    def rows(self):
+        """逐筆產生 (日期, 金額, 類別, 備註)"""
+        for i in range(self.count):
+            date, amount, note = self.record(i)
+            yield date, amount, self.categories[self.views['category'][i]], note
+
+
+def csv_to_columnar(csv_path, col_path):
+    """把 CSV 記帳檔轉成欄位式格式,回傳 (寫入筆數, 略過筆數)"""
+    skipped = 0
+
+    def rows():
+        nonlocal skipped
+        # 只轉換有效的記錄(已套用修改與刪除)
+        for _, row in live_rows(csv_path):
+            try:
+                cat, _, date, amount, note = parse_row(row)
+            except PARSE_ERRORS:
+                skipped += 1
+                continue
+            yield date, amount, cat, note
+
+    written = ColumnarLedger(col_path).append_many(rows())
+    return written, skipped
+
+
+def columnar_to_csv(col_path, csv_path):
+    """把欄位式格式轉回 CSV,回傳寫入筆數"""
+    ledger = ColumnarLedger(col_path)
+    ledger.refresh()
+    try:
+        with open(csv_path, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Date', 'Amount', 'Category', 'Note'])
+            for date_str, amount, category, note in ledger.rows():
+                writer.writerow([date_str, format_amount(amount), category, note])
+        return ledger.count
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="欄位式記帳檔轉換工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_col = sub.add_parser('import', help="CSV → 欄位式格式")
+    to_col.add_argument('csv_path')
+    to_col.add_argument('col_path')
+    to_csv = sub.add_parser('export', help="欄位式格式 → CSV")
+    to_csv.add_argument('col_path')
+    to_csv.add_argument('csv_path')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        written, skipped = csv_to_columnar(args.csv_path, args.col_path)
+        print(f"✅ 已轉換 {written} 筆記錄(略過 {skipped} 筆格式錯誤的資料)")
+    else:
+        written = columnar_to_csv(args.col_path, args.csv_path)
+        print(f"✅ 已匯出 {written} 筆記錄到 {args.csv_path}")
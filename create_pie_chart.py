@@ -1,12 +1,19 @@
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 from matplotlib.patches import Rectangle
-from matplotlib.widgets import Button
-import csv
-import os
+from matplotlib.widgets import Button, TextBox
+import argparse
+import math
 import platform
-from collections import defaultdict
-from datetime import datetime
+from contextlib import nullcontext
+
+import readiness
+from date_range import RANGE_PRESETS, period_text, preset_range, range_label, shift_range
+from chart_loader import SnapshotLoader
+from chart_profiler import TickProfiler
+from file_watch import FileWatch
+from push_channel import PushListener
+from record_columns import RecordColumns
+from storage import open_store
 
 # --- 字體設定 ---
 system_name = platform.system()
@@ -18,8 +25,6 @@ else:
     plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
-DATA_FILE = 'expenses.csv'
-
 # --- 精緻配色 ---
 COLORS = ['#FF6B9D', '#C44569', '#FFA07A', '#FFD93D', '#6BCF7F', 
           '#4ECDC4', '#5B7FFF', '#A28FDB', '#FF8B94', '#95E1D3']
@@ -28,86 +33,91 @@ CARD_BG = '#ffffff'
 TEXT_COLOR = '#2c3e50'
 ACCENT_COLOR = '#5B7FFF'
 
+# 圓餅圖與詳細資料區的位置(互動視窗與批次報表共用)
+FIGURE_SIZE = (16, 8.5)
+PIE_RECT = [0.05, 0.05, 0.45, 0.84]
+DETAIL_RECT = [0.52, 0.05, 0.45, 0.87]
+
 # === 全域變數 ===
 fig = None
 ax_pie = None
 ax_detail = None
 current_data = {}
-detail_records = defaultdict(list)
+detail_records = {}  # 類別 -> RecordColumns
 selected_category = None
 wedge_info = []
 current_month = None  # None 代表顯示全部
+current_range = None  # (區間代號, 起日, 迄日);選了日期區間時 current_month 為 None
 available_months = []
 btn_prev = None
 btn_next = None
 btn_all = None
 month_text = None
+range_buttons = {}  # 區間代號 -> Button
+current_search = ''  # 備註搜尋文字,空字串代表不搜尋
+search_box = None
+store = None  # 記帳資料來源,run_chart() 時開啟
+last_fingerprint = None
+force_refresh = True
+refresh_timer = None
+file_watch = None
+push_listener = None
+pie_renderer = None
+detail_panel = None
+profiler = None  # 效能監看(--profile 或 EXPENSE_PROFILE=1 時啟用)
+PROFILE_KEY_FRAMES = 30  # 按 F9 以 cProfile 記錄的更新次數
+loader = None  # 背景載入執行緒,store 只在其中使用
+polling = False
+SNAPSHOT_POLL_MS = 30  # 等待背景載入結果時的檢查間隔
 
-def read_data(filter_month=None):
-    """讀取消費資料,可選擇性篩選月份"""
-    categories = {}
-    records = defaultdict(list)
-    all_months = set()
-    
-    if not os.path.isfile(DATA_FILE):
-        return categories, records, []
-    
-    try:
-        with open(DATA_FILE, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                try:
-                    amount = float(row['Amount'])
-                    cat = row['Category'].split()[-1] if ' ' in row['Category'] else row['Category']
-                    date_str = row.get('Date', '')
-                    note = row.get('Note', '')
-                    
-                    # 解析日期
-                    if date_str:
-                        try:
-                            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                            month_key = date_obj.strftime('%Y-%m')
-                            all_months.add(month_key)
-                            
-                            # 如果有篩選月份,只保留該月份的資料
-                            if filter_month and month_key != filter_month:
-                                continue
-                        except:
-                            pass
-                    
-                    categories[cat] = categories.get(cat, 0) + amount
-                    records[cat].append({
-                        'date': date_str,
-                        'amount': amount,
-                        'note': note
-                    })
-                except:
-                    continue
-    except:
-        pass
-    
-    # 排序月份(最新的在前)
-    sorted_months = sorted(list(all_months), reverse=True)
-    
-    return categories, records, sorted_months
+def profiled(phase):
+    """效能監看開啟時記錄一個階段的耗時"""
+    return profiler.phase(phase) if profiler else nullcontext()
+
+def finish_tick(snapshot):
+    if profiler:
+        profiler.end(snapshot.scan_stats)
+
+def current_period():
+    """目前顯示的期間:日期區間、月份(YYYY-MM)或 None(全部)"""
+    return current_range or current_month
 
 def update_month_display():
-    """更新月份顯示文字"""
+    """更新月份顯示文字與區間按鈕的選取狀態"""
     global month_text, current_month
     if month_text:
-        if current_month:
-            # 轉換成中文顯示
-            year, month = current_month.split('-')
-            display_text = f"{year} 年 {int(month)} 月"
-        else:
-            display_text = "全部月份"
-        month_text.set_text(display_text)
+        month_text.set_text(period_text(current_period()))
+        active = current_range[0] if current_range else None
+        for kind, button in range_buttons.items():
+            color = ACCENT_COLOR if kind == active else '#e8eaf0'
+            button.color = color
+            button.ax.set_facecolor(color)
+            button.label.set_color('white' if kind == active else TEXT_COLOR)
         fig.canvas.draw_idle()
 
+def shift_current_range(step):
+    """把目前的日期區間往前或往後移動一個區間長度"""
+    global current_range
+    kind, first, last = current_range
+    current_range = (kind,) + shift_range(kind, first, last, step)
+    update_month_display()
+    request_refresh()
+
+def on_range_preset(kind):
+    """切換到預設的日期區間(近 7 天、近 30 天、本季、今年)"""
+    global current_month, current_range
+    current_month = None
+    current_range = (kind,) + preset_range(kind)
+    update_month_display()
+    request_refresh()
+
 def on_prev_month(event):
-    """切換到上一個月"""
+    """切換到上一個月(選了日期區間時改為上一個區間)"""
     global current_month, available_months
     
+    if current_range:
+        shift_current_range(-1)
+        return
     if not available_months:
         show_no_data_message()
         return
@@ -127,11 +137,15 @@ def on_prev_month(event):
             current_month = available_months[0]
     
     update_month_display()
+    request_refresh()
 
 def on_next_month(event):
-    """切換到下一個月"""
+    """切換到下一個月(選了日期區間時改為下一個區間)"""
     global current_month, available_months
     
+    if current_range:
+        shift_current_range(1)
+        return
     if not available_months:
         show_no_data_message()
         return
@@ -151,6 +165,14 @@ def on_next_month(event):
             current_month = available_months[0]
     
     update_month_display()
+    request_refresh()
+
+def call_later(ms, func):
+    """ms 毫秒後執行 func(嵌入模式的畫布沒有 manager.window,改用畫布計時器)"""
+    timer = fig.canvas.new_timer(interval=ms)
+    timer.single_shot = True
+    timer.add_callback(func)
+    timer.start()
 
 def show_no_data_message():
     """顯示無資料訊息"""
@@ -167,7 +189,7 @@ def show_no_data_message():
             fig.canvas.draw_idle()
         
         # 2秒後恢復
-        fig.canvas.manager.window.after(2000, reset_text)
+        call_later(2000, reset_text)
 
 def show_month_boundary_message(message):
     """顯示月份邊界訊息"""
@@ -185,18 +207,32 @@ def show_month_boundary_message(message):
             fig.canvas.draw_idle()
         
         # 1.5秒後恢復
-        fig.canvas.manager.window.after(1500, reset_text)
+        call_later(1500, reset_text)
 
 def on_show_all(event):
     """顯示全部月份"""
-    global current_month
+    global current_month, current_range
     current_month = None
+    current_range = None
     update_month_display()
+    request_refresh()
+
+def on_search(text):
+    """搜尋框內容改變:只顯示備註符合的記錄(清空後恢復顯示全部記錄)"""
+    global current_search
+    text = text.strip()
+    if text == current_search:
+        return
+    current_search = text
+    request_refresh()
 
 def on_click(event):
     """點擊事件處理(使用 Matplotlib 內建判定)"""
-    global selected_category, ax_detail, wedge_info
+    global ax_detail, wedge_info
     
+    if event.inaxes == ax_detail:
+        edit_record_at(event)
+        return
     if event.inaxes != ax_pie:
         return
     
@@ -204,200 +240,522 @@ def on_click(event):
     for category, wedge in wedge_info:
         contains, _ = wedge.contains(event)
         if contains:
-            selected_category = category
-            show_detail(category)
+            select_category(category)
             print(f"點擊了: {category}")
             break
 
-def show_detail(category):
-    """顯示類別詳細資料"""
-    global ax_detail, detail_records, current_month
-    
-    ax_detail.clear()
-    ax_detail.set_facecolor(BG_COLOR)
-    
-    records = detail_records.get(category, [])
-    
-    if not records:
-        ax_detail.text(0.5, 0.5, "此類別無記錄", 
-                      ha='center', va='center', fontsize=14, color='#aaa')
-        ax_detail.axis('off')
-        fig.canvas.draw_idle()
+def edit_record_at(event):
+    """點擊詳細資料中的記錄:開啟修改/刪除對話框(僅 Tk 視窗)"""
+    index = detail_panel.record_at(event.xdata, event.ydata)
+    if index is None:
         return
-    
-    # === 頭部資訊卡片 ===
-    total = sum(r['amount'] for r in records)
-    
-    # 標題背景
-    title_rect = Rectangle((0.05, 0.88), 0.9, 0.1, 
-                           facecolor=ACCENT_COLOR, edgecolor='none',
-                           transform=ax_detail.transAxes, alpha=0.15)
-    ax_detail.add_patch(title_rect)
-    
-    # 類別名稱
-    month_info = ""
-    if current_month:
-        year, month = current_month.split('-')
-        month_info = f" - {year}/{month}"
-    
-    ax_detail.text(0.5, 0.945, f"【 {category}{month_info} 】", 
-                  ha='center', va='center',
-                  fontsize=16, fontweight='bold', color=TEXT_COLOR,
-                  transform=ax_detail.transAxes)
-    
-    # 統計資訊
-    stats_text = f"共 {len(records)} 筆  |  總計 ${total:,.0f}"
-    ax_detail.text(0.5, 0.895, stats_text,
-                  ha='center', va='center',
-                  fontsize=11, color='#5a6c7d',
-                  transform=ax_detail.transAxes)
-    
-    # === 記錄列表 ===
-    y_pos = 0.82
-    max_display = 12
-    
-    sorted_records = sorted(records, key=lambda x: x['date'], reverse=True)[:max_display]
-    
-    for i, record in enumerate(sorted_records):
-        date = record['date']
-        amount = record['amount']
-        note = record['note'] or '(無備註)'
+    records = detail_panel.records
+    record_id = records.record_id(index)
+    if not record_id or not store.editable:
+        print("此儲存方式不支援修改記錄")
+        return
+    try:
+        widget = fig.canvas.get_tk_widget()
+    except AttributeError:
+        return
+    from record_dialog import RecordDialog
+    record = (record_id, records.date(index), records.amount(index), detail_panel.category,
+              records.note(index))
+    RecordDialog(widget, record,
+                 on_edit=lambda *args: submit_write('edit', *args),
+                 on_delete=lambda record_id: submit_write('delete', record_id))
+
+def submit_write(name, *args):
+    """修改或刪除記錄:交給背景載入執行緒寫入後重新載入"""
+    loader.submit(name, *args)
+    request_refresh()
+
+def select_category(category):
+    """選取類別:記錄已在快照中時直接顯示,否則在背景查詢後顯示"""
+    global selected_category, last_fingerprint
+    selected_category = category
+    if category not in detail_records:
+        request_refresh()
+        return
+    show_detail(category)
+    # 詳細資料已重繪,避免下一次更新因類別改變而重繪整張圖
+    if last_fingerprint:
+        last_fingerprint = last_fingerprint[:3] + (category,)
+
+class DetailPanel:
+    """虛擬化的詳細記錄面板
+
+    所有文字與卡片在建立時就配置好固定數量(一頁),之後只更新內容與可見性;
+    每次只挑出目前這一頁需要的記錄,不論類別有多少筆,重繪成本都相同。
+    記錄為 RecordColumns,只以索引取出這一頁的日期、金額與備註;
+    第一頁取最新的 N 筆,捲動到後面時才排序一次並快取排序結果。
+    """
+    
+    PAGE_SIZE = 12
+    SCROLL_STEP = 3
+    ROW_TOP = 0.82
+    ROW_HEIGHT = 0.055
+    ROW_PITCH = 0.065
+    
+    def __init__(self, ax, editable=False):
+        self.ax = ax
+        self.editable = editable  # 記錄可以點擊修改時在統計列顯示提示
+        self.category = None
+        self.month = None
+        self.records = RecordColumns()
+        self.total = 0
+        self.offset = 0
+        self._order_key = None
+        self._order = None
+        self._shown = []  # 畫面上每一列對應的記錄索引
         
-        # 背景卡片
-        bg_color = CARD_BG if i % 2 == 0 else BG_COLOR
-        card_rect = Rectangle((0.05, y_pos - 0.055), 0.9, 0.055,
-                              facecolor=bg_color, edgecolor='#e0e0e0',
-                              linewidth=0.8, transform=ax_detail.transAxes)
-        ax_detail.add_patch(card_rect)
+        ax.set_facecolor(BG_COLOR)
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.axis('off')
+        in_axes = {'transform': ax.transAxes}
         
-        # 日期
-        ax_detail.text(0.08, y_pos - 0.0275, date,
-                      ha='left', va='center', fontsize=9.5,
-                      color='#5a6c7d', transform=ax_detail.transAxes,
-                      fontweight='bold')
+        # 初始提示
+        self.prompt_rect = Rectangle((0.15, 0.4), 0.7, 0.2,
+                                     facecolor='white', edgecolor=ACCENT_COLOR,
+                                     linewidth=2, **in_axes)
+        ax.add_patch(self.prompt_rect)
+        self.prompt_text = ax.text(0.5, 0.5, "點擊左側圓餅圖\n查看詳細記錄",
+                                   ha='center', va='center', fontsize=14, color=TEXT_COLOR,
+                                   fontweight='bold', **in_axes)
         
-        # 金額(右對齊)
-        ax_detail.text(0.92, y_pos - 0.0275, f"${amount:,.0f}",
-                      ha='right', va='center', fontsize=10,
-                      color=ACCENT_COLOR, transform=ax_detail.transAxes,
-                      fontweight='bold')
+        # 無記錄提示
+        self.empty_text = ax.text(0.5, 0.5, "此類別無記錄",
+                                  ha='center', va='center', fontsize=14, color='#aaa',
+                                  **in_axes)
         
-        # 備註
-        if len(note) > 20:
-            note = note[:20] + "..."
-        ax_detail.text(0.5, y_pos - 0.0275, note,
-                      ha='center', va='center', fontsize=9,
-                      color='#7a8a9a', transform=ax_detail.transAxes)
+        # === 頭部資訊卡片 ===
+        self.title_rect = Rectangle((0.05, 0.88), 0.9, 0.1,
+                                    facecolor=ACCENT_COLOR, edgecolor='none',
+                                    alpha=0.15, **in_axes)
+        ax.add_patch(self.title_rect)
+        self.title_text = ax.text(0.5, 0.945, "", ha='center', va='center',
+                                  fontsize=16, fontweight='bold', color=TEXT_COLOR,
+                                  **in_axes)
+        self.stats_text = ax.text(0.5, 0.895, "", ha='center', va='center',
+                                  fontsize=11, color='#5a6c7d', **in_axes)
         
-        y_pos -= 0.065
+        # === 記錄列表(固定數量的列,重複使用) ===
+        self.rows = []
+        for i in range(self.PAGE_SIZE):
+            y_pos = self.ROW_TOP - i * self.ROW_PITCH
+            text_y = y_pos - self.ROW_HEIGHT / 2
+            card_rect = Rectangle((0.05, y_pos - self.ROW_HEIGHT), 0.9, self.ROW_HEIGHT,
+                                  facecolor=CARD_BG, edgecolor='#e0e0e0',
+                                  linewidth=0.8, **in_axes)
+            ax.add_patch(card_rect)
+            date_text = ax.text(0.08, text_y, "", ha='left', va='center', fontsize=9.5,
+                                color='#5a6c7d', fontweight='bold', **in_axes)
+            amount_text = ax.text(0.92, text_y, "", ha='right', va='center', fontsize=10,
+                                  color=ACCENT_COLOR, fontweight='bold', **in_axes)
+            note_text = ax.text(0.5, text_y, "", ha='center', va='center', fontsize=9,
+                                color='#7a8a9a', **in_axes)
+            self.rows.append((card_rect, date_text, amount_text, note_text))
         
-        if y_pos < 0.08:
-            break
-    
-    # 如果有更多記錄
-    if len(records) > max_display:
-        remaining = len(records) - max_display
-        ax_detail.text(0.5, 0.04, f"... 還有 {remaining} 筆記錄",
-                      ha='center', va='center', fontsize=9,
-                      color='#aaa', transform=ax_detail.transAxes,
-                      style='italic')
-    
-    ax_detail.set_xlim(0, 1)
-    ax_detail.set_ylim(0, 1)
-    ax_detail.axis('off')
-    fig.canvas.draw_idle()
+        self.footer_text = ax.text(0.5, 0.04, "", ha='center', va='center', fontsize=9,
+                                   color='#aaa', style='italic', **in_axes)
+        
+        self._detail_artists = [self.title_rect, self.title_text, self.stats_text,
+                                self.footer_text]
+        self._detail_artists += [artist for row in self.rows for artist in row]
+        self.show_prompt()
+    
+    def _show_only(self, *visible):
+        for artist in (self.prompt_rect, self.prompt_text, self.empty_text,
+                       *self._detail_artists):
+            artist.set_visible(artist in visible)
+    
+    def show_prompt(self):
+        """顯示「點擊圓餅圖」的初始提示"""
+        self.category = None
+        self._shown = []
+        self._show_only(self.prompt_rect, self.prompt_text)
+    
+    def show(self, category, records, month=None):
+        """顯示某個類別的記錄;換了類別或月份時回到第一頁"""
+        if category != self.category or month != self.month:
+            self.offset = 0
+        self.category = category
+        self.month = month
+        self.records = records
+        
+        if not records:
+            self._shown = []
+            self._show_only(self.empty_text)
+            return
+        
+        self.total = records.total()
+        self.offset = max(0, min(self.offset, len(records) - self.PAGE_SIZE))
+        self._render()
+    
+    def record_at(self, x, y):
+        """座標 (x, y)(0 ~ 1)上的記錄索引,沒有點到記錄時回傳 None"""
+        if x is None or y is None or not 0.05 <= x <= 0.95:
+            return None
+        i = int((self.ROW_TOP - y) // self.ROW_PITCH)
+        if not 0 <= i < len(self._shown):
+            return None
+        top = self.ROW_TOP - i * self.ROW_PITCH
+        if not top - self.ROW_HEIGHT <= y <= top:
+            return None
+        return self._shown[i]
+    
+    def scroll(self, rows):
+        """捲動指定列數,回傳畫面是否有變動"""
+        if not self.category or len(self.records) <= self.PAGE_SIZE:
+            return False
+        offset = max(0, min(self.offset + rows, len(self.records) - self.PAGE_SIZE))
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        self._render()
+        return True
+    
+    def _page(self):
+        """目前這一頁記錄的索引(依日期由新到舊)"""
+        end = self.offset + self.PAGE_SIZE
+        if end <= self.PAGE_SIZE:
+            return self.records.newest(end)
+        
+        key = self.records.version()
+        if self._order_key != key:
+            self._order = self.records.order()
+            self._order_key = key
+        return self._order[self.offset:end]
+    
+    def _render(self):
+        records = self.records
+        
+        # 類別名稱
+        month_info = ""
+        if isinstance(self.month, tuple):
+            month_info = f" - {range_label(*self.month)}"
+        elif self.month:
+            year, month = self.month.split('-')
+            month_info = f" - {year}/{month}"
+        self.title_text.set_text(f"【 {self.category}{month_info} 】")
+        hint = "  |  點擊記錄可修改" if self.editable else ""
+        self.stats_text.set_text(f"共 {len(records)} 筆  |  總計 ${self.total:,.0f}{hint}")
+        
+        page = self._page()
+        self._shown = list(page[:len(self.rows)])
+        visible = [self.title_rect, self.title_text, self.stats_text]
+        for i, (card_rect, date_text, amount_text, note_text) in enumerate(self.rows):
+            if i >= len(page):
+                break
+            index = page[i]
+            note = records.note(index) or '(無備註)'
+            if len(note) > 20:
+                note = note[:20] + "..."
+            
+            # 背景卡片(依整體位置交錯顏色,捲動時不會跳色)
+            card_rect.set_facecolor(CARD_BG if (self.offset + i) % 2 == 0 else BG_COLOR)
+            date_text.set_text(records.date(index))
+            amount_text.set_text(f"${records.amount(index):,.0f}")
+            note_text.set_text(note)
+            visible += [card_rect, date_text, amount_text, note_text]
+        
+        # 如果有更多記錄
+        if len(records) > self.PAGE_SIZE:
+            first = self.offset + 1
+            last = self.offset + len(page)
+            remaining = len(records) - last
+            hint = f"... 還有 {remaining} 筆記錄" if remaining else "已經是最早的記錄"
+            self.footer_text.set_text(f"第 {first}-{last} 筆  |  {hint}  |  滾輪捲動")
+            visible.append(self.footer_text)
+        
+        self._show_only(*visible)
+
+def show_detail(category, redraw=True):
+    """顯示類別詳細資料;redraw=False 時由呼叫端統一重繪"""
+    detail_panel.show(category, detail_records.get(category) or RecordColumns(), current_period())
+    if redraw:
+        fig.canvas.draw_idle()
+
+def on_scroll(event):
+    """在詳細資料區用滑鼠滾輪捲動記錄"""
+    if event.inaxes != ax_detail:
+        return
+    step = -DetailPanel.SCROLL_STEP if event.button == 'up' else DetailPanel.SCROLL_STEP
+    if detail_panel.scroll(step):
+        fig.canvas.draw_idle()
+
+def on_key(event):
+    """PageUp / PageDown 整頁捲動詳細記錄;F9 以 cProfile 記錄接下來的更新"""
+    if event.key == 'f9' and profiler:
+        profiler.capture(PROFILE_KEY_FRAMES)
+        request_refresh()
+        return
+    pages = {'pageup': -DetailPanel.PAGE_SIZE, 'pagedown': DetailPanel.PAGE_SIZE}
+    if event.key in pages and detail_panel.scroll(pages[event.key]):
+        fig.canvas.draw_idle()
+
+def ledger_fingerprint():
+    """記帳檔狀態(大小、修改時間、inode)加上目前選取的月份、搜尋文字與類別"""
+    return (store.fingerprint(), current_period(), current_search, selected_category)
+
+def request_refresh():
+    """強制立即重新讀取並重繪(例如切換月份時)"""
+    global force_refresh
+    force_refresh = True
+    animate(None)
+
+class PieRenderer:
+    """保留式圓餅圖繪製器
+
+    類別組合不變時,沿用上一次的扇形、陰影、標籤與百分比文字,只更新角度、
+    位置與文字內容;類別增減或順序改變時才清空重畫。
+    """
+    
+    START_ANGLE = 90
+    LABEL_DISTANCE = 1.1  # 與 ax.pie 的預設值相同
+    PCT_DISTANCE = 0.6
+    
+    def __init__(self, ax):
+        self.ax = ax
+        self.labels = None
+        self.wedges = []
+        self.texts = []
+        self.autotexts = []
+    
+    @staticmethod
+    def explode_for(sizes):
+        """最大的區塊突出較多"""
+        max_index = sizes.index(max(sizes))
+        return [0.1 if i == max_index else 0.03 for i in range(len(sizes))]
+    
+    def show_message(self, text):
+        """沒有資料時顯示提示文字"""
+        self.ax.clear()
+        self.labels = None
+        self.wedges, self.texts, self.autotexts = [], [], []
+        self.ax.text(0.5, 0.5, text,
+                     ha='center', va='center', fontsize=16, color='#7f8c8d',
+                     bbox=dict(boxstyle='round,pad=1', facecolor='white', 
+                               edgecolor='#ddd', linewidth=2))
+        self.ax.axis('off')
+    
+    def draw(self, labels, sizes):
+        """繪製或更新圓餅圖,回傳扇形列表"""
+        if labels != self.labels:
+            self._rebuild(labels, sizes)
+        else:
+            self._update(sizes)
+        return self.wedges
+    
+    def _rebuild(self, labels, sizes):
+        self.ax.clear()
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            sizes,
+            labels=labels,
+            autopct='%1.1f%%',
+            startangle=self.START_ANGLE,
+            explode=self.explode_for(sizes),
+            colors=COLORS[:len(sizes)],
+            shadow=True,
+            textprops={'fontsize': 12, 'color': TEXT_COLOR, 'weight': 'bold'},
+            wedgeprops={'edgecolor': 'white', 'linewidth': 3, 'antialiased': True}
+        )
+        
+        # 美化文字
+        plt.setp(self.autotexts, size=11, weight="bold", color="white")
+        plt.setp(self.texts, size=13, weight="bold")
+        self.labels = list(labels)
+    
+    def _update(self, sizes):
+        """依 ax.pie 相同的幾何計算,就地更新扇形角度與文字位置"""
+        total = sum(sizes)
+        theta1 = self.START_ANGLE / 360
+        parts = zip(sizes, self.explode_for(sizes), self.wedges, self.texts, self.autotexts)
+        for size, expl, wedge, text, autotext in parts:
+            frac = size / total
+            theta2 = theta1 + frac
+            thetam = math.pi * (theta1 + theta2)
+            cos_m, sin_m = math.cos(thetam), math.sin(thetam)
+            x, y = expl * cos_m, expl * sin_m
+            
+            # 陰影直接引用扇形的路徑,不需要另外更新
+            wedge.set_center((x, y))
+            wedge.set_theta1(360 * theta1)
+            wedge.set_theta2(360 * theta2)
+            
+            xt = x + self.LABEL_DISTANCE * wedge.r * cos_m
+            text.set_position((xt, y + self.LABEL_DISTANCE * wedge.r * sin_m))
+            text.set_horizontalalignment('left' if xt > 0 else 'right')
+            
+            autotext.set_position((x + self.PCT_DISTANCE * wedge.r * cos_m,
+                                   y + self.PCT_DISTANCE * wedge.r * sin_m))
+            autotext.set_text('%1.1f%%' % (100 * frac))
+            theta1 = theta2
+
+def set_pie_title(ax, month, total_amount, hint):
+    """圓餅圖標題:月份或日期區間(或全部)、總支出與提示文字"""
+    if isinstance(month, tuple):
+        title_text = f'{range_label(*month)} 消費占比\n總支出: ${total_amount:,.0f}'
+    elif month:
+        year, month = month.split('-')
+        title_text = f'{year} 年 {int(month)} 月消費占比\n總支出: ${total_amount:,.0f}'
+    else:
+        title_text = f'全部消費占比\n總支出: ${total_amount:,.0f}'
+    if hint:
+        title_text += f'  |  {hint}'
+    ax.set_title(title_text, fontsize=15, fontweight='bold', pad=0, color=TEXT_COLOR)
 
 def animate(i):
-    """動畫更新函數"""
+    """動畫更新函數:資料或選取狀態有變動時要求背景載入(沒變時直接略過)"""
+    global last_fingerprint, force_refresh
+    
+    fingerprint = ledger_fingerprint()
+    if not force_refresh and fingerprint == last_fingerprint:
+        if profiler:
+            profiler.skip()
+        return
+    last_fingerprint = fingerprint
+    force_refresh = False
+    request_load()
+
+def request_load():
+    """要求背景載入目前的月份與搜尋結果,並在結果完成前定期檢查"""
+    global polling
+    view = current_range[1:] if current_range else current_month
+    loader.request(view, selected_category, current_search)
+    if not loader.threaded:
+        poll_snapshot()
+    elif not polling:
+        polling = True
+        call_later(SNAPSHOT_POLL_MS, poll_snapshot)
+
+def poll_snapshot():
+    """套用最新完成的快照;背景還在載入時稍後再檢查"""
+    global polling
+    snapshot = loader.take()
+    if snapshot is not None:
+        apply_snapshot(snapshot)
+    if loader.threaded and loader.pending():
+        call_later(SNAPSHOT_POLL_MS, poll_snapshot)
+    else:
+        polling = False
+
+def apply_snapshot(snapshot):
+    """以背景載入的快照重繪圓餅圖與詳細資料"""
     global current_data, detail_records, ax_pie, wedge_info, available_months
     
-    data, records, months = read_data(current_month)
+    if profiler:
+        profiler.begin()
+        profiler.add_phases(snapshot.timings)
+    data = snapshot.data
     current_data = data
-    detail_records = records
-    available_months = months
-    wedge_info = []
-    
-    ax_pie.clear()
+    detail_records = snapshot.records
+    available_months = snapshot.months
     
     if not data:
         empty_text = "等待資料中...\n\n請在輸入視窗新增消費"
-        if current_month and available_months:
-            year, month = current_month.split('-')
-            empty_text = f"{year} 年 {int(month)} 月\n\n尚無消費記錄"
+        if snapshot.search:
+            empty_text = f"{period_text(current_period())}\n\n沒有備註含「{snapshot.search}」的記錄"
+        elif current_period() and available_months:
+            empty_text = f"{period_text(current_period())}\n\n尚無消費記錄"
         
-        ax_pie.text(0.5, 0.5, empty_text,
-                   ha='center', va='center', fontsize=16, color='#7f8c8d',
-                   bbox=dict(boxstyle='round,pad=1', facecolor='white', 
-                           edgecolor='#ddd', linewidth=2))
-        ax_pie.axis('off')
+        with profiled('update'):
+            pie_renderer.show_message(empty_text)
+        wedge_info = []
+        finish_tick(snapshot)
+        fig.canvas.draw_idle()
         return
     
     labels = list(data.keys())
     sizes = list(data.values())
     
-    # Explode 效果
-    max_index = sizes.index(max(sizes))
-    explode = [0.1 if i == max_index else 0.03 for i in range(len(sizes))]
-    
-    # 繪製圓餅圖
-    wedges, texts, autotexts = ax_pie.pie(
-        sizes,
-        labels=labels,
-        autopct='%1.1f%%',
-        startangle=90,
-        explode=explode,
-        colors=COLORS[:len(sizes)],
-        shadow=True,
-        textprops={'fontsize': 12, 'color': TEXT_COLOR, 'weight': 'bold'},
-        wedgeprops={'edgecolor': 'white', 'linewidth': 3, 'antialiased': True}
-    )
-    
-    # 儲存扇形資訊
-    for label, wedge in zip(labels, wedges):
-        wedge_info.append((label, wedge))
-    
-    # 美化文字
-    plt.setp(autotexts, size=11, weight="bold", color="white")
-    plt.setp(texts, size=13, weight="bold")
-    
-    # 計算總金額
-    total_amount = sum(sizes)
-    
-    # 標題
-    title_text = '各類別消費占比\n點擊區塊查看詳細記錄'
-    if current_month:
-        year, month = current_month.split('-')
-        title_text = f'{year} 年 {int(month)} 月消費占比\n總支出: ${total_amount:,.0f}  |  點擊區塊查看詳細'
-    else:
-        title_text = f'全部消費占比\n總支出: ${total_amount:,.0f}  |  點擊區塊查看詳細'
-    
-    ax_pie.set_title(title_text, fontsize=15, fontweight='bold',pad=0, color=TEXT_COLOR)
-    
-    # 保持選中狀態
-    if selected_category and selected_category in data:
-        show_detail(selected_category)
+    with profiled('update'):
+        # 繪製圓餅圖(類別相同時只更新既有的扇形與文字)
+        wedges = pie_renderer.draw(labels, sizes)
+        wedge_info = list(zip(labels, wedges))
+        
+        # 標題
+        hint = f'搜尋「{snapshot.search}」' if snapshot.search else '點擊區塊查看詳細'
+        set_pie_title(ax_pie, current_period(), sum(sizes), hint)
+        
+        # 保持選中狀態
+        if selected_category and selected_category in data:
+            show_detail(selected_category, redraw=False)
+    finish_tick(snapshot)
+    fig.canvas.draw_idle()
 
-def run_chart():
-    """啟動圖表視窗"""
-    global fig, ax_pie, ax_detail, btn_prev, btn_next, btn_all, month_text
+def on_pushed_record(message):
+    """輸入視窗推送的新記錄:直接套用到記憶體中的資料後重繪"""
+    # 由背景執行緒在下一次載入前套用
+    loader.push(message)
+    animate(None)
+
+def on_push_dropped():
+    """推送通道中斷:從 CSV 重新同步"""
+    request_refresh()
+
+def start_push_listener():
+    """接收輸入視窗推送的記錄(僅在 main.py 設定了通道時啟用)"""
+    global push_listener
+    try:
+        widget = fig.canvas.get_tk_widget()
+    except AttributeError:
+        return
+    push_listener = PushListener.from_env(widget, on_pushed_record, on_push_dropped)
+
+def start_auto_refresh(refresh_mode='watch'):
+    """啟動自動更新
+
+    watch: 監看記帳檔,有變動才重繪(inotify,不支援時退回 stat 輪詢)
+    poll:  每秒檢查一次(非 Tk 後端也一律使用)
+    """
+    global refresh_timer, file_watch
     
-    # 建立高解析度視窗
-    plt.rcParams['figure.dpi'] = 100
-    plt.rcParams['savefig.dpi'] = 100
+    if refresh_mode == 'watch':
+        try:
+            widget = fig.canvas.get_tk_widget()
+        except AttributeError:
+            widget = None
+        if widget is not None:
+            file_watch = FileWatch(widget, store.watch_path, lambda: animate(None))
+            return
+    
+    # FuncAnimation 每一格都會重繪整張圖,改用計時器只在有變動時重繪
+    refresh_timer = fig.canvas.new_timer(interval=1000)
+    refresh_timer.add_callback(animate, 0)
+    refresh_timer.start()
+
+def notify_ready():
+    """視窗出現後通知 main.py(非 Tk 後端沒有視窗事件可用,直接略過)"""
+    try:
+        window = fig.canvas.get_tk_widget().winfo_toplevel()
+    except AttributeError:
+        return
+    readiness.notify_when_mapped(window)
+
+def build_chart(target_fig, chart_store, profile=False, profile_log=None, profile_frames=None,
+                threaded=True):
+    """在 target_fig 上建立月份按鈕、圓餅圖與詳細資料區(獨立視窗與嵌入模式共用)
+
+    chart_store 之後只在背景載入執行緒中使用;threaded=False 時改為同步載入。
+    """
+    global fig, ax_pie, ax_detail, btn_prev, btn_next, btn_all, month_text, store
+    global pie_renderer, detail_panel, profiler, loader, polling, search_box, current_search
     
-    fig = plt.figure(figsize=(16, 8.5))
-    fig.canvas.manager.set_window_title('即時消費分析 - 月份篩選')
+    fig = target_fig
+    store = chart_store
     fig.patch.set_facecolor(BG_COLOR)
     
     # === 月份控制列(調整到圓餅圖正上方) ===
     # 上一月按鈕
-    ax_btn_prev = plt.axes([0.00, 0.94, 0.09, 0.035])
+    ax_btn_prev = fig.add_axes([0.00, 0.94, 0.09, 0.035])
     btn_prev = Button(ax_btn_prev, '< 上一月', color='#e8eaf0', hovercolor='#d0d5dd')
     btn_prev.label.set_fontsize(10)
     btn_prev.on_clicked(on_prev_month)
     
     # 顯示全部按鈕
-    ax_btn_all = plt.axes([0.10, 0.94, 0.09, 0.035])
+    ax_btn_all = fig.add_axes([0.10, 0.94, 0.09, 0.035])
     btn_all = Button(ax_btn_all, '顯示全部', color='#5B7FFF', hovercolor='#7d96ff')
     btn_all.label.set_color('white')
     btn_all.label.set_fontsize(10)
@@ -410,32 +768,86 @@ def run_chart():
                                  edgecolor='#d0d5dd', linewidth=1.5))
     
     # 下一月按鈕
-    ax_btn_next = plt.axes([0.35, 0.94, 0.09, 0.035])
+    ax_btn_next = fig.add_axes([0.35, 0.94, 0.09, 0.035])
     btn_next = Button(ax_btn_next, '下一月 >', color='#e8eaf0', hovercolor='#d0d5dd')
     btn_next.label.set_fontsize(10)
     btn_next.on_clicked(on_next_month)
     
+    # 日期區間按鈕(詳細資料區上方)
+    range_buttons.clear()
+    for i, (kind, label) in enumerate(RANGE_PRESETS):
+        ax_btn = fig.add_axes([0.52 + i * 0.085, 0.94, 0.08, 0.035])
+        button = Button(ax_btn, label, color='#e8eaf0', hovercolor='#d0d5dd')
+        button.label.set_fontsize(10)
+        button.on_clicked(lambda event, kind=kind: on_range_preset(kind))
+        range_buttons[kind] = button
+    
+    # 備註搜尋框(輸入時即時搜尋)
+    ax_search = fig.add_axes([0.895, 0.94, 0.08, 0.035])
+    current_search = ''
+    search_box = TextBox(ax_search, '搜尋 ', color='white', hovercolor='#f0f2f7')
+    search_box.label.set_fontsize(10)
+    search_box.on_text_change(on_search)
+    
     # 左側:圓餅圖(調整位置,縮短高度給上方按鈕留空間)
-    ax_pie = plt.axes([0.05, 0.05, 0.45, 0.84])
+    ax_pie = fig.add_axes(PIE_RECT)
     ax_pie.set_facecolor(CARD_BG)
+    pie_renderer = PieRenderer(ax_pie)
+    pie_renderer.show_message("載入中...")
     
-    # 右側:詳細資料(調整位置)
-    ax_detail = plt.axes([0.52, 0.05, 0.45, 0.90])
-    ax_detail.set_facecolor(BG_COLOR)
-    
-    # 初始提示
-    prompt_rect = Rectangle((0.15, 0.4), 0.7, 0.2,
-                           facecolor='white', edgecolor=ACCENT_COLOR,
-                           linewidth=2, transform=ax_detail.transAxes)
-    ax_detail.add_patch(prompt_rect)
+    # 右側:詳細資料(調整位置,含初始提示)
+    ax_detail = fig.add_axes(DETAIL_RECT)
+    detail_panel = DetailPanel(ax_detail, editable=store.editable)
     
-    ax_detail.text(0.5, 0.5, "點擊左側圓餅圖\n查看詳細記錄",
-                  ha='center', va='center', fontsize=14, color=TEXT_COLOR,
-                  transform=ax_detail.transAxes, fontweight='bold')
-    ax_detail.axis('off')
-    
-    # 綁定點擊事件
+    # 綁定點擊與捲動事件
     fig.canvas.mpl_connect('button_press_event', on_click)
+    fig.canvas.mpl_connect('scroll_event', on_scroll)
+    fig.canvas.mpl_connect('key_press_event', on_key)
+    
+    # 背景載入(第一次載入時先從快取還原)
+    loader = SnapshotLoader(store, threaded)
+    polling = False
+    fig.canvas.mpl_connect('close_event', lambda event: loader.close())
+    
+    # 效能監看(未開啟時為 None,不影響效能)
+    profiler = TickProfiler.from_options(profile, profile_log, profile_frames)
+    if profiler:
+        profiler.attach(fig)
+        fig.canvas.mpl_connect('close_event', lambda event: profiler.close())
+
+def embed_chart(parent, chart_store, refresh_mode='watch'):
+    """把圖表嵌入 Tk 視窗(單一程序模式),回傳畫布的 Tk widget
+
+    chart_store 需與輸入表單的 store 分開開啟(它只在背景載入執行緒中使用);
+    存檔後直接呼叫 on_pushed_record 更新,不需要推送通道,
+    其他程式寫入的資料仍由檔案監看補上。
+    """
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    
+    target_fig = Figure(figsize=FIGURE_SIZE, dpi=100)
+    canvas = FigureCanvasTkAgg(target_fig, master=parent)
+    build_chart(target_fig, chart_store)
+    animate(0)
+    start_auto_refresh(refresh_mode)
+    
+    widget = canvas.get_tk_widget()
+    # 嵌入的畫布沒有 close_event,視窗關閉時自行停止背景載入
+    widget.bind('<Destroy>', lambda event: loader.close(), add='+')
+    # 讓滑鼠移入時取得焦點,PageUp / PageDown 才會送到圖表
+    widget.bind('<Enter>', lambda event: widget.focus_set(), add='+')
+    return widget
+
+def run_chart(refresh_mode='watch', store_spec=None, engine=None,
+              profile=False, profile_log=None, profile_frames=None):
+    """啟動圖表視窗"""
+    # 建立高解析度視窗
+    plt.rcParams['figure.dpi'] = 100
+    plt.rcParams['savefig.dpi'] = 100
+    
+    target_fig = plt.figure(figsize=FIGURE_SIZE)
+    target_fig.canvas.manager.set_window_title('即時消費分析 - 月份篩選')
+    build_chart(target_fig, open_store(store_spec, engine), profile, profile_log, profile_frames)
     
     # 調整視窗位置
     try:
@@ -444,9 +856,31 @@ def run_chart():
     except:
         pass
     
-    # 啟動動畫
-    ani = animation.FuncAnimation(fig, animate, interval=1000, cache_frame_data=False)
+    # 先畫第一格,之後只在記帳檔變動時更新
+    animate(0)
+    start_auto_refresh(refresh_mode)
+    start_push_listener()
+    notify_ready()
     plt.show()
 
 if __name__ == "__main__":
-    run_chart()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="即時消費分析圖表")
+    parser.add_argument('--refresh', choices=['watch', 'poll'], default='watch',
+                        help="watch: 記帳檔變動時才更新(預設);poll: 每秒檢查一次")
+    parser.add_argument('--store', default=None,
+                        help="儲存方式,例如 csv:expenses.csv、sqlite:expenses.db、"
+                             "columnar:expenses.col(預設讀取環境變數 EXPENSE_STORE)")
+    parser.add_argument('--engine', choices=['python', 'numpy'], default=None,
+                        help="彙總引擎:python 逐列計算,numpy 向量化計算"
+                             "(預設讀取環境變數 EXPENSE_ENGINE)")
+    parser.add_argument('--profile', action='store_true',
+                        help="在圖表左下角顯示每次更新的耗時(或設定 EXPENSE_PROFILE=1)")
+    parser.add_argument('--profile-log', default=None,
+                        help="每次更新寫一行 JSON 到此檔案(或設定 EXPENSE_PROFILE_LOG)")
+    parser.add_argument('--profile-frames', type=int, default=None,
+                        help="以 cProfile 記錄前 N 次更新並寫到 chart.prof"
+                             "(執行中也可按 F9 記錄)")
+    args = parser.parse_args()
+    run_chart(refresh_mode=args.refresh, store_spec=args.store, engine=args.engine,
+              profile=args.profile, profile_log=args.profile_log,
+              profile_frames=args.profile_frames)
\ No newline at end of file
@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date as Date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+import batch_report  # 匯入時設定 Agg 後端,不需要螢幕
+from chart_loader import query_view
+from date_range import RANGE_PRESETS, period_text, preset_range
+from record_columns import RecordColumns
+from storage import open_store
+
+PORT_ENV = 'EXPENSE_DASHBOARD_PORT'  # 未指定 --port 時使用的埠號
+DEFAULT_PORT = 8765
+CACHE_ENTRIES = 64   # 同一版本的記帳檔最多快取的回應數
+PAGE_SIZE = 50       # 詳細記錄每頁的預設筆數
+MAX_PAGE_SIZE = 500
+IMAGE_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+JSON_TYPE = 'application/json; charset=utf-8'
+HTML_TYPE = 'text/html; charset=utf-8'
+MONTH_PATTERN = re.compile(r'\d{4}-(0[1-9]|1[0-2])$')
+
+
+class DashboardError(ValueError):
+    """無法處理的要求,status 為回應的 HTTP 狀態碼"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_view(params):
+    """查詢參數轉成 (view, 期間)
+
+    month=YYYY-MM、range=7d/30d/quarter/year 或 from=YYYY-MM-DD&to=YYYY-MM-DD,
+    都沒有時為全部月份。view 交給 query_view(),期間用於標題
+    (日期區間為 (區間代號, 起日, 迄日),與圖表視窗相同)。
+    """
+    month, kind = params.get('month'), params.get('range')
+    first, last = params.get('from'), params.get('to')
+    if month:
+        if not MONTH_PATTERN.match(month):
+            raise DashboardError(400, "month 必須是 YYYY-MM")
+        return month, month
+    if kind:
+        if kind not in dict(RANGE_PRESETS):
+            raise DashboardError(400, f"未知的區間: {kind}")
+        first, last = preset_range(kind)
+    elif first or last:
+        try:
+            first = Date.fromisoformat(first).isoformat()
+            last = Date.fromisoformat(last).isoformat()
+        except (TypeError, ValueError):
+            raise DashboardError(400, "from / to 必須是 YYYY-MM-DD") from None
+        if first > last:
+            raise DashboardError(400, "from 不能晚於 to")
+        kind = 'custom'
+    else:
+        return None, None
+    return (first, last), (kind, first, last)
+
+
+def _int_param(params, name, default, low, high):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise DashboardError(400, f"{name} 必須是整數") from None
+    return max(low, min(value, high))
+
+
+def _json(data):
+    return JSON_TYPE, json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class Dashboard:
+    """儀表板的查詢、繪圖與快取(與 HTTP 無關,可直接以 get() 呼叫)
+
+    store 只在持有鎖時使用。每次要求先比對記帳檔指紋,有變動才 refresh()
+    並清空快取;ETag 由指紋與要求內容算出,記帳檔沒有變動時輪詢的要求
+    不需要查詢或繪圖,帶著相同 If-None-Match 的要求直接回應 304。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._cache = OrderedDict()  # 要求 -> (Content-Type, 內容)
+        self._started = False        # 是否已經從快取檔還原過
+
+    def get(self, path, query='', if_none_match=None):
+        """處理一個 GET 要求,回傳 (狀態碼, 標頭, 內容)"""
+        try:
+            key, build = self._route(path, {name: values[0] for name, values
+                                            in parse_qs(query).items()})
+        except DashboardError as e:
+            return self._error(e)
+
+        with self._lock:
+            self._sync()
+            etag = '"%s"' % hashlib.blake2b(repr((self._fingerprint, key)).encode('utf-8'),
+                                            digest_size=12).hexdigest()
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if if_none_match and (if_none_match.strip() == '*' or
+                                  etag in (tag.strip() for tag in if_none_match.split(','))):
+                return 304, headers, b''
+            cached = self._cache.get(key)
+            if cached is None:
+                try:
+                    cached = build()
+                except DashboardError as e:
+                    return self._error(e)
+                self._cache[key] = cached
+                if len(self._cache) > CACHE_ENTRIES:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+        headers['Content-Type'] = cached[0]
+        return 200, headers, cached[1]
+
+    def _sync(self):
+        """記帳檔有變動時讀入新資料並清空快取(必須在鎖內呼叫)"""
+        if not self._started:
+            self._started = True
+            self.store.load_cache()
+        fingerprint = self.store.fingerprint()
+        if fingerprint != self._fingerprint:
+            # 先取指紋再讀取:讀取期間又有寫入時,下一次要求會再讀一次
+            self._fingerprint = fingerprint
+            self.store.refresh()
+            self._cache.clear()
+
+    @staticmethod
+    def _error(error):
+        content_type, body = _json({'error': str(error)})
+        return error.status, {'Content-Type': content_type}, body
+
+    def _route(self, path, params):
+        """回傳 (快取鍵, 產生內容的函式);快取鍵使用解析後的期間(近 7 天等會隨日期改變)"""
+        view, period = parse_view(params)
+        search = params.get('q', '').strip()
+        if path == '/':
+            return (('index', period, search, params.get('category')),
+                    lambda: self._index(view, period, search, params))
+        if path == '/api/months':
+            return ('months',), self._months
+        if path == '/api/summary':
+            return ('summary', period, search), lambda: self._summary(view, period, search)
+        if path.startswith('/api/categories/'):
+            category = unquote(path[len('/api/categories/'):])
+            offset = _int_param(params, 'offset', 0, 0, 1 << 62)
+            limit = _int_param(params, 'limit', PAGE_SIZE, 1, MAX_PAGE_SIZE)
+            return (('category', period, search, category, offset, limit),
+                    lambda: self._category(view, period, search, category, offset, limit))
+        name, _, fmt = path.lstrip('/').partition('.')
+        if name == 'chart' and fmt in IMAGE_TYPES:
+            category = params.get('category')
+            offset = _int_param(params, 'offset', 0, 0, 1 << 62)
+            return (('chart', fmt, period, search, category, offset),
+                    lambda: self._chart(fmt, view, period, search, category, offset))
+        raise DashboardError(404, f"找不到頁面: {path}")
+
+    # === 內容 ===
+
+    def _months(self):
+        _, _, months = self.store.query(None)
+        return _json({'months': list(months)})
+
+    def _summary(self, view, period, search):
+        data, _, months = query_view(self.store, view, search)
+        total = sum(data.values())
+        return _json({
+            'period': period_text(period),
+            'search': search,
+            'total': total,
+            'categories': [{'name': name, 'amount': amount,
+                            'share': amount / total if total else 0.0}
+                           for name, amount in data.items()],
+            'months': list(months),
+        })
+
+    def _category(self, view, period, search, category, offset, limit):
+        """一個類別的一頁詳細記錄(依日期由新到舊)"""
+        data, records, _ = query_view(self.store, view, search)
+        if category not in data:
+            raise DashboardError(404, f"沒有「{category}」類別的記錄")
+        columns = records[category]
+        end = offset + limit
+        # 前幾頁只挑出需要的筆數,不排序全部記錄
+        order = columns.newest(end) if end < len(columns) else columns.order()
+        return _json({
+            'category': category,
+            'period': period_text(period),
+            'search': search,
+            'total': data[category],
+            'count': len(columns),
+            'offset': offset,
+            'limit': limit,
+            'records': [{'id': columns.record_id(i) or None, 'date': columns.date(i),
+                         'amount': columns.amount(i), 'note': columns.note(i)}
+                        for i in order[offset:end]],
+        })
+
+    def _chart(self, fmt, view, period, search, category, offset):
+        """圓餅圖與詳細資料區的圖片(未指定類別時顯示金額最高的類別)"""
+        data, records, _ = query_view(self.store, view, search)
+        if category and category not in data:
+            raise DashboardError(404, f"沒有「{category}」類別的記錄")
+        top = category or (max(data, key=data.get) if data else None)
+        fig = batch_report.draw_report({
+            'month': period,
+            'categories': dict(data),
+            'top': top,
+            'records': records[top] if top else RecordColumns(),
+            'hint': f'搜尋「{search}」' if search else '',
+            'offset': offset,
+        })
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, facecolor=fig.get_facecolor())
+        return IMAGE_TYPES[fmt], buffer.getvalue()
+
+    def _index(self, view, period, search, params):
+        """簡單的瀏覽頁面:月份連結、圖表與類別總額"""
+        data, _, months = query_view(self.store, view, search)
+        keep = {name: value for name, value in params.items()
+                if name in ('month', 'range', 'from', 'to', 'q', 'category')}
+        links = ' '.join(f'<a href="/?{urlencode(dict(month=m))}">{m}</a>' for m in months)
+        rows = ''.join(f'<tr><td><a href="/?{urlencode(dict(keep, category=name))}">'
+                       f'{html.escape(name)}</a></td><td>${amount:,.0f}</td></tr>'
+                       for name, amount in data.items())
+        page = f"""<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8">
+<title>消費分析 - {html.escape(period_text(period))}</title></head>
+<body style="font-family: sans-serif; background: #f8f9fa; color: #2c3e50">
+<p><a href="/">全部月份</a> {links}</p>
+<img src="/chart.svg?{urlencode(keep)}" style="max-width: 100%" alt="消費圓餅圖">
+<table>{rows}</table>
+<p>JSON:<a href="/api/summary?{urlencode(keep)}">/api/summary</a>
+<a href="/api/months">/api/months</a></p>
+</body></html>
+"""
+        return HTML_TYPE, page.encode('utf-8')
+
+    def close(self):
+        """寫入快取檔並關閉 store"""
+        with self._lock:
+            if self._started:
+                self.store.save_cache()
+            self.store.close()
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    server_version = 'ExpenseDashboard/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, headers, body = self.server.dashboard.get(
+            url.path, url.query, self.headers.get('If-None-Match'))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD' and status != 304:
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+
+class DashboardServer(ThreadingHTTPServer):
+    """本機 HTTP 儀表板;port 為 0 時由系統選一個可用的埠號(測試用)"""
+
+    daemon_threads = True
+
+    def __init__(self, dashboard, host='127.0.0.1', port=DEFAULT_PORT):
+        super().__init__((host, port), DashboardHandler)
+        self.dashboard = dashboard
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def serve(store_spec=None, engine=None, host='127.0.0.1', port=None):
+    """啟動儀表板伺服器,直到按下 Ctrl+C"""
+    if port is None:
+        port = int(os.environ.get(PORT_ENV) or DEFAULT_PORT)
+    dashboard = Dashboard(open_store(store_spec, engine))
+    server = DashboardServer(dashboard, host, port)
+    print(f"📊 儀表板已啟動: {server.url}(按 Ctrl+C 結束)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 儀表板已結束。")
+    finally:
+        server.server_close()
+        dashboard.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本機 HTTP 消費儀表板(JSON 彙總與圖表圖片)")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="監聽位址(預設只接受本機連線)")
+    parser.add_argument('--port', type=int, default=None,
+                        help=f"埠號(預設讀取環境變數 {PORT_ENV},未設定時為 {DEFAULT_PORT})")
+    parser.add_argument('--store', default=None,
+                        help="儲存方式,例如 csv:expenses.csv(預設讀取環境變數 EXPENSE_STORE)")
+    parser.add_argument('--engine', choices=['python', 'numpy'], default=None)
+    args = parser.parse_args()
+    serve(args.store, args.engine, args.host, args.port)
@@ -0,0 +1,61 @@
+from datetime import date as Date, timedelta
+
+# 圖表上的日期區間按鈕:(代號, 按鈕文字)
+RANGE_PRESETS = [('7d', '近 7 天'), ('30d', '近 30 天'), ('quarter', '本季'), ('year', '今年')]
+DAY_SPANS = {'7d': 7, '30d': 30}
+
+
+def _period(kind, anchor):
+    """anchor 所在的季或年的 (第一天, 最後一天)"""
+    if kind == 'year':
+        return Date(anchor.year, 1, 1), Date(anchor.year, 12, 31)
+    start_month = (anchor.month - 1) // 3 * 3 + 1
+    first = Date(anchor.year, start_month, 1)
+    if start_month == 10:
+        next_first = Date(anchor.year + 1, 1, 1)
+    else:
+        next_first = Date(anchor.year, start_month + 3, 1)
+    return first, next_first - timedelta(days=1)
+
+
+def preset_range(kind, today=None):
+    """預設區間的 (起日, 迄日),皆為 YYYY-MM-DD 且包含兩端"""
+    today = today or Date.today()
+    if kind in DAY_SPANS:
+        first, last = today - timedelta(days=DAY_SPANS[kind] - 1), today
+    else:
+        first, last = _period(kind, today)
+    return first.isoformat(), last.isoformat()
+
+
+def shift_range(kind, first, last, step):
+    """把區間往前(step < 0)或往後移動 step 個區間長度"""
+    first, last = Date.fromisoformat(first), Date.fromisoformat(last)
+    if kind in DAY_SPANS:
+        delta = timedelta(days=DAY_SPANS[kind] * step)
+        return (first + delta).isoformat(), (last + delta).isoformat()
+    months = (12 if kind == 'year' else 3) * step
+    index = first.year * 12 + first.month - 1 + months
+    first, last = _period(kind, Date(index // 12, index % 12 + 1, 1))
+    return first.isoformat(), last.isoformat()
+
+
+def period_text(period):
+    """期間的顯示文字:(區間代號, 起日, 迄日)、月份 YYYY-MM 或 None(全部月份)"""
+    if isinstance(period, tuple):
+        return range_label(*period)
+    if period:
+        # 轉換成中文顯示
+        year, month = period.split('-')
+        return f"{year} 年 {int(month)} 月"
+    return "全部月份"
+
+
+def range_label(kind, first, last):
+    """區間的顯示文字,例如「2024 Q4」「2024 年」「2024/12/01 ~ 2024/12/30」"""
+    start = Date.fromisoformat(first)
+    if kind == 'year':
+        return f"{start.year} 年"
+    if kind == 'quarter':
+        return f"{start.year} Q{(start.month - 1) // 3 + 1}"
+    return f"{first.replace('-', '/')} ~ {last.replace('-', '/')}"
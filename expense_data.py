@@ -0,0 +1,480 @@
+import csv
+import io
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from array import array
+from functools import lru_cache
+
+from note_index import NoteIndex
+from record_columns import DateIndex, RecordColumns, StringTable
+
+DATA_FILE = 'expenses.csv'
+
+# 用來判斷檔案是否被改寫的尾端位元組數
+TAIL_SIG_SIZE = 64
+
+# 輸入視窗提供的類別(不含 emoji)
+CATEGORIES = ['食物', '交通', '娛樂', '購物', '居住', '醫療', '其他']
+
+
+def parse_amount(text):
+    """驗證金額(輸入視窗與批次匯入共用的規則):必須是大於 0 的數字
+
+    回傳 float;空白或不合法時拋出 ValueError。
+    """
+    text = (text or '').strip()
+    if not text:
+        raise ValueError("金額不能為空")
+    try:
+        value = float(text)
+    except ValueError:
+        raise ValueError("金額不是有效的數字") from None
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError("金額必須大於 0")
+    return value
+
+
+@lru_cache(maxsize=4096)
+def month_of(date_str):
+    """日期字串轉成月份 (YYYY-MM);無法解析時回傳 None
+
+    同一天的記錄很多,快取後每個日期只需要 strptime 一次。
+    """
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m')
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def day_number(date_str):
+    """日期字串轉成日序號(date.toordinal);無法解析時為 0"""
+    if not month_of(date_str):
+        return 0
+    year, month, day = (int(part) for part in date_str.split('-'))
+    return datetime(year, month, day).toordinal()
+
+
+# 解析資料列時可能拋出的例外(格式錯誤的資料列)
+PARSE_ERRORS = (KeyError, ValueError, TypeError, AttributeError, IndexError)
+
+# _apply_fixes 中代表「全部月份總表」的鍵(月份 None 已用於沒有日期的記錄)
+TOTAL = object()
+
+
+def parse_row(row):
+    """解析一列 CSV 資料,回傳 (類別, 月份, 日期, 金額, 備註);格式錯誤時拋出例外"""
+    amount = float(row['Amount'])
+    cat = row['Category'].split()[-1] if ' ' in row['Category'] else row['Category']
+    date_str = row.get('Date') or ''
+    note = row.get('Note') or ''
+    return cat, month_of(date_str), date_str, amount, note
+
+
+def view_filter(view):
+    """月份 YYYY-MM、None(全部)或 (起日, 迄日) 轉成「日期字串是否在範圍內」的判斷函式
+
+    沒有日期的記錄任何範圍都包含(與月份篩選相同);不篩選時回傳 None。
+    """
+    if not view:
+        return None
+    if isinstance(view, tuple):
+        lo, hi = day_number(view[0]), day_number(view[1])
+
+        def in_range(date_str):
+            day = day_number(date_str)
+            return not day or lo <= day <= hi
+        return in_range
+    return lambda date_str: month_of(date_str) in (view, None)
+
+
+class BadRecordId(ValueError):
+    """Id 欄空白或不是整數"""
+
+
+def record_id(row, ordinal):
+    """資料列的記錄編號:Id 欄的整數;沒有 Id 欄的舊版記帳檔為資料列序號 ordinal
+
+    新記錄的編號依寫入順序遞增;修改與刪除記錄的資料列沿用原記錄的編號。
+    有 Id 欄但編號空白的資料列視為格式錯誤(序號可能與既有的記錄編號重複)。
+    """
+    if 'Id' not in row:
+        return ordinal
+    value = row['Id']
+    if not value:
+        raise BadRecordId(value)
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRecordId(value) from None
+
+
+def is_tombstone(row):
+    """刪除記錄的資料列:只有 Id,沒有金額與類別"""
+    return bool(row.get('Id')) and not row.get('Amount') and not row.get('Category')
+
+
+def reject_reason(error):
+    """parse_row / record_id 拋出的例外轉成說明文字(統計被略過的資料列用)"""
+    if isinstance(error, KeyError):
+        return f"缺少欄位 {error.args[0]}"
+    if isinstance(error, BadRecordId):
+        return "記錄編號不是有效的數字" if error.args[0] else "缺少記錄編號"
+    if isinstance(error, ValueError):
+        return "金額不是有效的數字"
+    return "欄位不足"
+
+
+class LedgerReader:
+    """增量讀取記帳檔
+
+    記住已解析的位元組位置與累計結果,每次 refresh() 只解析新增的資料列;
+    檔案被截斷或改寫時才重新完整讀取。
+
+    累計結果以「月份 → 類別 → [總額, 筆數, 記錄, 首次出現序號]」的
+    彙總索引保存,另外維護一份不分月份的總表,切換月份只需查字典。
+    記錄以 RecordColumns 的平行陣列保存,日期與備註共用同一個字串表。
+    沒有日期的記錄放在月份 None 底下,任何月份篩選都會包含它們。
+    備註另有倒排索引(NoteIndex),search() 只取出符合的記錄。
+
+    每筆記錄有記錄編號(見 record_id),記錄依編號排列。編號不大於目前最大編號的
+    資料列是修改(同一編號的新內容)或刪除(is_tombstone)既有記錄,
+    每批資料解析完後一起套用,受影響的類別與月份只重建一次。
+    """
+
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        """清空所有累計結果,下次 refresh() 會從頭讀取"""
+        self.offset = 0
+        self.inode = None
+        self.fieldnames = None
+        self.tail_sig = b''
+        self.rollup = {}   # 月份 -> {類別: [總額, 筆數, RecordColumns, 最早的記錄編號]}
+        self.totals = {}   # 類別 -> [總額, 筆數, RecordColumns, 最早的記錄編號](全部月份)
+        self.strings = StringTable()
+        self.date_index = {}  # 類別 -> DateIndex(總表中記錄的日期排序)
+        self.note_index = NoteIndex()  # 詞 -> 備註在字串表中的索引
+        self.note_rows = {}   # 類別 -> {備註索引: 總表中記錄的位置}
+        self.rows_scanned = 0      # 解析過的資料列(含格式錯誤的)
+        self.rejected = Counter()  # 略過原因 -> 筆數
+        self.last_id = 0           # 目前最大的記錄編號
+        self.dead = 0              # 被修改、刪除取代的資料列(壓縮時會移除)
+        self._sorted_months = []
+
+    def _was_rewritten(self, st):
+        """檢查檔案是否被截斷、替換或改寫"""
+        if self.inode is not None and st.st_ino != self.inode:
+            return True
+        if st.st_size < self.offset:
+            return True
+        if self.tail_sig:
+            with open(self.path, 'rb') as file:
+                file.seek(self.offset - len(self.tail_sig))
+                if file.read(len(self.tail_sig)) != self.tail_sig:
+                    return True
+        return False
+
+    def refresh(self):
+        """解析自上次以來新增的資料列,回傳資料是否有變動"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # 檔案被刪除:清空舊資料
+            changed = self.offset > 0
+            self.reset()
+            return changed
+
+        changed = False
+        if self._was_rewritten(st):
+            self.reset()
+            changed = True
+
+        if st.st_size == self.offset:
+            return changed
+
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            chunk = file.read()
+
+        # 只處理完整的行,寫到一半的行留到下次
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return changed
+        chunk = chunk[:end]
+
+        self._parse(chunk.decode('utf-8', errors='replace'))
+        self._advance(chunk)
+        self.inode = st.st_ino
+        return True
+
+    def apply_appended(self, offset, line):
+        """套用剛寫入檔案 offset 位置的一列(由輸入視窗直接推送)
+
+        只有該列緊接在已讀取的位置之後才會套用,否則回傳 False,
+        留給 refresh() 從檔案補讀,因此同一列不會被計算兩次。
+        """
+        data = line.encode('utf-8')
+        if offset != self.offset or self.fieldnames is None or not data.endswith(b'\n'):
+            return False
+        self._parse(line)
+        self._advance(data)
+        return True
+
+    def _parse(self, text):
+        """解析完整的 CSV 資料列並加入彙總索引"""
+        reader = csv.DictReader(io.StringIO(text), fieldnames=self.fieldnames)
+        fixes = {}  # 記錄編號 -> 新內容;None 代表刪除
+        for row in reader:
+            self.rows_scanned += 1
+            try:
+                rid = record_id(row, self.rows_scanned)
+                if rid <= self.last_id or is_tombstone(row):
+                    fix = None if is_tombstone(row) else parse_row(row)
+                    if rid in fixes:
+                        self.dead += 1  # 同一批中較早的修改已被取代
+                    fixes[rid] = fix
+                    continue
+                cat, month_key, date_str, amount, note = parse_row(row)
+            except PARSE_ERRORS as e:
+                self.rejected[reject_reason(e)] += 1
+                continue
+            self.last_id = rid
+            self._add(cat, month_key, date_str, amount, note, rid)
+        self.fieldnames = reader.fieldnames
+        if fixes:
+            self._apply_fixes(fixes)
+
+    def _advance(self, data):
+        """已讀取位置前進 len(data),並更新尾端位元組"""
+        self.offset += len(data)
+        keep = min(TAIL_SIG_SIZE, self.offset)
+        self.tail_sig = (self.tail_sig + data)[-keep:]
+
+    def _add(self, cat, month_key, date_str, amount, note, rid):
+        """將一筆記錄加入彙總索引(rid 大於目前所有記錄編號)"""
+        month = self.rollup.get(month_key)
+        if month is None:
+            month = self.rollup[month_key] = {}
+            if month_key:
+                self._sorted_months = sorted(
+                    (m for m in self.rollup if m), reverse=True)
+
+        # 大多數日期與備註都已在字串表中,先直接查字典
+        index = self.strings.index
+        date_id = index.get(date_str)
+        if date_id is None:
+            date_id = self.strings.add(date_str)
+        note_id = index.get(note)
+        if note_id is None:
+            note_id = self.strings.add(note)
+            self.note_index.add(note_id, note)
+        elif note_id not in self.note_index.texts:
+            # 同樣的字串先以日期出現過
+            self.note_index.add(note_id, note)
+        for bucket in (month, self.totals):
+            entry = bucket.get(cat)
+            if entry is None:
+                entry = bucket[cat] = [0, 0, RecordColumns(self.strings), rid]
+            entry[0] += amount
+            entry[1] += 1
+            entry[2].append_ids(date_id, amount, note_id, rid)
+
+        index = self.date_index.get(cat)
+        if index is None:
+            index = self.date_index[cat] = DateIndex()
+        position = len(self.totals[cat][2]) - 1
+        index.add(day_number(date_str), position)
+
+        by_note = self.note_rows.get(cat)
+        if by_note is None:
+            by_note = self.note_rows[cat] = {}
+        rows = by_note.get(note_id)
+        if rows is None:
+            rows = by_note[note_id] = array('I')
+        rows.append(position)
+
+    def recent(self, count):
+        """最近新增的 count 筆記錄 [(記錄編號, 日期, 金額, 類別, 備註)],由新到舊"""
+        rows = []
+        for cat, entry in self.totals.items():
+            columns = entry[2]
+            # 記錄依編號排列,每個類別只需要看最後 count 筆
+            for i in range(max(0, len(columns) - count), len(columns)):
+                rows.append((columns.record_id(i), columns.date(i), columns.amount(i), cat,
+                             columns.note(i)))
+        rows.sort(reverse=True)
+        return rows[:count]
+
+    def dead_rows(self):
+        """被修改、刪除取代的資料列數(決定是否壓縮記帳檔)"""
+        return self.dead
+
+    def _note_id(self, note):
+        """備註在字串表中的索引(新的備註同時加入倒排索引)"""
+        note_id = self.strings.add(note)
+        if note_id not in self.note_index.texts:
+            self.note_index.add(note_id, note)
+        return note_id
+
+    def _apply_fixes(self, fixes):
+        """套用修改與刪除:找出原記錄的位置,受影響的類別與月份各重建一次"""
+        drop = {}   # (月份或 TOTAL, 類別) -> {要移除的記錄編號}
+        extra = {}  # (月份或 TOTAL, 類別) -> [(記錄編號, 日期索引, 金額, 備註索引)]
+        for rid, fix in fixes.items():
+            found = False
+            for cat, entry in self.totals.items():
+                i = entry[2].find(rid)
+                if i is not None:
+                    found = True
+                    drop.setdefault((TOTAL, cat), set()).add(rid)
+                    drop.setdefault((month_of(entry[2].date(i)), cat), set()).add(rid)
+                    break
+            if fix is None:
+                # 刪除記錄的資料列本身,以及原記錄
+                self.dead += 2 if found else 1
+                if not found:
+                    self.rejected['找不到要刪除的記錄'] += 1
+                continue
+            # 找不到原記錄時(例如時鐘倒退產生的編號)當成新記錄
+            if found:
+                self.dead += 1
+            self.last_id = max(self.last_id, rid)
+            cat, month_key, date_str, amount, note = fix
+            row = (rid, self.strings.add(date_str), amount, self._note_id(note))
+            extra.setdefault((TOTAL, cat), []).append(row)
+            extra.setdefault((month_key, cat), []).append(row)
+
+        touched = {}
+        for key in set(drop) | set(extra):
+            month_key, cat = key
+            if month_key is TOTAL:
+                bucket = self.totals
+            else:
+                bucket = self.rollup.setdefault(month_key, {})
+            self._rebuild_entry(bucket, cat, drop.get(key, ()), extra.get(key, []))
+            touched[id(bucket)] = bucket
+            if month_key is TOTAL:
+                self._index_category(cat)
+        # 類別依最早的記錄重新排列
+        for bucket in touched.values():
+            entries = sorted(bucket.items(), key=lambda item: item[1][3])
+            bucket.clear()
+            bucket.update(entries)
+        for month_key in [m for m, bucket in self.rollup.items() if not bucket]:
+            del self.rollup[month_key]
+        self._sorted_months = sorted((m for m in self.rollup if m), reverse=True)
+
+    def _rebuild_entry(self, bucket, cat, drop, extra):
+        """以新的陣列重建一個類別的彙總(舊陣列留給已發布的快照),沒有記錄時移除"""
+        entry = bucket.get(cat)
+        if entry is None:
+            if not extra:
+                return
+            entry = bucket[cat] = [0, 0, RecordColumns(self.strings), 0]
+        columns = entry[2].rebuilt(drop, extra)
+        if not len(columns):
+            del bucket[cat]
+            return
+        # 類別依最早的記錄排列,與壓縮後的記帳檔一致
+        entry[:] = [columns.total(), len(columns), columns, columns.record_id(0)]
+
+    def _index_category(self, cat):
+        """依總表重建一個類別的日期索引與備註位置"""
+        self.date_index.pop(cat, None)
+        self.note_rows.pop(cat, None)
+        entry = self.totals.get(cat)
+        if entry is None:
+            return
+        index = self.date_index[cat] = DateIndex()
+        by_note = self.note_rows[cat] = {}
+        strings = self.strings.strings
+        for position, (date_id, note_id) in enumerate(zip(entry[2].dates, entry[2].notes)):
+            index.add(day_number(strings[date_id]), position)
+            rows = by_note.get(note_id)
+            if rows is None:
+                rows = by_note[note_id] = array('I')
+            rows.append(position)
+
+    def sorted_months(self):
+        """所有月份(最新的在前)"""
+        return list(self._sorted_months)
+
+    def query(self, filter_month=None):
+        """回傳 (類別總額, 類別記錄, 月份列表),可選擇性篩選月份"""
+        if not filter_month:
+            entries = self.totals
+        else:
+            entries = self.rollup.get(filter_month, {})
+            undated = self.rollup.get(None)
+            if undated:
+                entries = _merge_entries(entries, undated)
+
+        categories = {cat: entry[0] for cat, entry in entries.items()}
+        records = {cat: entry[2] for cat, entry in entries.items()}
+        return categories, records, self.sorted_months()
+
+    def query_range(self, first, last):
+        """回傳 first ~ last(YYYY-MM-DD,含兩端)的 (類別總額, 類別記錄, 月份列表)
+
+        以各類別的日期索引二分搜尋,只取出區間內的記錄;沒有日期的記錄一律包含。
+        """
+        lo, hi = day_number(first), day_number(last)
+        categories, records = {}, {}
+        for cat, entry in self.totals.items():
+            rows = self.date_index[cat].select(lo, hi)
+            if not rows:
+                continue
+            columns = entry[2].take(rows)
+            categories[cat] = columns.total()
+            records[cat] = columns
+        return categories, records, self.sorted_months()
+
+    def search(self, text, view=None, category=None):
+        """備註含有 text 的記錄,回傳 (類別總額, 類別記錄, 月份列表)
+
+        view 為月份、None(全部)或 (起日, 迄日),category 只搜尋單一類別。
+        先由倒排索引找出符合的備註,再取出這些備註的記錄位置,
+        不需要掃描所有記錄。
+        """
+        note_ids = self.note_index.match(text)
+        if note_ids is None:
+            note_ids = self.note_index.texts.keys()
+        keep = view_filter(view)
+        categories, records = {}, {}
+        for cat, entry in self.totals.items():
+            if category and cat != category:
+                continue
+            by_note = self.note_rows[cat]
+            positions = []
+            for note_id in note_ids:
+                rows = by_note.get(note_id)
+                if rows is not None:
+                    positions.extend(rows)
+            if keep is not None:
+                columns = entry[2]
+                positions = [p for p in positions if keep(columns.date(p))]
+            if not positions:
+                continue
+            positions.sort()
+            columns = entry[2].take(positions)
+            categories[cat] = columns.total()
+            records[cat] = columns
+        return categories, records, self.sorted_months()
+
+
+def _merge_entries(first, second):
+    """合併兩個「類別 → 彙總」字典,類別依首次出現的順序排列"""
+    merged = {}
+    for cat in sorted(set(first) | set(second),
+                      key=lambda c: min(b[c][3] for b in (first, second) if c in b)):
+        parts = [b[cat] for b in (first, second) if cat in b]
+        merged[cat] = [sum(p[0] for p in parts), sum(p[1] for p in parts),
+                       RecordColumns.concat([p[2] for p in parts]), min(p[3] for p in parts)]
+    return merged
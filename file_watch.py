@@ -0,0 +1,157 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+
+# === inotify 常數(見 <sys/inotify.h>) ===
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE)
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+COALESCE_MS = 30   # 連續寫入合併成一次重繪的等待時間
+POLL_MS = 250      # 沒有 inotify 時的 stat 輪詢間隔
+
+
+class Inotify:
+    """Linux inotify 包裝:監看檔案所在的資料夾,過濾出目標檔案的事件
+
+    監看資料夾而不是檔案本身,這樣檔案被刪除後重建或以 rename 替換時
+    也能收到通知。
+    """
+
+    def __init__(self, path):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("找不到 libc")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("此系統不支援 inotify")
+
+        path = os.path.abspath(path)
+        self.name = os.fsencode(os.path.basename(path))
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失敗")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(os.path.dirname(path)),
+                                    WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch 失敗")
+
+    def fileno(self):
+        return self.fd
+
+    def read_changes(self):
+        """讀出所有待處理事件,回傳其中是否有目標檔案的變動"""
+        changed = False
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            pos = 0
+            while pos < len(buf):
+                _, _, _, name_len = EVENT_HEADER.unpack_from(buf, pos)
+                pos += EVENT_HEADER.size
+                name = buf[pos:pos + name_len].rstrip(b'\0')
+                pos += name_len
+                if name == self.name:
+                    changed = True
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def stat_signature(path):
+    """檔案的 (大小, 修改時間, inode);檔案不存在時回傳 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class FileWatch:
+    """在 Tk 事件迴圈中監看檔案,檔案變動時呼叫 callback
+
+    優先使用 inotify(閒置時完全不會喚醒),不支援時退回 stat 輪詢。
+    短時間內的多次寫入會合併成一次 callback。
+    """
+
+    def __init__(self, widget, path, callback,
+                 coalesce_ms=COALESCE_MS, poll_ms=POLL_MS):
+        self.widget = widget
+        self.path = path
+        self.callback = callback
+        self.coalesce_ms = coalesce_ms
+        self.poll_ms = poll_ms
+        self._pending = None
+        self._poll_job = None
+        self._inotify = None
+
+        import tkinter  # 只在 Tk 介面中使用,儀表板等無視窗的程式不需要 tkinter
+
+        try:
+            self._inotify = Inotify(path)
+            widget.tk.createfilehandler(self._inotify.fileno(), tkinter.READABLE,
+                                        self._on_readable)
+            self.mode = 'inotify'
+        except (OSError, AttributeError, RuntimeError):
+            if self._inotify:
+                self._inotify.close()
+                self._inotify = None
+            self.mode = 'poll'
+            self._last_sig = stat_signature(path)
+            self._poll_job = widget.after(poll_ms, self._poll)
+
+    def _on_readable(self, fd, mask):
+        if self._inotify and self._inotify.read_changes():
+            self._schedule()
+
+    def _poll(self):
+        sig = stat_signature(self.path)
+        if sig != self._last_sig:
+            self._last_sig = sig
+            self._schedule()
+        self._poll_job = self.widget.after(self.poll_ms, self._poll)
+
+    def _schedule(self):
+        """合併短時間內的多次變動"""
+        if self._pending is None:
+            self._pending = self.widget.after(self.coalesce_ms, self._fire)
+
+    def _fire(self):
+        self._pending = None
+        self.callback()
+
+    def stop(self):
+        """停止監看"""
+        if self._inotify:
+            try:
+                self.widget.tk.deletefilehandler(self._inotify.fileno())
+            except Exception:
+                pass
+            self._inotify.close()
+            self._inotify = None
+        for job in (self._pending, self._poll_job):
+            if job is not None:
+                try:
+                    self.widget.after_cancel(job)
+                except Exception:
+                    pass
+        self._pending = self._poll_job = None
@@ -1,12 +1,26 @@
+import argparse
+import threading
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from tkinter import ttk
 from tkcalendar import DateEntry
-import csv
-import os
 from datetime import datetime
 
-DATA_FILE = 'expenses.csv'
+import bulk_import
+import readiness
+from expense_data import parse_amount
+from push_channel import PushSender
+from record_dialog import RecordDialog
+from storage import open_store
+
+# 記帳資料的儲存方式(預設為 expenses.csv,可用環境變數 EXPENSE_STORE 切換)
+store = open_store()
+
+# 與圖表視窗之間的推送通道(由 main.py 設定,單獨執行時為 None)
+push_sender = PushSender.from_env()
+
+# 單一程序模式下嵌入的圖表:存檔後直接呼叫,更新記憶體中的資料
+chart_listener = None
 
 # === 清新明亮配色方案 ===
 BG_COLOR = "#f5f7fa"              # 淺灰藍背景
@@ -29,6 +43,49 @@ FONT_INPUT = ("Arial", 11)
 FONT_BUTTON = ("Arial", 12, "bold")
 # ========================
 
+RECENT_COUNT = 50  # 「最近記錄」列出的筆數
+
+def publish(message):
+    """把寫入的結果推送給圖表(儲存檔仍是正式資料,圖表確認位置相符才會套用)"""
+    if push_sender:
+        push_sender.send(message)
+    if chart_listener:
+        chart_listener(message)
+
+def change_in_background(window, name, args, on_done):
+    """在背景執行 store.<name>(*args)(修改、刪除記錄),完成後在介面執行緒呼叫 on_done
+
+    on_done 收到可推送給圖表的訊息,失敗時收到例外。舊版記帳檔第一次修改時
+    要整份改寫成新格式,寫入後也可能需要壓縮記帳檔,兩者都不在介面執行緒進行。
+    """
+    result = {}
+
+    def worker():
+        # 背景執行緒使用自己的儲存連線(SQLite 連線不能跨執行緒共用)
+        target = open_store()
+        try:
+            try:
+                result['message'] = getattr(target, name)(*args)
+            except (OSError, ValueError) as e:
+                result['message'] = e
+                return
+            # 被取代的資料列多到超過門檻時壓縮(結果已先交給介面,不必等待)
+            try:
+                target.maybe_compact()
+            except OSError as e:
+                print(f"⚠️ 壓縮記帳檔失敗: {e}")
+        finally:
+            target.close()
+
+    def poll():
+        if 'message' not in result:
+            window.after(100, poll)
+            return
+        on_done(result['message'])
+
+    threading.Thread(target=worker, daemon=True).start()
+    window.after(100, poll)
+
 def save_expense(date_entry, amount_entry, category_var, note_entry, status_label, save_btn):
     date = date_entry.get_date().strftime("%Y-%m-%d")
     amount = amount_entry.get().strip()
@@ -41,21 +98,14 @@ def save_expense(date_entry, amount_entry, category_var, note_entry, status_labe
         return
 
     try:
-        amount_val = float(amount)
-        if amount_val <= 0:
-            raise ValueError
+        amount_val = parse_amount(amount)
     except ValueError:
         messagebox.showerror("錯誤", "請輸入有效的金額數字！")
         amount_entry.focus()
         return
 
-    file_exists = os.path.isfile(DATA_FILE)
     try:
-        with open(DATA_FILE, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(['Date', 'Amount', 'Category', 'Note'])
-            writer.writerow([date, amount, category, note])
+        publish(store.append(date, amount, category, note))
         
         # 成功動畫
         amount_entry.delete(0, tk.END)
@@ -80,6 +130,138 @@ def save_expense(date_entry, amount_entry, category_var, note_entry, status_labe
     except Exception as e:
         messagebox.showerror("錯誤", f"存檔失敗: {e}")
 
+def import_statement(window, status_label, import_btn):
+    """選擇帳單 CSV 並在背景匯入,完成後顯示統計"""
+    path = filedialog.askopenfilename(
+        parent=window, title="選擇帳單 CSV",
+        filetypes=[("CSV 檔", "*.csv"), ("所有檔案", "*.*")])
+    if not path:
+        return
+
+    import_btn.config(state="disabled")
+    status_label.config(text="📥 匯入中…", fg=TEXT_SECONDARY)
+    progress = {'read': 0, 'done': False, 'result': None}
+
+    def report(stats):
+        progress['read'] = stats.read
+
+    def worker():
+        # 背景執行緒使用自己的儲存連線(SQLite 連線不能跨執行緒共用)
+        target = open_store()
+        try:
+            progress['result'] = bulk_import.import_statement(path, target, progress=report)
+        except Exception as e:
+            progress['result'] = e
+        finally:
+            target.close()
+            progress['done'] = True
+
+    def poll():
+        if not progress['done']:
+            status_label.config(text=f"📥 匯入中… 已讀取 {progress['read']:,} 筆")
+            window.after(100, poll)
+            return
+        import_btn.config(state="normal")
+        status_label.config(text="")
+        result = progress['result']
+        if result is None:
+            messagebox.showerror("錯誤", "匯入失敗: 背景匯入意外中斷")
+        elif isinstance(result, Exception):
+            messagebox.showerror("錯誤", f"匯入失敗: {result}")
+        else:
+            messagebox.showinfo("匯入完成", result.summary())
+
+    threading.Thread(target=worker, daemon=True).start()
+    window.after(100, poll)
+
+def show_recent(window, status_label):
+    """列出最近新增的記錄,雙擊可修改或刪除"""
+    if not store.editable:
+        messagebox.showinfo("提示", "目前的儲存方式只能新增記錄,不支援修改")
+        return
+
+    top = tk.Toplevel(window)
+    top.title("🕘 最近記錄")
+    top.configure(bg=BG_COLOR)
+    top.geometry("600x440")
+
+    columns = (('date', "日期", 110, "center"), ('category', "類別", 70, "center"),
+               ('amount', "金額", 100, "e"), ('note', "備註", 260, "w"))
+    tree = ttk.Treeview(top, columns=[name for name, *_ in columns], show="headings",
+                        selectmode="browse")
+    for name, label, width, anchor in columns:
+        tree.heading(name, text=label)
+        tree.column(name, width=width, anchor=anchor)
+    tree.pack(fill="both", expand=True, padx=12, pady=(12, 4))
+    hint = tk.Label(top, text="", font=("Arial", 9), bg=BG_COLOR, fg=TEXT_SECONDARY)
+    hint.pack(pady=(0, 10))
+    records = {}  # Treeview 項目 -> (記錄編號, 日期, 金額, 類別, 備註)
+
+    def load():
+        hint.config(text="載入中…")
+        result = {}
+
+        def worker():
+            target = open_store()
+            try:
+                target.load_cache()
+                target.refresh()
+                result['rows'] = target.recent(RECENT_COUNT)
+            except (OSError, ValueError) as e:
+                result['rows'] = e
+            finally:
+                target.close()
+
+        def poll():
+            if not top.winfo_exists():
+                return
+            if 'rows' not in result:
+                window.after(100, poll)
+                return
+            rows = result['rows']
+            if isinstance(rows, Exception):
+                hint.config(text=f"讀取失敗: {rows}")
+                return
+            tree.delete(*tree.get_children())
+            records.clear()
+            for record in rows:
+                _, date, amount, category, note = record
+                item = tree.insert("", "end", values=(date or "(無日期)", category,
+                                                      f"${amount:,.0f}", note))
+                records[item] = record
+            hint.config(text="雙擊記錄可修改或刪除" if rows else "尚無記錄")
+
+        threading.Thread(target=worker, daemon=True).start()
+        window.after(100, poll)
+
+    def change(name, args, text):
+        status_label.config(text="⏳ 寫入中…", fg=TEXT_SECONDARY)
+
+        def done(message):
+            if isinstance(message, Exception):
+                status_label.config(text="")
+                messagebox.showerror("錯誤", f"存檔失敗: {message}")
+                return
+            publish(message)
+            status_label.config(text=text, fg=SUCCESS_COLOR)
+            status_label.after(3000, lambda: status_label.config(text=""))
+            if top.winfo_exists():
+                load()
+
+        change_in_background(window, name, args, done)
+
+    def on_open(event):
+        selection = tree.selection()
+        if not selection:
+            return
+        RecordDialog(
+            top, records[selection[0]],
+            on_edit=lambda *args: change('edit', args, "✓ 記錄已修改"),
+            on_delete=lambda record_id: change('delete', (record_id,), "✓ 記錄已刪除"))
+
+    tree.bind("<Double-1>", on_open)
+    load()
+
 class StylishEntry(tk.Frame):
     """美化輸入框"""
     def __init__(self, parent, placeholder="", **kwargs):
@@ -122,10 +304,13 @@ class StylishEntry(tk.Frame):
     def focus(self):
         self.entry.focus()
 
-def run_gui():
+def run_gui(with_chart=False):
+    """開啟輸入視窗;with_chart 時把圖表嵌入在表單右側(單一程序模式)"""
+    global chart_listener
+    
     window = tk.Tk()
     window.title("💰 精緻記帳工具")
-    window.geometry("520x700")
+    window.geometry("1560x760" if with_chart else "520x740")
     window.configure(bg=BG_COLOR)
     
     # 設定 DPI
@@ -136,11 +321,14 @@ def run_gui():
         pass
     
     window.geometry("+80+80")
-    window.resizable(False, False)
+    window.resizable(with_chart, with_chart)
 
     # === 主容器 ===
     container = tk.Frame(window, bg=BG_COLOR)
-    container.pack(fill="both", expand=True, padx=25, pady=25)
+    if with_chart:
+        container.pack(side="left", fill="y", padx=25, pady=25)
+    else:
+        container.pack(fill="both", expand=True, padx=25, pady=25)
 
     # === 頂部裝飾條 ===
     top_bar = tk.Frame(container, bg=ACCENT_PRIMARY, height=6)
@@ -323,13 +511,57 @@ def run_gui():
     footer = tk.Frame(card, bg=CARD_BG)
     footer.pack(fill="x", pady=(0, 25))
     
+    import_btn = tk.Button(
+        footer,
+        text="📥 匯入帳單 CSV",
+        font=("Arial", 10),
+        bg=CARD_BG,
+        fg=ACCENT_PRIMARY,
+        activebackground=INPUT_BG,
+        activeforeground=ACCENT_PRIMARY,
+        relief="flat",
+        cursor="hand2",
+        bd=0,
+        command=lambda: import_statement(window, status_label, import_btn)
+    )
+    import_btn.pack(pady=(0, 6))
+    
+    recent_btn = tk.Button(
+        footer,
+        text="🕘 最近記錄",
+        font=("Arial", 10),
+        bg=CARD_BG,
+        fg=ACCENT_PRIMARY,
+        activebackground=INPUT_BG,
+        activeforeground=ACCENT_PRIMARY,
+        relief="flat",
+        cursor="hand2",
+        bd=0,
+        command=lambda: show_recent(window, status_label)
+    )
+    recent_btn.pack(pady=(0, 6))
+    
     tk.Label(footer, text="💡 圖表會即時更新", 
             font=("Arial", 9), bg=CARD_BG, fg=TEXT_SECONDARY).pack()
 
     # 預設焦點
     amount_entry.focus()
 
+    # === 嵌入的圖表(單一程序模式) ===
+    if with_chart:
+        import create_pie_chart
+        chart_frame = tk.Frame(window, bg=BG_COLOR)
+        chart_frame.pack(side="left", fill="both", expand=True, padx=(0, 25), pady=25)
+        # 圖表在背景執行緒讀取,使用自己的 store
+        create_pie_chart.embed_chart(chart_frame, open_store()).pack(fill="both", expand=True)
+        chart_listener = create_pie_chart.on_pushed_record
+
+    readiness.notify_when_mapped(window)
     window.mainloop()
 
 if __name__ == "__main__":
-    run_gui()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="記帳輸入視窗")
+    parser.add_argument('--with-chart', action='store_true',
+                        help="單一程序模式:把圖表嵌入在輸入視窗中")
+    args = parser.parse_args()
+    run_gui(with_chart=args.with_chart)
\ No newline at end of file
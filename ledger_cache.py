@@ -0,0 +1,82 @@
+import hashlib
+import os
+import pickle
+
+# 快取檔放在記帳檔旁邊,例如 expenses.csv.cache
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 7
+HASH_BLOCK = 4096  # 比對記帳檔時雜湊已讀取範圍最後的這些位元組
+
+LOAD_ERRORS = (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+               ImportError, IndexError, KeyError, TypeError, ValueError)
+
+
+def cache_path(path):
+    return path + CACHE_SUFFIX
+
+
+def block_hash(path, end):
+    """記帳檔 end 位置之前最後一個區塊的雜湊"""
+    start = max(0, end - HASH_BLOCK)
+    with open(path, 'rb') as file:
+        file.seek(start)
+        return hashlib.sha1(file.read(end - start)).hexdigest()
+
+
+def save(reader):
+    """把讀取器的彙總結果寫到快取檔,回傳是否有寫入
+
+    快取內容是讀取器的完整狀態(彙總索引、記錄與讀取位置),
+    加上記帳檔在該位置的大小、修改時間、inode 與最後區塊雜湊。
+    先寫到暫存檔再改名,寫到一半當掉也不會留下損壞的快取。
+    """
+    if not reader.offset:
+        return False
+    try:
+        st = os.stat(reader.path)
+        header = {
+            'version': CACHE_VERSION,
+            'reader': type(reader).__name__,
+            'offset': reader.offset,
+            'inode': st.st_ino,
+            # 檔案在讀取後又有新增時,修改時間不代表已讀取的內容
+            'mtime_ns': st.st_mtime_ns if st.st_size == reader.offset else None,
+            'block': block_hash(reader.path, reader.offset),
+        }
+        state = {key: value for key, value in vars(reader).items() if key != 'path'}
+        tmp = cache_path(reader.path) + '.tmp'
+        with open(tmp, 'wb') as file:
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path(reader.path))
+        return True
+    except OSError:
+        return False
+
+
+def load(reader):
+    """嘗試從快取還原讀取器,回傳結果:
+
+    hit   快取與記帳檔完全一致
+    grown 記帳檔在快取之後只有新增資料(之後 refresh() 只需解析新增部分)
+    miss  沒有快取、格式不符或記帳檔已被改寫(讀取器維持空白狀態)
+    """
+    try:
+        st = os.stat(reader.path)
+        with open(cache_path(reader.path), 'rb') as file:
+            header = pickle.load(file)
+            if (header.get('version') != CACHE_VERSION
+                    or header.get('reader') != type(reader).__name__
+                    or header['inode'] != st.st_ino
+                    or header['offset'] > st.st_size):
+                return 'miss'
+            unchanged = (header['offset'] == st.st_size
+                         and header['mtime_ns'] == st.st_mtime_ns)
+            if not unchanged and block_hash(reader.path, header['offset']) != header['block']:
+                return 'miss'
+            state = pickle.load(file)
+    except LOAD_ERRORS:
+        return 'miss'
+
+    vars(reader).update(state)
+    return 'hit' if reader.offset == st.st_size else 'grown'
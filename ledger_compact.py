@@ -0,0 +1,108 @@
+import argparse
+import csv
+import os
+
+from expense_data import DATA_FILE, PARSE_ERRORS, is_tombstone, parse_row, record_id
+
+# 被修改、刪除取代的資料列超過這個比例(且至少 COMPACT_MIN_DEAD 筆)時壓縮記帳檔
+COMPACT_RATIO = 0.2
+COMPACT_MIN_DEAD = 50
+
+
+def needs_compaction(dead, rows):
+    """是否該壓縮:dead 為被取代的資料列數,rows 為全部資料列數"""
+    return dead >= COMPACT_MIN_DEAD and dead >= rows * COMPACT_RATIO
+
+
+def _final_versions(path):
+    """第一遍:被修改或刪除的記錄的最終內容(記錄編號 -> 資料列;None 代表已刪除)
+
+    規則與 LedgerReader 相同:編號不大於目前最大編號的資料列是修改或刪除,
+    格式錯誤的修改不算數。
+    """
+    finals = {}
+    last_id = 0
+    with open(path, mode='r', encoding='utf-8', newline='') as file:
+        for ordinal, row in enumerate(csv.DictReader(file), 1):
+            try:
+                rid = record_id(row, ordinal)
+                if rid <= last_id or is_tombstone(row):
+                    if is_tombstone(row):
+                        finals[rid] = None
+                    else:
+                        parse_row(row)
+                        finals[rid] = row
+                    continue
+                parse_row(row)
+            except PARSE_ERRORS:
+                continue
+            last_id = rid
+    return finals
+
+
+def live_rows(path):
+    """依原本的順序產生 (記錄編號, 資料列) 的最終內容,已刪除與被取代的資料列不會出現
+
+    被修改的記錄出現在原記錄的位置(記錄編號維持遞增);
+    格式錯誤的資料列原樣保留(記錄編號無效時為 None),交給讀取端略過。
+    """
+    finals = _final_versions(path)
+    emitted = set()
+    with open(path, mode='r', encoding='utf-8', newline='') as file:
+        for ordinal, row in enumerate(csv.DictReader(file), 1):
+            try:
+                rid = record_id(row, ordinal)
+            except ValueError:
+                yield None, row
+                continue
+            if rid in finals:
+                if rid in emitted:
+                    continue
+                emitted.add(rid)
+                row = finals[rid]
+                if row is None:
+                    continue
+            yield rid, row
+
+
+def compact(path, writer, header):
+    """把記帳檔改寫成只有有效記錄的新檔案(標頭為 header,每列都有 Id),回傳 (保留, 移除) 筆數
+
+    在 writer 的鎖內寫出暫存檔後原子地取代;舊版沒有 Id 欄的記帳檔會一併升級,
+    原本的記錄以資料列序號作為記錄編號。
+    """
+    def build(tmp):
+        total = kept = 0
+        with open(path, mode='r', encoding='utf-8', newline='') as file:
+            total = sum(1 for row in csv.DictReader(file))
+        with open(tmp, mode='w', encoding='utf-8', newline='') as out:
+            output = csv.writer(out)
+            output.writerow(header)
+            for rid, row in live_rows(path):
+                values = [row.get(name) or '' for name in header]
+                if rid is not None:
+                    values[header.index('Id')] = rid
+                output.writerow(values)
+                kept += 1
+            out.flush()
+            os.fsync(out.fileno())
+        return kept, total - kept
+
+    return writer.rewrite(build)
+
+
+if __name__ == "__main__":
+    from storage import CsvStore
+
+    parser = argparse.ArgumentParser(description="壓縮 CSV 記帳檔:移除已刪除與被修改取代的資料列")
+    parser.add_argument('csv_path', nargs='?', default=DATA_FILE)
+    args = parser.parse_args()
+
+    store = CsvStore(args.csv_path)
+    try:
+        kept, removed = store.compact()
+    except OSError as e:
+        raise SystemExit(f"❌ 壓縮失敗: {e}")
+    finally:
+        store.close()
+    print(f"✅ 已壓縮 {args.csv_path}:保留 {kept} 筆,移除 {removed} 筆")
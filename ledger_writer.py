@@ -0,0 +1,264 @@
+import csv
+import io
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl,只能靠單一寫入程序
+    fcntl = None
+
+# 寫入耐久性的環境變數:
+#   row   每筆寫入後立即 fsync(最安全,最慢)
+#   group 寫入後最多延遲 GROUP_COMMIT_MS 再 fsync,期間的寫入共用一次 fsync(預設)
+#   none  只交給作業系統,不主動 fsync
+DURABILITY_ENV = 'EXPENSE_DURABILITY'
+DURABILITY_MODES = ('row', 'group', 'none')
+GROUP_COMMIT_MS = 50
+BATCH_ROWS = 5000  # append_many 每次上鎖寫入的筆數
+TORN_SUFFIX = '.torn'  # 被截掉的殘缺資料另存於此,不直接丟棄
+REWRITE_SUFFIX = '.rewrite'  # rewrite() 寫出新檔案時的暫存檔
+
+
+def encode_rows(rows):
+    """多筆資料列轉成 CSV 位元組(與 csv.writer 的格式相同)"""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode('utf-8')
+
+
+def _fsync_dir(path):
+    """把目錄項目(rename 的結果)寫入磁碟;不支援時略過"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class LedgerWriter:
+    """CSV 記帳檔的附加寫入器
+
+    - 以 fcntl.flock 取得獨佔鎖,多個輸入視窗或匯入程式同時寫入也不會交錯;
+      標頭是否需要寫入也在鎖內依檔案大小判斷,不會重複寫入。
+    - 每次寫入都是單一的 O_APPEND write,讀取端不會看到兩筆交錯的資料。
+    - 上鎖後先修復檔尾:上次寫到一半(程式當掉)的殘缺資料列會被截掉。
+    - 指定 id_column 時,該欄為空的資料列在鎖內填入新的記錄編號(奈秒時間,
+      同一程序內保證遞增;不同程序的寫入由鎖排序,取得的時間也會遞增)。
+    - rewrite() 在鎖內以新檔案原子地取代記帳檔;等待鎖的寫入者上鎖後
+      會發現檔案已被取代,改鎖新的檔案。
+    """
+
+    def __init__(self, path, header, durability=None, group_ms=GROUP_COMMIT_MS,
+                 id_column=None, min_fields=None):
+        durability = durability or os.environ.get(DURABILITY_ENV) or 'group'
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"未知的寫入模式: {durability}")
+        self.path = path
+        self.header = header
+        self.durability = durability
+        self.group_ms = group_ms
+        self.id_column = id_column
+        # 檔尾的資料列至少有這麼多欄才算完整(舊版檔案的欄位比標頭少)
+        self.min_fields = min_fields or len(header)
+        self._last_id = 0
+        self._fd = None
+        self._mutex = threading.Lock()  # 保護 fd(group 模式的 fsync 在計時器執行緒中進行)
+        self._timer = None
+        self._last_sync = 0.0
+        self.recovered = 0  # 啟動時修復掉的位元組數
+        if os.path.exists(path):
+            self.recovered = self.recover()
+
+    # === 檔案與鎖 ===
+
+    def _open(self):
+        """開啟(或在檔案被替換後重新開啟)附加用的 fd"""
+        if self._fd is not None:
+            try:
+                same = os.fstat(self._fd).st_ino == os.stat(self.path).st_ino
+            except OSError:
+                same = False
+            if same:
+                return self._fd
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _lock(self, fd):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _acquire(self):
+        """開啟並上鎖;等待鎖的期間檔案被 rewrite() 取代時改鎖新的檔案"""
+        while True:
+            fd = self._open()
+            self._lock(fd)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except OSError:
+                pass
+            self._unlock(fd)
+
+    def _unlock(self, fd):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _repair_tail(self, fd):
+        """修復檔尾殘缺的資料列(呼叫前必須已上鎖),回傳修復的位元組數"""
+        size = os.fstat(fd).st_size
+        if size == 0 or os.pread(fd, 1, size - 1) == b'\n':
+            return 0
+
+        # 往前找到最後一個換行,之後就是殘缺的資料列
+        start = size
+        while start > 0:
+            step = min(4096, start)
+            block = os.pread(fd, step, start - step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                start = start - step + newline + 1
+                break
+            start -= step
+        tail = os.pread(fd, size - start, start)
+
+        if self._is_complete_row(tail):
+            # 只是少了換行(例如用其他程式編輯過),補上即可
+            os.write(fd, b'\r\n')
+            return 2
+        with open(self.path + TORN_SUFFIX, 'ab') as torn:
+            torn.write(tail + b'\n')
+        os.ftruncate(fd, start)
+        return len(tail)
+
+    def _is_complete_row(self, data):
+        try:
+            rows = list(csv.reader(io.StringIO(data.decode('utf-8'), newline=''), strict=True))
+        except (UnicodeDecodeError, csv.Error):
+            return False
+        return len(rows) == 1 and self.min_fields <= len(rows[0]) <= len(self.header)
+
+    def recover(self):
+        """檢查並修復檔尾殘缺的資料列,回傳修復的位元組數"""
+        with self._mutex:
+            fd = self._acquire()
+            try:
+                return self._repair_tail(fd)
+            finally:
+                self._unlock(fd)
+
+    # === 寫入 ===
+
+    def _next_id(self):
+        """新的記錄編號(必須在鎖內呼叫)"""
+        self._last_id = max(time.time_ns(), self._last_id + 1)
+        return self._last_id
+
+    def _write_locked(self, rows):
+        """上鎖後附加 rows(必要時先寫標頭),回傳 (起始位置, 寫入的資料)"""
+        with self._mutex:
+            fd = self._acquire()
+            try:
+                self._repair_tail(fd)
+                if self.id_column is not None:
+                    for row in rows:
+                        if row[self.id_column] in (None, ''):
+                            row[self.id_column] = self._next_id()
+                data = written = encode_rows(rows)
+                offset = os.fstat(fd).st_size
+                if offset == 0:
+                    header = encode_rows([self.header])
+                    data = header + data
+                    offset = len(header)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                self._unlock(fd)
+        self._sync()
+        return offset, written
+
+    def append(self, row):
+        """附加一筆資料列,回傳 (起始位置, 該列文字)"""
+        offset, data = self._write_locked([list(row)])
+        return offset, data.decode('utf-8')
+
+    def append_many(self, rows):
+        """附加多筆資料列;每 BATCH_ROWS 筆上鎖寫入一次,回傳筆數"""
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(list(row))
+            if len(batch) >= BATCH_ROWS:
+                self._write_locked(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._write_locked(batch)
+            written += len(batch)
+        return written
+
+    def rewrite(self, build):
+        """上鎖後以 build(暫存檔路徑) 寫出的新檔案原子地取代記帳檔,回傳 build 的結果
+
+        build 必須完整寫好並 fsync 暫存檔;取代前後其他寫入者都在等待鎖。
+        """
+        tmp = self.path + REWRITE_SUFFIX
+        with self._mutex:
+            fd = self._acquire()
+            try:
+                self._repair_tail(fd)
+                try:
+                    result = build(tmp)
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                _fsync_dir(self.path)
+            finally:
+                self._unlock(fd)
+        return result
+
+    # === 耐久性 ===
+
+    def _sync(self):
+        if self.durability == 'row':
+            self.flush()
+        elif self.durability == 'group':
+            with self._mutex:
+                if self._timer is not None:
+                    return  # 已排定的 fsync 會一併涵蓋這次寫入
+                wait = self.group_ms / 1000 - (time.monotonic() - self._last_sync)
+                if wait > 0:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                    return
+            self.flush()
+
+    def flush(self):
+        """立即 fsync 已寫入的資料"""
+        with self._mutex:
+            self._timer = None
+            if self._fd is not None:
+                os.fsync(self._fd)
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._mutex:
+            timer = self._timer
+        if timer is not None:
+            timer.cancel()
+            self.flush()
+        with self._mutex:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
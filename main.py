@@ -1,27 +1,33 @@
-import subprocess
+import argparse
+import importlib.util
 import sys
 import time
 import os
 
+import push_channel
+import readiness
+from supervisor import LOG_DIR, Supervisor
+
+# (程式, 視窗名稱, 參數)
+WINDOWS = [('create_pie_chart.py', '圖表視窗', []), ('input_module.py', '輸入視窗', [])]
+# 單一程序模式:圖表嵌入在輸入視窗中
+SINGLE_WINDOW = [('input_module.py', '輸入視窗', ['--with-chart'])]
+
+# 無法使用就緒通知時(Windows),啟動後等待的秒數
+FALLBACK_WAIT = 1.5
+
 def check_dependencies():
-    """檢查必要套件是否已安裝"""
+    """檢查必要套件是否已安裝(只查找,不實際匯入)"""
     print("🔍 檢查相依套件...")
     
     missing = []
     
-    try:
-        import tkcalendar
-        print("  ✓ tkcalendar 已安裝")
-    except ImportError:
-        missing.append('tkcalendar')
-        print("  ✗ tkcalendar 未安裝")
-    
-    try:
-        import matplotlib
-        print("  ✓ matplotlib 已安裝")
-    except ImportError:
-        missing.append('matplotlib')
-        print("  ✗ matplotlib 未安裝")
+    for package in ('tkcalendar', 'matplotlib'):
+        if importlib.util.find_spec(package) is not None:
+            print(f"  ✓ {package} 已安裝")
+        else:
+            missing.append(package)
+            print(f"  ✗ {package} 未安裝")
     
     if missing:
         print(f"\n⚠️  缺少套件: {', '.join(missing)}")
@@ -32,75 +38,126 @@ def check_dependencies():
     print("✅ 所有套件都已安裝\n")
     return True
 
-def main():
+def report_failure(child):
+    """顯示視窗沒有正常開啟的原因"""
+    print(f"\n❌ {child.name}啟動後立即關閉！")
+    child.finish_output()
+    if child.tail:
+        print("\n錯誤訊息：")
+        print('\n'.join(child.tail))
+    elif child.name == '輸入視窗':
+        print("可能是缺少 tkcalendar 套件，請執行: pip install tkcalendar")
+    print(f"完整記錄: {child.log_path}")
+
+def print_timings(timings):
+    """顯示各啟動階段的耗時"""
+    print("⏱️  啟動時間:")
+    for phase, seconds in timings:
+        print(f"  {phase:10s} {seconds * 1000:8.0f} ms")
+
+def launch_windows(python_exe, env, started, timings, windows=WINDOWS):
+    """啟動各個視窗,並監看到它們都被關閉;started 為 main() 開始的時間"""
+    launch_start = time.perf_counter()
+    supervisor = Supervisor(python_exe, env)
+    try:
+        run_windows(supervisor, windows, started, launch_start, timings)
+    except KeyboardInterrupt:
+        print("\n⚠️  正在關閉系統...")
+    finally:
+        supervisor.shutdown()
+    
+    print("\n👋 系統已結束。")
+
+def run_windows(supervisor, windows, started, launch_start, timings):
+    # 1. 所有視窗同時啟動,各自就緒時透過 pipe 通知
+    for script, name, args in windows:
+        try:
+            supervisor.start(name, script, args)
+        except OSError as e:
+            print(f"❌ {name}啟動失敗: {e}")
+            return
+    timings.append(("啟動程序", time.perf_counter() - launch_start))
+    
+    # 2. 等待視窗畫面出現
+    channels = supervisor.ready_channels()
+    if channels:
+        results = readiness.wait_ready(channels)
+    else:
+        time.sleep(FALLBACK_WAIT)
+        results = {name: 'exited' if child.proc.poll() is not None else FALLBACK_WAIT
+                   for name, child in supervisor.children.items()}
+    
+    failed = [name for name, result in results.items() if result == 'exited']
+    for name, result in results.items():
+        if result == 'timeout':
+            print(f"⚠️  {name}在 {readiness.READY_TIMEOUT} 秒內沒有回應,繼續等待中")
+        elif result != 'exited':
+            print(f"✅ {name}已就緒")
+            timings.append((f"{name}就緒", result))
+    
+    if failed:
+        for name in failed:
+            report_failure(supervisor.children[name])
+        supervisor.shutdown()
+        input("\n按 Enter 結束...")
+        return
+    
+    timings.append(("總計", time.perf_counter() - started))
+    print()
+    print_timings(timings)
+
+    print("\n" + "=" * 50)
+    print("✨ 系統運行中... 請在視窗中操作")
+    print("💡 若要結束，請直接關閉所有視窗")
+    print(f"📄 視窗輸出記錄在 {LOG_DIR}/ 資料夾")
+    print("=" * 50 + "\n")
+
+    # 3. 持續讀取輸出,異常結束的視窗會自動重新啟動
+    supervisor.run()
+
+def main(single=False):
     print("=" * 50)
     print("🚀 正在啟動記帳系統...")
     print("=" * 50)
     
     # 檢查套件
+    started = time.perf_counter()
     if not check_dependencies():
         input("\n按 Enter 結束...")
         return
+    timings = [("檢查套件", time.perf_counter() - started)]
     
     # 取得目前 python 執行檔的路徑
     python_exe = sys.executable
+    env = dict(os.environ)
 
-    # 1. 啟動圓餅圖視窗
-    try:
-        p_viz = subprocess.Popen(
-            [python_exe, 'create_pie_chart.py'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        print("✅ 圖表視窗已啟動")
-        time.sleep(1.5)
-    except Exception as e:
-        print(f"❌ 圖表視窗啟動失敗: {e}")
+    if single:
+        # 圖表與輸入在同一個程序中,不需要推送通道
+        launch_windows(python_exe, env, started, timings, SINGLE_WINDOW)
         return
 
-    # 2. 啟動輸入介面視窗
-    try:
-        p_input = subprocess.Popen(
-            [python_exe, 'input_module.py'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        print("✅ 輸入視窗已啟動")
-        time.sleep(0.5)
-    except Exception as e:
-        print(f"❌ 輸入視窗啟動失敗: {e}")
-        p_viz.terminate()
-        return
-    time.sleep(1)
-    
-    if p_input.poll() is not None:
-        # 程序已經結束，讀取錯誤訊息
-        stderr = p_input.stderr.read().decode('utf-8', errors='ignore')
-        print("\n❌ 輸入視窗啟動後立即關閉！")
-        if stderr:
-            print("\n錯誤訊息：")
-            print(stderr)
-        else:
-            print("可能是缺少 tkcalendar 套件，請執行: pip install tkcalendar")
-        p_viz.terminate()
-        input("\n按 Enter 結束...")
-        return
-
-    print("\n" + "=" * 50)
-    print("✨ 系統運行中... 請在視窗中操作")
-    print("💡 若要結束，請直接關閉兩個視窗")
-    print("=" * 50 + "\n")
+    # 建立輸入視窗 → 圖表的推送通道(圖表負責監聽)
+    socket_path = None
+    if push_channel.available():
+        socket_path = push_channel.new_socket_path()
+        env[push_channel.SOCKET_ENV] = socket_path
 
-    # 等待兩個視窗都被關閉
     try:
-        p_viz.wait()
-        p_input.wait()
-    except KeyboardInterrupt:
-        print("\n⚠️  正在關閉系統...")
-        p_viz.terminate()
-        p_input.terminate()
-    
-    print("\n👋 系統已結束。")
+        launch_windows(python_exe, env, started, timings)
+    finally:
+        if socket_path:
+            push_channel.remove_socket_path(socket_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="記帳系統")
+    parser.add_argument('--single', action='store_true',
+                        help="單一程序模式:圖表嵌入在輸入視窗中(較省記憶體、啟動較快)")
+    parser.add_argument('--serve', action='store_true',
+                        help="不開視窗,改為啟動本機 HTTP 儀表板(見 dashboard_server.py)")
+    parser.add_argument('--port', type=int, default=None, help="儀表板的埠號")
+    args = parser.parse_args()
+    if args.serve:
+        import dashboard_server
+        dashboard_server.serve(port=args.port)
+    else:
+        main(single=args.single)
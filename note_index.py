@@ -0,0 +1,111 @@
+import unicodedata
+from bisect import bisect_left
+
+
+def normalize(text):
+    """全形轉半形、英文轉小寫,搜尋時不分大小寫與全半形"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def _runs(text):
+    """把正規化後的文字切成 (是否為 ASCII 英數, 連續片段)"""
+    runs = []
+    current, ascii_run = [], None
+    for ch in text:
+        if not ch.isalnum():
+            kind = None
+        else:
+            kind = ch.isascii()
+        if kind != ascii_run and current:
+            runs.append((ascii_run, ''.join(current)))
+            current = []
+        ascii_run = kind
+        if kind is not None:
+            current.append(ch)
+    if current:
+        runs.append((ascii_run, ''.join(current)))
+    return runs
+
+
+def search_terms(text):
+    """查詢中的各個詞(以空白與標點分隔,已正規化)"""
+    return [run for _, run in _runs(normalize(text))]
+
+
+def tokenize(text):
+    """索引用的詞:英數字取整個單字,中文等其他文字取單字與相鄰兩字(bigram)"""
+    tokens = set()
+    for is_ascii, run in _runs(text):
+        if is_ascii:
+            tokens.add(run)
+            continue
+        tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class NoteIndex:
+    """備註的倒排索引:詞 -> 含有這個詞的備註代碼
+
+    只索引不重複的備註(同樣的備註只切詞一次),資料列與備註代碼的對應由使用者
+    自行保存;新備註以 add() 加入,不需要重建。
+    英文單字以前綴比對(「cost」可以找到「Costco」),中文以 bigram 比對後
+    再確認整段文字確實出現在備註中。
+    """
+
+    def __init__(self):
+        self.postings = {}  # 詞 -> {備註代碼}
+        self.texts = {}     # 備註代碼 -> 正規化後的備註
+        self._words = []    # 排序後的英文單字(前綴比對用)
+        self._words_dirty = False
+
+    def add(self, note_id, text):
+        """加入一個備註(已加入過的代碼直接略過)"""
+        if note_id in self.texts:
+            return
+        text = normalize(text)
+        self.texts[note_id] = text
+        for token in tokenize(text):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                if token.isascii():
+                    self._words_dirty = True
+            ids.add(note_id)
+
+    def _prefixed(self, prefix):
+        """以 prefix 開頭的所有英文單字的備註代碼"""
+        if self._words_dirty:
+            self._words = sorted(t for t in self.postings if t.isascii())
+            self._words_dirty = False
+        ids = set()
+        i = bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            ids |= self.postings[self._words[i]]
+            i += 1
+        return ids
+
+    def match(self, query):
+        """符合查詢中所有詞的備註代碼集合;查詢沒有任何詞時回傳 None"""
+        runs = _runs(normalize(query))
+        if not runs:
+            return None
+        result = None
+        for is_ascii, run in runs:
+            if is_ascii:
+                ids = self._prefixed(run)
+            elif len(run) == 1:
+                ids = self.postings.get(run, set())
+            else:
+                ids = None
+                for i in range(len(run) - 1):
+                    part = self.postings.get(run[i:i + 2], set())
+                    ids = part if ids is None else ids & part
+                    if not ids:
+                        break
+                # bigram 都出現不代表整段相連,逐一確認
+                ids = {i for i in ids if run in self.texts[i]}
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
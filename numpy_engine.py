@@ -0,0 +1,490 @@
+import argparse
+import csv
+import io
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是選用套件
+    np = None
+
+from expense_data import LedgerReader, day_number
+from record_columns import RecordColumns, StringTable
+
+# date.toordinal() 與 numpy datetime64 (1970-01-01 為 0) 的差距
+EPOCH_ORDINAL = 719163
+# 同一份資料最多快取幾組查詢條件的結果
+QUERY_CACHE_SIZE = 16
+
+
+def available():
+    """是否已安裝 NumPy"""
+    return np is not None
+
+
+def clean_category(category):
+    """移除類別前的 emoji;無效的類別回傳 None"""
+    if category is None:
+        return None
+    if ' ' in category:
+        parts = category.split()
+        return parts[-1] if parts else None
+    return category
+
+
+def month_index(days):
+    """日序號陣列轉成「自 1970-01 起的月份編號」,沒有日期的為 -1(向量化計算)"""
+    months = (days - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+    return np.where(days > 0, months.astype(np.int64), -1)
+
+
+def month_names(indexes):
+    """月份編號陣列轉成 YYYY-MM 字串列表(Python str,與 LedgerReader 相同)"""
+    return np.datetime_as_string(np.asarray(indexes).astype('datetime64[M]'), unit='M').tolist()
+
+
+def range_mask(days, valid, first, last):
+    """日期在 first ~ last(YYYY-MM-DD,含兩端)之間,或沒有日期的有效資料列"""
+    lo, hi = day_number(first), day_number(last)
+    return valid & (((days >= lo) & (days <= hi)) | (days <= 0))
+
+
+def aggregate(codes, weights, months, valid, names, filter_month=None, mask=None,
+              order_keys=None):
+    """以 bincount 依類別代碼加總
+
+    回傳 (類別總額, 篩選遮罩, 類別代碼列表);類別依在篩選結果中首次出現的順序排列,
+    與逐列讀取的結果一致。mask 為額外的篩選(日期區間、備註搜尋),
+    未指定時使用所有有效的資料列。
+    order_keys 為每列的記錄編號時,改依各類別最小的記錄編號排列
+    (有修改的記錄時,資料列順序與記錄順序不同)。
+    """
+    if mask is None:
+        mask = valid
+    if filter_month:
+        target = np.datetime64(filter_month, 'M').astype(np.int64)
+        # 沒有日期的記錄不受月份篩選影響
+        mask = mask & ((months == target) | (months < 0))
+
+    selected = codes[mask]
+    totals = np.bincount(selected, weights=weights[mask], minlength=len(names))
+    present, first = np.unique(selected, return_index=True)
+    if order_keys is not None:
+        first = np.full(len(names), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first, selected, order_keys[mask])
+        first = first[present]
+    order = present[np.argsort(first)]
+    categories = {names[code]: float(totals[code]) for code in order}
+    return categories, mask, order
+
+
+class LazyRecords(Mapping):
+    """類別 → 記錄列表;只在實際取用某個類別時才建立記錄"""
+
+    def __init__(self, categories, build):
+        self.categories = categories
+        self.build = build
+        self._cache = {}
+
+    def __getitem__(self, category):
+        if category not in self.categories:
+            raise KeyError(category)
+        if category not in self._cache:
+            self._cache[category] = self.build(category)
+        return self._cache[category]
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+
+class NumpyLedgerReader(LedgerReader):
+    """以 NumPy 陣列彙總的 CSV 讀取器
+
+    沿用 LedgerReader 的增量讀取(只解析新增的位元組),但每列只把原始欄位
+    收集到列表中;金額轉換、日期→月份、類別代碼都以整批陣列運算完成
+    (每批新資料只轉換一次),類別總額用 np.bincount 計算。
+    有修改或刪除的資料列時,同一記錄編號只保留最後一筆有效的資料列
+    (最後一筆是刪除時整筆記錄不算),與 LedgerReader 的結果相同。
+    """
+
+    def __init__(self, path):
+        if np is None:
+            raise ImportError("NumPy 引擎需要安裝 numpy: pip install numpy")
+        super().__init__(path)
+
+    def reset(self):
+        super().reset()
+        self.dates = []     # 原始日期字串
+        self.notes = []     # 原始備註
+        self.names = []     # 類別代碼 -> 類別名稱
+        self._code_of = {}
+        self._amount_strs = []    # 尚未轉換的新資料
+        self._category_strs = []
+        self._id_strs = []
+        self._has_fixes = False   # 是否出現過修改或刪除的資料列
+        self._orphans = 0         # 找不到原記錄的刪除資料列(已計入 rejected)
+        self._converted = 0       # 已轉換成陣列的筆數
+        self._chunks = []
+        self._arrays = None
+        self._days = None         # 每列的日序號(日期區間查詢用)
+        self._ids = None          # 每列的記錄編號
+        self._columns = None
+        self._cache_for = None    # _cache 所對應的陣列(資料變動後陣列重建,快取跟著失效)
+        self._cache = {}
+        # 備註代碼只在第一次搜尋時才建立,之後只轉換新增的資料列
+        self._note_table = StringTable()
+        self._note_chunks = []
+        self._noted = 0
+
+    def _parse(self, text):
+        """收集原始欄位,轉換留到查詢時整批進行"""
+        reader = csv.reader(io.StringIO(text))
+        if self.fieldnames is None:
+            self.fieldnames = next(reader, None)
+            if self.fieldnames is None:
+                return
+            index = {name: i for i, name in enumerate(self.fieldnames)}
+            self._columns = tuple(index.get(name)
+                                  for name in ('Date', 'Amount', 'Category', 'Note', 'Id'))
+
+        date_i, amount_i, cat_i, note_i, id_i = self._columns
+        width = len(self.fieldnames)
+
+        def field(row, i, default):
+            if i is None:
+                return default
+            return row[i] if i < len(row) else None
+
+        for row in reader:
+            if not row:
+                continue
+            self.rows_scanned += 1
+            row += [None] * (width - len(row))
+            self.dates.append(field(row, date_i, ''))
+            self._amount_strs.append(field(row, amount_i, None))
+            self._category_strs.append(field(row, cat_i, None))
+            self.notes.append(field(row, note_i, ''))
+            self._id_strs.append(field(row, id_i, None))
+        self._arrays = None
+
+    def _convert_pending(self):
+        """把尚未轉換的新資料轉成一批陣列"""
+        amount_i, cat_i = self._columns[1:3]
+        amounts, amount_ok = _to_float(self._amount_strs)
+
+        # 類別與日期都只對不重複的值做轉換,再以 inverse 索引展開
+        raw_cats, cat_inverse = _unique([c or '' for c in self._category_strs])
+        raw_codes = np.empty(len(raw_cats), dtype=np.int64)
+        for i, raw in enumerate(raw_cats):
+            name = clean_category(raw)
+            if name is None:
+                raw_codes[i] = -1
+                continue
+            if name not in self._code_of:
+                self._code_of[name] = len(self.names)
+                self.names.append(name)
+            raw_codes[i] = self._code_of[name]
+        codes = raw_codes[cat_inverse]
+        has_cat = np.array([c is not None for c in self._category_strs], dtype=bool)
+
+        raw_dates, date_inverse = _unique([d or '' for d in self.dates[self._converted:]])
+        days = np.array([day_number(d) for d in raw_dates], dtype=np.int64)[date_inverse]
+
+        # 沒有 Id 欄的舊版記帳檔以資料列序號作為記錄編號(與 record_id 相同)
+        ordinals = np.arange(self._converted + 1, len(self.dates) + 1, dtype=np.int64)
+        ids, id_ok = _to_int(self._id_strs, ordinals, required=self._columns[4] is not None)
+        tomb = np.array([bool(i) and not a and not c for i, a, c in
+                         zip(self._id_strs, self._amount_strs, self._category_strs)], dtype=bool)
+
+        valid = amount_ok & (codes >= 0) & has_cat & id_ok
+        # 與 LedgerReader 相同的略過原因(缺欄位的列金額也會是 None)
+        short = ~has_cat | np.array([a is None for a in self._amount_strs], dtype=bool)
+        no_id = ~id_ok & np.array([not text for text in self._id_strs], dtype=bool)
+        # 標題列沒有金額或類別欄時,LedgerReader 回報的是缺少哪一欄
+        short_reason = ('缺少欄位 Amount' if amount_i is None else
+                        '缺少欄位 Category' if cat_i is None else '欄位不足')
+        for reason, count in (('缺少記錄編號', no_id.sum()),
+                              ('記錄編號不是有效的數字', (~id_ok & ~no_id).sum()),
+                              (short_reason, (short & id_ok & ~tomb).sum()),
+                              ('金額不是有效的數字', (~amount_ok & ~short & ~tomb & id_ok).sum())):
+            if count:
+                self.rejected[reason] += int(count)
+        tomb &= id_ok
+
+        if len(ids):
+            previous = self._chunks[-1][5][-1:] if self._chunks else ids[:0]
+            if tomb.any() or (np.diff(np.concatenate([previous, ids])) <= 0).any():
+                self._has_fixes = True
+        self._chunks.append((np.where(codes < 0, 0, codes), amounts, month_index(days), valid,
+                             days, ids, tomb))
+        self._converted = len(self.dates)
+        self._amount_strs = []
+        self._category_strs = []
+        self._id_strs = []
+
+    def _build_arrays(self):
+        """回傳目前所有資料的 (類別代碼, 金額, 月份編號, 是否有效, 類別名稱)"""
+        if self._arrays is not None:
+            return self._arrays
+        if self._converted < len(self.dates):
+            self._convert_pending()
+        if self._chunks:
+            merged = tuple(np.concatenate(parts) for parts in zip(*self._chunks))
+            self._chunks = [merged]
+        else:
+            empty = np.array([], dtype=np.int64)
+            merged = (empty, empty.astype(np.float64), empty, empty.astype(bool), empty,
+                      empty, empty.astype(bool))
+        codes, amounts, months, valid, self._days, self._ids, tomb = merged
+        if self._has_fixes:
+            candidates = valid | tomb
+            orphans = int((~np.isin(self._ids[tomb], self._ids[valid])).sum())
+            if orphans != self._orphans:
+                self.rejected['找不到要刪除的記錄'] += orphans - self._orphans
+                self._orphans = orphans
+            valid = _latest_versions(self._ids, candidates) & ~tomb
+            self.dead = int(candidates.sum() - valid.sum())
+        self._arrays = (codes, amounts, months, valid, self.names)
+        return self._arrays
+
+    def recent(self, count):
+        """最近新增的 count 筆記錄,與 LedgerReader.recent 相同"""
+        codes, amounts, months, valid, names = self._build_arrays()
+        rows = np.flatnonzero(valid)
+        ids = self._ids[rows]
+        if len(rows) > count:
+            keep = np.argpartition(ids, len(rows) - count)[len(rows) - count:]
+            rows, ids = rows[keep], ids[keep]
+        rows = rows[np.argsort(ids)[::-1]]
+        return [(int(self._ids[i]), self.dates[i], float(amounts[i]), names[codes[i]],
+                 self.notes[i]) for i in rows]
+
+    def dead_rows(self):
+        self._build_arrays()
+        return self.dead
+
+    def query(self, filter_month=None):
+        """回傳 (類別總額, 類別記錄, 月份列表),與 LedgerReader.query 相同"""
+        return self._memo(('month', filter_month), lambda: self._query(filter_month=filter_month))
+
+    def query_range(self, first, last):
+        """日期區間查詢,與 LedgerReader.query_range 相同(以遮罩向量化篩選)"""
+        def run():
+            valid = self._build_arrays()[3]
+            return self._query(mask=range_mask(self._days, valid, first, last), by_total=True)
+        return self._memo(('range', first, last), run)
+
+    def _note_codes(self):
+        """每列備註在 _note_table 中的代碼(新的備註同時加入倒排索引)"""
+        if self._noted < len(self.notes):
+            raw_notes, inverse = _unique([n or '' for n in self.notes[self._noted:]])
+            ids = np.empty(len(raw_notes), dtype=np.int64)
+            for i, note in enumerate(raw_notes):
+                ids[i] = self._note_table.add(note)
+                self.note_index.add(int(ids[i]), note)
+            self._note_chunks = [np.concatenate(self._note_chunks + [ids[inverse]])]
+            self._noted = len(self.notes)
+        if not self._note_chunks:
+            return np.array([], dtype=np.int64)
+        return self._note_chunks[0]
+
+    def search(self, text, view=None, category=None):
+        """備註搜尋,與 LedgerReader.search 相同(以 np.isin 向量化篩選)"""
+        def run():
+            codes, amounts, months, valid, names = self._build_arrays()
+            mask = valid
+            note_codes = self._note_codes()  # 先把新備註加入索引
+            note_ids = self.note_index.match(text)
+            if note_ids is not None:
+                mask = mask & np.isin(note_codes, np.fromiter(note_ids, dtype=np.int64,
+                                                              count=len(note_ids)))
+            if category:
+                mask = mask & (codes == self._code_of.get(category, -1))
+            if isinstance(view, tuple):
+                return self._query(mask=range_mask(self._days, mask, *view), by_total=True)
+            return self._query(filter_month=view, mask=mask, by_total=True)
+        return self._memo(('search', text, view, category), run)
+
+    def _cached(self):
+        """目前這份資料的查詢快取;新資料、修改或刪除讓陣列重建時清空"""
+        arrays = self._build_arrays()
+        if self._cache_for is not arrays:
+            self._cache_for, self._cache = arrays, {}
+        return self._cache
+
+    def _memo(self, key, run):
+        """同一份資料、同樣條件的查詢只計算一次
+
+        類別記錄(LazyRecords)跟著快取,切換類別時重新查詢不必再從資料列建立記錄。
+        """
+        queries = self._cached().setdefault('queries', {})
+        result = queries.get(key)
+        if result is None:
+            if len(queries) >= QUERY_CACHE_SIZE:
+                del queries[next(iter(queries))]  # 丟掉最早的查詢(例如逐字輸入的搜尋)
+            result = queries[key] = run()
+        categories, records = result
+        return dict(categories), records, self.sorted_months()
+
+    def _total_rank(self):
+        """類別 -> 在不篩選的總表中的順序(與 LedgerReader.totals 的順序相同)"""
+        cache = self._cached()
+        if 'rank' not in cache:
+            codes, amounts, months, valid, names = self._build_arrays()
+            order = aggregate(codes, amounts, months, valid, names,
+                              order_keys=self._ids if self._has_fixes else None)[2]
+            cache['rank'] = {names[code]: i for i, code in enumerate(order)}
+        return cache['rank']
+
+    def _query(self, filter_month=None, mask=None, by_total=False):
+        """回傳 (類別總額, 類別記錄)
+
+        by_total 時類別依總表的順序排列(LedgerReader 的區間查詢與搜尋是走訪總表)。
+        """
+        codes, amounts, months, valid, names = self._build_arrays()
+        categories, mask, order = aggregate(codes, amounts, months, valid, names,
+                                            filter_month, mask,
+                                            self._ids if self._has_fixes else None)
+        if by_total:
+            rank = self._total_rank()
+            categories = {cat: categories[cat] for cat in sorted(categories, key=rank.get)}
+        code_of = {names[code]: code for code in order}
+
+        def build(category):
+            rows = np.flatnonzero(mask & (codes == code_of[category]))
+            return RecordColumns.from_rows((self.dates[i], float(amounts[i]), self.notes[i],
+                                            int(self._ids[i])) for i in rows)
+
+        return categories, LazyRecords(categories, build)
+
+    def sorted_months(self):
+        cache = self._cached()
+        if 'months' not in cache:
+            codes, amounts, months, valid, names = self._build_arrays()
+            present = np.unique(months[valid & (months >= 0)])
+            cache['months'] = month_names(present[::-1])
+        return list(cache['months'])
+
+
+def _unique(values):
+    """不重複的值與 inverse 索引(空列表也能處理)"""
+    if not values:
+        return [], np.array([], dtype=np.int64)
+    uniques, inverse = np.unique(np.array(values, dtype=object), return_inverse=True)
+    return list(uniques), inverse.reshape(-1)
+
+
+def _latest_versions(ids, candidates):
+    """每個記錄編號只保留最後一筆候選資料列的遮罩(修改與刪除的資料列沿用原編號)"""
+    rows = np.flatnonzero(candidates)
+    order = rows[np.argsort(ids[rows], kind='stable')]  # 同編號依資料列順序
+    sorted_ids = ids[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = sorted_ids[:-1] != sorted_ids[1:]
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[order[last]] = True
+    return mask
+
+
+def _to_int(strings, defaults, required=False):
+    """記錄編號字串轉成 int64 陣列,回傳 (數值, 是否轉換成功)
+
+    空白時使用 defaults;required 時(有 Id 欄)空白算是轉換失敗。
+    """
+    values = defaults.copy()
+    ok = np.ones(len(strings), dtype=bool)
+    for i, text in enumerate(strings):
+        if not text:
+            if required:
+                ok[i] = False
+        else:
+            try:
+                values[i] = int(text)
+            except ValueError:
+                ok[i] = False
+    return values, ok
+
+
+def _to_float(strings):
+    """字串列表轉成 float64 陣列,回傳 (數值, 是否轉換成功);規則與 float() 相同"""
+    try:
+        values = np.array(strings, dtype=np.float64)
+        # NaN 可能來自 None 或 "nan",只有這時才需要逐筆確認
+        if not np.isnan(values).any():
+            return values, np.ones(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    values = np.empty(len(strings), dtype=np.float64)
+    ok = np.ones(len(strings), dtype=bool)
+    for i, text in enumerate(strings):
+        try:
+            values[i] = float(text)
+        except (TypeError, ValueError):
+            values[i] = 0.0
+            ok[i] = False
+    return values, ok
+
+
+def aggregate_columnar(ledger, filter_month=None, span=None):
+    """直接在欄位式記帳檔的 mmap 上彙總(零複製)
+
+    span 為 (起日, 迄日) 時改以日期區間篩選。
+    回傳 (類別總額, 篩選遮罩);類別總額的順序依類別代碼。
+    """
+    views = ledger.views
+    days = np.frombuffer(views['date'], dtype=np.int32).astype(np.int64)
+    cents = np.frombuffer(views['amount'], dtype=np.int64)
+    codes = np.frombuffer(views['category'], dtype=np.uint8).astype(np.int64)
+    months = month_index(days)
+    valid = np.ones(len(days), dtype=bool)
+    names = ledger.categories
+    mask = range_mask(days, valid, *span) if span else None
+    categories, mask, order = aggregate(codes, cents, months, valid, names, filter_month, mask)
+    categories = {names[code]: categories[names[code]] / 100 for code in sorted(order)}
+    return categories, mask, months
+
+
+def check_parity(path, months=None):
+    """比對 NumPy 引擎與逐列 Python 引擎的結果,回傳差異說明列表(空列表代表一致)"""
+    python_reader = LedgerReader(path)
+    numpy_reader = NumpyLedgerReader(path)
+    python_reader.refresh()
+    numpy_reader.refresh()
+
+    problems = []
+    all_months = python_reader.sorted_months()
+    if numpy_reader.sorted_months() != all_months:
+        problems.append("月份列表不同")
+    for month in [None] + list(months or all_months):
+        expected, expected_records, _ = python_reader.query(month)
+        actual, actual_records, _ = numpy_reader.query(month)
+        if list(expected) != list(actual):
+            problems.append(f"{month or '全部'}: 類別不同 {list(expected)} != {list(actual)}")
+            continue
+        for cat in expected:
+            if abs(expected[cat] - actual[cat]) > 1e-6 * max(1.0, abs(expected[cat])):
+                problems.append(f"{month or '全部'}/{cat}: 總額不同 {expected[cat]} != {actual[cat]}")
+            if sorted(expected_records[cat].rows()) != sorted(actual_records[cat].rows()):
+                problems.append(f"{month or '全部'}/{cat}: 記錄不同")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NumPy 彙總引擎工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    check = sub.add_parser('check', help="比對 NumPy 引擎與 Python 引擎的結果")
+    check.add_argument('csv_path', nargs='?', default='expenses.csv')
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit("❌ 尚未安裝 numpy: pip install numpy")
+    problems = check_parity(args.csv_path)
+    if problems:
+        print("❌ 結果不一致:")
+        for problem in problems:
+            print(f"  - {problem}")
+        raise SystemExit(1)
+    print("✅ NumPy 引擎與 Python 引擎結果一致")
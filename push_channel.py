@@ -0,0 +1,158 @@
+import json
+import os
+import socket
+import tempfile
+
+# main.py 透過這個環境變數告訴兩個子程序 socket 的位置
+SOCKET_ENV = 'EXPENSE_PUSH_SOCKET'
+SEND_TIMEOUT = 0.2  # 圖表沒有回應時,最多讓輸入視窗等待的秒數
+
+
+def available():
+    """此平台是否支援 Unix domain socket"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def new_socket_path():
+    """建立一個只有自己能存取的暫存資料夾,回傳其中的 socket 路徑"""
+    return os.path.join(tempfile.mkdtemp(prefix='expense-'), 'push.sock')
+
+
+def remove_socket_path(path):
+    """清除 socket 檔案與它所在的暫存資料夾"""
+    for remove, target in ((os.unlink, path), (os.rmdir, os.path.dirname(path))):
+        try:
+            remove(target)
+        except OSError:
+            pass
+
+
+class PushSender:
+    """輸入視窗端:每儲存一筆就把該列推送給圖表
+
+    連線失敗或逾時就放棄這一筆(圖表會從 CSV 補讀),下次儲存時再重新連線。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+
+    @classmethod
+    def from_env(cls):
+        """依環境變數建立;未設定或不支援時回傳 None"""
+        path = os.environ.get(SOCKET_ENV)
+        if not path or not available():
+            return None
+        return cls(path)
+
+    def send(self, message):
+        """送出一筆訊息(dict),回傳是否成功"""
+        data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        for _ in range(2):  # 連線可能已經斷掉,重新連線後再試一次
+            try:
+                if self.sock is None:
+                    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self.sock.settimeout(SEND_TIMEOUT)
+                    self.sock.connect(self.path)
+                self.sock.sendall(data)
+                return True
+            except OSError:
+                self.close()
+        return False
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class PushListener:
+    """圖表端:在 Tk 事件迴圈中接收推送的記錄
+
+    on_message(message) 於每筆訊息到達時呼叫;連線中斷時呼叫 on_drop(),
+    讓圖表從 CSV 重新同步。
+    """
+
+    def __init__(self, widget, path, on_message, on_drop):
+        self.widget = widget
+        self.path = path
+        self.on_message = on_message
+        self.on_drop = on_drop
+        self.conns = {}  # fd -> (socket, 尚未收完的資料)
+
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(4)
+        self.server.setblocking(False)
+        import tkinter  # 只在 Tk 介面中使用,匯入本模組不需要 tkinter
+        widget.tk.createfilehandler(self.server.fileno(), tkinter.READABLE,
+                                    self._on_accept)
+
+    @classmethod
+    def from_env(cls, widget, on_message, on_drop):
+        """依環境變數建立;未設定、不支援或建立失敗時回傳 None"""
+        path = os.environ.get(SOCKET_ENV)
+        if not path or not available():
+            return None
+        try:
+            return cls(widget, path, on_message, on_drop)
+        except (OSError, AttributeError, RuntimeError):
+            return None
+
+    def _on_accept(self, fd, mask):
+        import tkinter
+        try:
+            conn, _ = self.server.accept()
+        except OSError:
+            return
+        conn.setblocking(False)
+        self.conns[conn.fileno()] = (conn, b'')
+        self.widget.tk.createfilehandler(conn.fileno(), tkinter.READABLE,
+                                         self._on_readable)
+
+    def _on_readable(self, fd, mask):
+        conn, pending = self.conns[fd]
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        if not data:
+            self._close_conn(fd)
+            self.on_drop()
+            return
+
+        pending += data
+        *lines, pending = pending.split(b'\n')
+        self.conns[fd] = (conn, pending)
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            self.on_message(message)
+
+    def _close_conn(self, fd):
+        conn, _ = self.conns.pop(fd)
+        self.widget.tk.deletefilehandler(fd)
+        conn.close()
+
+    def close(self):
+        """關閉所有連線並移除 socket 檔案"""
+        for fd in list(self.conns):
+            self._close_conn(fd)
+        self.widget.tk.deletefilehandler(self.server.fileno())
+        self.server.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,63 @@
+import os
+import select
+import time
+
+# main.py 透過這個環境變數告訴子程序「視窗就緒」要寫到哪個 pipe
+READY_ENV = 'EXPENSE_READY_FD'
+READY_TIMEOUT = 30  # 秒
+
+
+def available():
+    """此平台是否能把 pipe 傳給子程序(Windows 不支援 pass_fds)"""
+    return os.name == 'posix'
+
+
+def notify_when_mapped(widget):
+    """視窗第一次顯示並畫完後,通知啟動程式(單獨執行時什麼都不做)"""
+    fd = os.environ.pop(READY_ENV, None)
+    if fd is None:
+        return
+    fd = int(fd)
+    done = []
+
+    def send():
+        try:
+            os.write(fd, b'ready\n')
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def on_map(event):
+        if done or str(event.widget) != str(widget):
+            return
+        done.append(True)
+        # 等第一次重繪完成再通知
+        widget.after_idle(send)
+
+    widget.bind('<Map>', on_map, add='+')
+
+
+def wait_ready(channels, timeout=READY_TIMEOUT):
+    """等待各子程序的就緒通知
+
+    channels 為 {名稱: pipe 讀取端};回傳 {名稱: 就緒所花秒數},
+    子程序沒有通知就結束時為 'exited',逾時為 'timeout'。
+    """
+    start = time.perf_counter()
+    pending = {fd: name for name, fd in channels.items()}
+    results = {}
+    while pending:
+        remaining = timeout - (time.perf_counter() - start)
+        if remaining <= 0:
+            break
+        readable, _, _ = select.select(list(pending), [], [], remaining)
+        for fd in readable:
+            name = pending.pop(fd)
+            data = os.read(fd, 64)
+            os.close(fd)
+            results[name] = time.perf_counter() - start if data else 'exited'
+    for fd, name in pending.items():
+        os.close(fd)
+        results[name] = 'timeout'
+    return results
@@ -0,0 +1,233 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+
+class StringTable:
+    """字串表:相同的日期與備註只存一份,記錄中只保存索引"""
+
+    def __init__(self):
+        self.strings = ['']
+        self.index = {'': 0}
+
+    def add(self, text):
+        text = text or ''
+        i = self.index.get(text)
+        if i is None:
+            i = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return i
+
+
+class RecordColumns:
+    """一組記錄(例如某個月份的某個類別),以平行陣列儲存
+
+    日期與備註存成共用字串表的索引,金額存成 double,記錄編號存成 int64,
+    每筆記錄約 24 位元組;新增記錄只在陣列尾端附加,不會為每筆記錄建立物件。
+    以 date(i) / amount(i) / note(i) / record_id(i) 取值,
+    newest() / order() 取得依日期排序的索引。
+    記錄編號為 0 代表這筆記錄不能修改(例如欄位式記帳檔)。
+    """
+
+    __slots__ = ('table', 'dates', 'amounts', 'notes', 'ids', 'size')
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else StringTable()
+        self.dates = array('I')
+        self.amounts = array('d')
+        self.notes = array('I')
+        self.ids = array('q')
+        self.size = None  # 固定長度的檢視(frozen)才會設定
+
+    @classmethod
+    def from_rows(cls, rows, table=None):
+        """由 (日期, 金額, 備註) 或 (日期, 金額, 備註, 記錄編號) 建立"""
+        columns = cls(table)
+        for row in rows:
+            columns.append(*row)
+        return columns
+
+    @classmethod
+    def concat(cls, parts):
+        """依序合併多組記錄(共用同一個字串表時直接串接陣列)"""
+        table = parts[0].table if parts else None
+        merged = cls(table)
+        for part in parts:
+            if part.table is table:
+                n = len(part)
+                merged.dates.extend(islice(part.dates, n))
+                merged.amounts.extend(islice(part.amounts, n))
+                merged.notes.extend(islice(part.notes, n))
+                merged.ids.extend(islice(part.ids, n))
+            else:
+                for i, row in enumerate(part.rows()):
+                    merged.append(*row, part.ids[i])
+        return merged
+
+    def append(self, date, amount, note, record_id=0):
+        self.append_ids(self.table.add(date), amount, self.table.add(note), record_id)
+
+    def append_ids(self, date_id, amount, note_id, record_id=0):
+        """以已加入字串表的索引新增(同一筆記錄放進多組時只查一次字串表)"""
+        self.dates.append(date_id)
+        self.amounts.append(amount)
+        self.notes.append(note_id)
+        self.ids.append(record_id)
+
+    def frozen(self):
+        """目前內容的唯讀檢視:共用陣列,之後附加的記錄不會出現在檢視中
+
+        修改或刪除記錄時(rebuilt)會換成新的陣列,不會影響已經取得的檢視。
+        """
+        view = RecordColumns(self.table)
+        view.dates, view.amounts, view.notes = self.dates, self.amounts, self.notes
+        view.ids = self.ids
+        view.size = len(self)
+        return view
+
+    def take(self, positions):
+        """只包含指定位置記錄的新組合(共用字串表)"""
+        subset = RecordColumns(self.table)
+        dates, amounts, notes, ids = self.dates, self.amounts, self.notes, self.ids
+        subset.dates = array('I', [dates[i] for i in positions])
+        subset.amounts = array('d', [amounts[i] for i in positions])
+        subset.notes = array('I', [notes[i] for i in positions])
+        subset.ids = array('q', [ids[i] for i in positions])
+        return subset
+
+    def rebuilt(self, drop, extra):
+        """去掉記錄編號在 drop 中的記錄、加入 extra 後依記錄編號排列的新組合
+
+        extra 為 [(記錄編號, 日期索引, 金額, 備註索引)];共用字串表。
+        """
+        ids = self.ids
+        kept = [(ids[i], self.dates[i], self.amounts[i], self.notes[i])
+                for i in range(len(self)) if ids[i] not in drop]
+        kept.extend(extra)
+        kept.sort(key=lambda row: row[0])
+        columns = RecordColumns(self.table)
+        columns.ids = array('q', [row[0] for row in kept])
+        columns.dates = array('I', [row[1] for row in kept])
+        columns.amounts = array('d', [row[2] for row in kept])
+        columns.notes = array('I', [row[3] for row in kept])
+        return columns
+
+    def find(self, record_id):
+        """記錄編號所在的位置(記錄依編號排列,二分搜尋);不存在時回傳 None"""
+        i = bisect_left(self.ids, record_id, 0, len(self))
+        if i < len(self) and self.ids[i] == record_id:
+            return i
+        return None
+
+    def compact(self):
+        """只帶著用到的字串的獨立副本(傳給其他程序用)"""
+        compacted = RecordColumns()
+        for i, row in enumerate(self.rows()):
+            compacted.append(*row, self.ids[i])
+        return compacted
+
+    def __len__(self):
+        return len(self.amounts) if self.size is None else self.size
+
+    def __getstate__(self):
+        return (self.table, self.dates, self.amounts, self.notes, self.ids, self.size)
+
+    def __setstate__(self, state):
+        self.table, self.dates, self.amounts, self.notes, self.ids, self.size = state
+
+    # === 取值 ===
+
+    def date(self, i):
+        return self.table.strings[self.dates[i]]
+
+    def amount(self, i):
+        return self.amounts[i]
+
+    def note(self, i):
+        return self.table.strings[self.notes[i]]
+
+    def record_id(self, i):
+        return self.ids[i]
+
+    def total(self):
+        return sum(islice(self.amounts, len(self)))
+
+    def rows(self):
+        """依加入順序產生 (日期, 金額, 備註)"""
+        strings = self.table.strings
+        for date, amount, note in zip(islice(self.dates, len(self)), self.amounts, self.notes):
+            yield strings[date], amount, strings[note]
+
+    def _date_key(self):
+        strings, dates = self.table.strings, self.dates
+        return lambda i: strings[dates[i]]
+
+    def newest(self, count):
+        """日期最新的 count 筆記錄的索引(沒有日期的排在最後)"""
+        return heapq.nlargest(count, range(len(self)), key=self._date_key())
+
+    def order(self):
+        """所有記錄依日期由新到舊排列的索引"""
+        return sorted(range(len(self)), key=self._date_key(), reverse=True)
+
+    def version(self):
+        """內容識別:同一組陣列且長度相同時內容相同(快取排序結果用)"""
+        return (id(self.amounts), len(self))
+
+
+class DateIndex:
+    """依日期排序的記錄位置(日期區間查詢用)
+
+    keys 為遞增的日序號,rows 為對應記錄在 RecordColumns 中的位置。
+    日期不早於最後一筆時(最常見)直接附加在尾端;日期較早的先放進待排序區,
+    查詢時才整理:只有幾筆時以二分搜尋插入,大量時(例如第一次讀取日期
+    未排序的記帳檔)一次重新排序,避免每筆都搬移整個陣列。
+    沒有日期的記錄另外保存,任何區間都包含它們(與月份篩選相同)。
+    """
+
+    __slots__ = ('keys', 'rows', 'undated', 'pending')
+
+    INSERT_LIMIT = 64  # 待排序的記錄不超過這個數量時逐筆插入
+
+    def __init__(self):
+        self.keys = array('I')
+        self.rows = array('I')
+        self.undated = array('I')
+        self.pending = []  # 尚未排序的 (日序號, 位置)
+
+    def add(self, day, row):
+        if not day:
+            self.undated.append(row)
+            return
+        keys = self.keys
+        if not self.pending and (not keys or day >= keys[-1]):
+            keys.append(day)
+            self.rows.append(row)
+            return
+        self.pending.append((day, row))
+
+    def _settle(self):
+        """把待排序區併入 keys / rows"""
+        pending, self.pending = self.pending, []
+        keys, rows = self.keys, self.rows
+        if len(pending) <= self.INSERT_LIMIT:
+            for day, row in pending:
+                i = bisect_right(keys, day)
+                keys.insert(i, day)
+                rows.insert(i, row)
+            return
+        # 同一天的記錄依位置(加入順序)排列,與逐筆插入的結果相同
+        merged = list(zip(keys, rows))
+        merged.extend(pending)
+        merged.sort()
+        self.keys = array('I', [day for day, _ in merged])
+        self.rows = array('I', [row for _, row in merged])
+
+    def select(self, first, last):
+        """日序號 first ~ last(含兩端)的記錄位置,依日期排列,最後是沒有日期的記錄"""
+        if self.pending:
+            self._settle()
+        lo = bisect_left(self.keys, first)
+        hi = bisect_right(self.keys, last)
+        return self.rows[lo:hi] + self.undated
@@ -0,0 +1,110 @@
+import tkinter as tk
+from datetime import datetime
+from tkinter import messagebox, ttk
+
+from expense_data import CATEGORIES, parse_amount
+
+BG_COLOR = "#ffffff"
+TEXT_PRIMARY = "#1e293b"
+ACCENT_PRIMARY = "#2563eb"
+DANGER_COLOR = "#ef4444"
+FONT_LABEL = ("Arial", 10, "bold")
+FONT_INPUT = ("Arial", 11)
+
+
+def format_amount(amount):
+    """金額轉成輸入框中的文字(整數不顯示小數點)
+
+    以 repr 保留所有有效位數,只改備註再存檔時金額不會被改寫。
+    """
+    text = repr(float(amount))
+    return text[:-2] if text.endswith('.0') else text
+
+
+class RecordDialog:
+    """修改或刪除一筆記錄的對話框(輸入視窗與圖表共用)
+
+    record 為 (記錄編號, 日期, 金額, 類別, 備註)。按下「修改」時以
+    on_edit(記錄編號, 日期, 金額, 類別, 備註) 回呼,確認刪除後以 on_delete(記錄編號) 回呼,
+    實際寫入由呼叫端負責(可交給背景執行緒);回呼拋出 OSError / ValueError 時
+    顯示錯誤並保留對話框。
+    """
+
+    def __init__(self, parent, record, on_edit, on_delete):
+        self.record_id, date, amount, category, note = record
+        self.on_edit = on_edit
+        self.on_delete = on_delete
+
+        self.window = window = tk.Toplevel(parent)
+        window.title("✏️ 修改記錄")
+        window.configure(bg=BG_COLOR)
+        window.resizable(False, False)
+        window.transient(parent.winfo_toplevel())
+
+        form = tk.Frame(window, bg=BG_COLOR)
+        form.pack(fill="both", padx=24, pady=(20, 10))
+        self.date_var = tk.StringVar(value=date)
+        self.amount_var = tk.StringVar(value=format_amount(amount))
+        self.category_var = tk.StringVar(value=category)
+        self.note_var = tk.StringVar(value=note)
+
+        fields = (("📅 日期 (YYYY-MM-DD)", self.date_var),
+                  ("💵 金額", self.amount_var),
+                  ("🏷️ 類別", self.category_var),
+                  ("📝 備註", self.note_var))
+        for row, (label, var) in enumerate(fields):
+            tk.Label(form, text=label, font=FONT_LABEL, bg=BG_COLOR,
+                     fg=TEXT_PRIMARY).grid(row=row, column=0, sticky="w", pady=6)
+            if var is self.category_var:
+                values = CATEGORIES if category in CATEGORIES else CATEGORIES + [category]
+                widget = ttk.Combobox(form, textvariable=var, values=values,
+                                      state="readonly", font=FONT_INPUT, width=22)
+            else:
+                widget = tk.Entry(form, textvariable=var, font=FONT_INPUT, width=24)
+            widget.grid(row=row, column=1, sticky="ew", padx=(12, 0), pady=6)
+            if var is self.amount_var:
+                widget.focus_set()
+                widget.select_range(0, tk.END)
+
+        buttons = tk.Frame(window, bg=BG_COLOR)
+        buttons.pack(fill="x", padx=24, pady=(0, 20))
+        tk.Button(buttons, text="💾 修改", font=FONT_LABEL, bg=ACCENT_PRIMARY, fg="white",
+                  relief="flat", cursor="hand2", command=self.save).pack(side="left", ipadx=12, ipady=4)
+        tk.Button(buttons, text="🗑️ 刪除", font=FONT_LABEL, bg=DANGER_COLOR, fg="white",
+                  relief="flat", cursor="hand2", command=self.delete).pack(side="left", padx=8,
+                                                                           ipadx=12, ipady=4)
+        tk.Button(buttons, text="取消", font=FONT_LABEL, relief="flat", cursor="hand2",
+                  command=window.destroy).pack(side="right", ipadx=12, ipady=4)
+
+        window.bind("<Return>", lambda event: self.save())
+        window.bind("<Escape>", lambda event: window.destroy())
+
+    def save(self):
+        date = self.date_var.get().strip()
+        if date:
+            try:
+                datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("錯誤", "日期格式應為 YYYY-MM-DD", parent=self.window)
+                return
+        amount = self.amount_var.get().strip()
+        try:
+            parse_amount(amount)
+        except ValueError as e:
+            messagebox.showerror("錯誤", f"{e}!", parent=self.window)
+            return
+        self._run(self.on_edit, self.record_id, date, amount, self.category_var.get(),
+                  self.note_var.get().strip())
+
+    def delete(self):
+        if not messagebox.askyesno("確認", "確定要刪除這筆記錄嗎?", parent=self.window):
+            return
+        self._run(self.on_delete, self.record_id)
+
+    def _run(self, action, *args):
+        try:
+            action(*args)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("錯誤", f"存檔失敗: {e}", parent=self.window)
+            return
+        self.window.destroy()
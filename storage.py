@@ -0,0 +1,637 @@
+import argparse
+import calendar
+import csv
+import os
+import sqlite3
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+import ledger_cache
+import ledger_compact
+import numpy_engine
+from columnar_ledger import ColumnarLedger, day_to_month
+from expense_data import DATA_FILE, PARSE_ERRORS, LedgerReader, day_number, month_of, parse_row
+from ledger_writer import LedgerWriter
+from note_index import NoteIndex, search_terms
+from record_columns import DateIndex, RecordColumns, StringTable
+
+# 選擇儲存方式的環境變數,格式為「種類:路徑」,例如 sqlite:expenses.db
+STORE_ENV = 'EXPENSE_STORE'
+DEFAULT_STORE = f'csv:{DATA_FILE}'
+# 選擇彙總引擎的環境變數:python(逐列,預設)或 numpy(向量化)
+ENGINE_ENV = 'EXPENSE_ENGINE'
+ENGINES = ('python', 'numpy')
+
+# Id 為記錄編號:修改記錄時附加同一編號的新內容,刪除時附加只有編號的資料列
+CSV_HEADER = ['Date', 'Amount', 'Category', 'Note', 'Id']
+LEGACY_HEADER = CSV_HEADER[:4]  # 舊版記帳檔沒有 Id 欄,以資料列序號作為記錄編號
+
+
+def clean_category(category):
+    """移除類別前的 emoji(與 CSV 讀取時的規則相同)"""
+    return category.split()[-1] if ' ' in category else category
+
+
+def file_state(path):
+    """檔案的 (大小, 修改時間, inode);不存在時回傳 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class CsvStore:
+    """CSV 記帳檔(預設的儲存方式)
+
+    讀取端使用 LedgerReader 增量解析,寫入端經由 LedgerWriter 上鎖附加到檔尾。
+    修改與刪除也是附加資料列(見 CSV_HEADER),被取代的資料列比例過高時
+    以 maybe_compact() 壓縮。
+    """
+
+    kind = 'csv'
+    editable = True
+
+    def __init__(self, path=DATA_FILE, engine='python'):
+        self.path = path
+        self.watch_path = path
+        self.writer = LedgerWriter(path, CSV_HEADER, id_column=CSV_HEADER.index('Id'),
+                                   min_fields=len(LEGACY_HEADER))
+        if engine == 'numpy':
+            self.reader = numpy_engine.NumpyLedgerReader(path)
+        else:
+            self.reader = LedgerReader(path)
+        self._cached_offset = None  # 快取檔對應的讀取位置
+
+    def load_cache(self):
+        """從快取檔還原彙總結果,回傳 'hit' / 'grown' / 'miss'(見 ledger_cache.load)"""
+        status = ledger_cache.load(self.reader)
+        if status != 'miss':
+            self._cached_offset = self.reader.offset
+        return status
+
+    def save_cache(self):
+        """讀取位置與快取檔不同時重寫快取"""
+        if self.reader.offset != self._cached_offset and ledger_cache.save(self.reader):
+            self._cached_offset = self.reader.offset
+
+    def pending_bytes(self):
+        """記帳檔中還沒解析的位元組數(決定是否在背景載入)"""
+        state = file_state(self.path)
+        return max(0, state[0] - self.reader.offset) if state else 0
+
+    def append(self, date, amount, category, note):
+        """新增一筆記錄,回傳可推送給圖表的訊息"""
+        offset, line = self.writer.append([date, amount, category, note, None])
+        return {'offset': offset, 'line': line}
+
+    def edit(self, record_id, date, amount, category, note):
+        """修改記錄:附加同一編號的新內容,回傳可推送給圖表的訊息"""
+        self._upgrade_legacy()
+        offset, line = self.writer.append([date, amount, category, note, record_id])
+        return {'offset': offset, 'line': line}
+
+    def delete(self, record_id):
+        """刪除記錄:附加只有編號的資料列,回傳可推送給圖表的訊息"""
+        self._upgrade_legacy()
+        offset, line = self.writer.append(['', '', '', '', record_id])
+        return {'offset': offset, 'line': line}
+
+    def _upgrade_legacy(self):
+        """舊版記帳檔的標頭沒有 Id 欄,修改的資料列無法讀出編號,先壓縮成新格式"""
+        try:
+            with open(self.path, mode='r', encoding='utf-8', newline='') as file:
+                header = next(csv.reader(file), None)
+        except OSError:
+            return
+        if header and 'Id' not in header:
+            self.compact()
+
+    def compact(self):
+        """移除已刪除與被修改取代的資料列,回傳 (保留, 移除) 筆數"""
+        return ledger_compact.compact(self.path, self.writer, CSV_HEADER)
+
+    def recent(self, count):
+        """最近新增的 count 筆記錄 [(記錄編號, 日期, 金額, 類別, 備註)],由新到舊"""
+        return self.reader.recent(count)
+
+    def maybe_compact(self):
+        """被取代的資料列比例超過門檻時壓縮記帳檔,回傳是否已壓縮"""
+        if not self.reader.offset:
+            self.load_cache()
+        self.refresh()
+        if not ledger_compact.needs_compaction(self.reader.dead_rows(), self.reader.rows_scanned):
+            return False
+        self.compact()
+        return True
+
+    def append_many(self, rows):
+        """一次寫入多筆 (日期, 金額, 類別, 備註)"""
+        return self.writer.append_many([date, amount, category, note, None]
+                                       for date, amount, category, note in rows)
+
+    def apply_pushed(self, message):
+        """套用輸入視窗推送的訊息,回傳是否已套用"""
+        try:
+            return self.reader.apply_appended(int(message['offset']), message['line'])
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def refresh(self):
+        return self.reader.refresh()
+
+    def query(self, filter_month=None):
+        return self.reader.query(filter_month)
+
+    def query_range(self, first, last):
+        """first ~ last(YYYY-MM-DD,含兩端)的 (類別總額, 類別記錄, 月份列表)"""
+        return self.reader.query_range(first, last)
+
+    def search(self, text, view=None, category=None):
+        """備註含有 text 的 (類別總額, 類別記錄, 月份列表),view 同 query()/query_range()"""
+        return self.reader.search(text, view, category)
+
+    def scan_stats(self):
+        """(累計解析的資料列數, 略過原因 -> 筆數),效能監看用"""
+        return self.reader.rows_scanned, self.reader.rejected
+
+    def fingerprint(self):
+        return file_state(self.path)
+
+    def close(self):
+        self.writer.close()
+
+
+class SqliteStore:
+    """SQLite 記帳資料庫
+
+    以 WAL 模式開啟,輸入視窗寫入時圖表仍可同時讀取;
+    月份與類別都有索引,彙總交給 GROUP BY 在資料庫內完成。
+    """
+
+    kind = 'sqlite'
+    editable = True
+    # 彙總已在資料庫內完成,不使用 engine 參數
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id       INTEGER PRIMARY KEY,
+            date     TEXT NOT NULL,
+            month    TEXT,              -- YYYY-MM,日期無法解析時為 NULL
+            amount   REAL NOT NULL,
+            category TEXT NOT NULL,
+            note     TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_expenses_month ON expenses(month, category);
+        CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category, month);
+        CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+    """
+
+    def __init__(self, path='expenses.db', engine='python'):
+        self.path = path
+        self.watch_path = path + '-wal'
+        # 圖表會把 store 交給背景載入執行緒使用(同一時間只有一個執行緒存取)
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def append(self, date, amount, category, note):
+        """新增一筆記錄,回傳可推送給圖表的訊息"""
+        with self.conn:
+            cur = self.conn.execute(
+                'INSERT INTO expenses (date, month, amount, category, note) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (date, month_of(date), float(amount), clean_category(category), note))
+        return {'id': cur.lastrowid}
+
+    def append_many(self, rows):
+        """在同一個交易中新增多筆 (日期, 金額, 類別, 備註)"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO expenses (date, month, amount, category, note) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((date, month_of(date), float(amount), clean_category(category), note)
+                 for date, amount, category, note in rows))
+
+    def edit(self, record_id, date, amount, category, note):
+        """修改記錄(資料庫直接更新,不需要附加資料列)"""
+        with self.conn:
+            self.conn.execute(
+                'UPDATE expenses SET date = ?, month = ?, amount = ?, category = ?, note = ? '
+                'WHERE id = ?',
+                (date, month_of(date), float(amount), clean_category(category), note,
+                 record_id))
+        return {'id': record_id}
+
+    def delete(self, record_id):
+        """刪除記錄"""
+        with self.conn:
+            self.conn.execute('DELETE FROM expenses WHERE id = ?', (record_id,))
+        return {'id': record_id}
+
+    def recent(self, count):
+        """最近新增的 count 筆記錄 [(記錄編號, 日期, 金額, 類別, 備註)],由新到舊"""
+        return self.conn.execute(
+            'SELECT id, date, amount, category, note FROM expenses ORDER BY id DESC LIMIT ?',
+            (count,)).fetchall()
+
+    def maybe_compact(self):
+        # 資料庫自行管理空間,不需要壓縮
+        return False
+
+    def apply_pushed(self, message):
+        # 資料已在資料庫中,下一次查詢自然會看到
+        return True
+
+    def refresh(self):
+        return True
+
+    def _month_filter(self, filter_month):
+        """月份或 (起日, 迄日) 的篩選條件(沒有日期的記錄不受篩選影響,與 CSV 相同)"""
+        if not filter_month:
+            return '', ()
+        if isinstance(filter_month, tuple):
+            # 走 date 索引的區間查詢
+            return 'WHERE (date BETWEEN ? AND ? OR month IS NULL)', filter_month
+        return 'WHERE (month = ? OR month IS NULL)', (filter_month,)
+
+    def query_range(self, first, last):
+        """first ~ last(YYYY-MM-DD,含兩端)的 (類別總額, 類別記錄, 月份列表)"""
+        return self.query((first, last))
+
+    def query(self, filter_month=None):
+        """回傳 (類別總額, 類別記錄, 月份列表);類別記錄在使用時才查詢
+
+        filter_month 也可以是 (起日, 迄日),見 query_range()。
+        """
+        where, params = self._month_filter(filter_month)
+        rows = self.conn.execute(
+            f'SELECT category, SUM(amount) FROM expenses {where} '
+            f'GROUP BY category ORDER BY MIN(id)', params).fetchall()
+        categories = {cat: total for cat, total in rows}
+        months = [m for (m,) in self.conn.execute(
+            'SELECT DISTINCT month FROM expenses WHERE month IS NOT NULL '
+            'ORDER BY month DESC')]
+        return categories, CategoryRecords(self, filter_month, categories), months
+
+    def category_records(self, category, filter_month=None):
+        """單一類別的記錄(走 category 索引)"""
+        where, params = self._month_filter(filter_month)
+        where = f'{where} AND category = ?' if where else 'WHERE category = ?'
+        return RecordColumns.from_rows(self.conn.execute(
+            f'SELECT date, amount, note, id FROM expenses {where} ORDER BY id',
+            params + (category,)))
+
+    def search(self, text, view=None, category=None):
+        """備註含有 text 的 (類別總額, 類別記錄, 月份列表)
+
+        查詢中的每個詞(只有文字與數字,不含 LIKE 的萬用字元)都以 LIKE 比對;
+        符合的記錄通常不多,直接一次取出。
+        """
+        where, params = self._month_filter(view)
+        clauses = [where[len('WHERE '):]] if where else []
+        for term in search_terms(text):
+            clauses.append('note LIKE ?')
+            params += (f'%{term}%',)
+        if category:
+            clauses.append('category = ?')
+            params += (category,)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        categories, records = {}, {}
+        for cat, date, amount, note, rid in self.conn.execute(
+                f'SELECT category, date, amount, note, id FROM expenses {where} ORDER BY id',
+                params):
+            if cat not in records:
+                categories[cat] = 0
+                records[cat] = RecordColumns()
+            categories[cat] += amount
+            records[cat].append(date, amount, note, rid)
+        months = [m for (m,) in self.conn.execute(
+            'SELECT DISTINCT month FROM expenses WHERE month IS NOT NULL '
+            'ORDER BY month DESC')]
+        return categories, records, months
+
+    def scan_stats(self):
+        # 資料庫不需要逐列解析,也不會有格式錯誤的資料列
+        return 0, Counter()
+
+    # 資料庫本身就是索引,不需要彙總快取
+    def load_cache(self):
+        return 'hit'
+
+    def save_cache(self):
+        pass
+
+    def pending_bytes(self):
+        return 0
+
+    def fingerprint(self):
+        return (file_state(self.path), file_state(self.watch_path))
+
+    def close(self):
+        self.conn.close()
+
+
+class ColumnarStore:
+    """欄位式二進位記帳檔(見 columnar_ledger)
+
+    以 mmap 讀取,新增的資料列直接在固定寬度陣列上累加到
+    「月份 → 類別代碼 → 金額(分)」的彙總中,不需要解析文字。
+    """
+
+    kind = 'columnar'
+    editable = False  # 只能附加
+
+    def __init__(self, path='expenses.col', engine='python'):
+        self.path = path
+        self.engine = engine
+        self.ledger = ColumnarLedger(path)
+        # 最後寫入的 date 欄代表資料已完整寫入,監看它即可
+        self.watch_path = self.ledger._file('date.i32')
+        self.rollup = {}  # 月份 -> {類別代碼: 金額(分)}
+        self.date_index = {}  # 類別代碼 -> DateIndex(資料列依日期排序)
+        self.scanned = 0
+        self._reset_notes()
+
+    def _reset_notes(self):
+        # 備註索引在第一次搜尋時才建立,之後只加入新增的資料列
+        self.note_index = NoteIndex()
+        self._note_table = StringTable()
+        self._note_rows = {}  # 備註代碼 -> 資料列編號
+        self._noted = 0
+
+    def append(self, date, amount, category, note):
+        """新增一筆記錄,回傳可推送給圖表的訊息"""
+        self.ledger.append(date, amount, clean_category(category), note)
+        return {}
+
+    def append_many(self, rows):
+        """一次寫入多筆 (日期, 金額, 類別, 備註)"""
+        self.ledger.append_many((date, amount, clean_category(category), note)
+                                for date, amount, category, note in rows)
+
+    def edit(self, record_id, date, amount, category, note):
+        raise ValueError("欄位式記帳檔只能附加,不支援修改記錄")
+
+    def delete(self, record_id):
+        raise ValueError("欄位式記帳檔只能附加,不支援刪除記錄")
+
+    def recent(self, count):
+        raise ValueError("欄位式記帳檔的記錄沒有編號,無法修改")
+
+    def maybe_compact(self):
+        return False
+
+    def apply_pushed(self, message):
+        return True
+
+    def refresh(self):
+        """對應新寫入的資料並累加到彙總與各類別的日期索引中"""
+        if not self.ledger.refresh():
+            return False
+        if self.ledger.count < self.scanned:
+            self.rollup = {}
+            self.date_index = {}
+            self.scanned = 0
+            self._reset_notes()
+        if self.ledger.count:
+            views = self.ledger.views
+            start, end = self.scanned, self.ledger.count
+            for row, day, cents, code in zip(range(start, end), views['date'][start:end],
+                                             views['amount'][start:end],
+                                             views['category'][start:end]):
+                bucket = self.rollup.setdefault(day_to_month(day), {})
+                bucket[code] = bucket.get(code, 0) + cents
+                index = self.date_index.get(code)
+                if index is None:
+                    index = self.date_index[code] = DateIndex()
+                index.add(day, row)
+        self.scanned = self.ledger.count
+        return True
+
+    def query(self, filter_month=None):
+        """回傳 (類別總額, 類別記錄, 月份列表);類別記錄在使用時才讀取"""
+        if self.engine == 'numpy':
+            return self._query_numpy(filter_month)
+
+        totals = {}
+        for month, bucket in self.rollup.items():
+            # 沒有日期的記錄不受月份篩選影響
+            if filter_month and month and month != filter_month:
+                continue
+            for code, cents in bucket.items():
+                totals[code] = totals.get(code, 0) + cents
+        names = self.ledger.categories
+        categories = {names[code]: cents / 100 for code, cents in sorted(totals.items())}
+        months = sorted((m for m in self.rollup if m), reverse=True)
+        return categories, CategoryRecords(self, filter_month, categories), months
+
+    def query_range(self, first, last):
+        """first ~ last(YYYY-MM-DD,含兩端)的 (類別總額, 類別記錄, 月份列表)
+
+        以各類別的日期索引二分搜尋,只加總區間內的資料列;沒有日期的記錄一律包含。
+        """
+        if self.engine == 'numpy':
+            return self._query_numpy(None, (first, last))
+
+        span = (day_number(first), day_number(last))
+        totals = {}
+        if self.ledger.count:
+            amounts = self.ledger.views['amount']
+            for code, index in self.date_index.items():
+                rows = index.select(*span)
+                if rows:
+                    totals[code] = sum(amounts[i] for i in rows)
+        names = self.ledger.categories
+        categories = {names[code]: cents / 100 for code, cents in sorted(totals.items())}
+        months = sorted((m for m in self.rollup if m), reverse=True)
+        return categories, CategoryRecords(self, span, categories), months
+
+    def _query_numpy(self, filter_month, span=None):
+        """以 NumPy 直接在 mmap 上彙總"""
+        months = sorted((m for m in self.rollup if m), reverse=True)
+        if not self.ledger.count:
+            return {}, {}, months
+        categories, mask, _ = numpy_engine.aggregate_columnar(self.ledger, filter_month, span)
+        codes = numpy_engine.np.frombuffer(self.ledger.views['category'], dtype='uint8')
+
+        def build(category):
+            rows = numpy_engine.np.flatnonzero(mask & (codes == self.ledger.category_codes[category]))
+            return RecordColumns.from_rows(self.ledger.record(int(i)) for i in rows)
+
+        return categories, numpy_engine.LazyRecords(categories, build), months
+
+    def _update_note_index(self):
+        """把還沒索引的資料列備註加入倒排索引"""
+        table = self._note_table
+        for i in range(self._noted, self.ledger.count):
+            note = self.ledger.note(i)
+            note_id = table.add(note)
+            rows = self._note_rows.get(note_id)
+            if rows is None:
+                self.note_index.add(note_id, note)
+                rows = self._note_rows[note_id] = array('I')
+            rows.append(i)
+        self._noted = self.ledger.count
+
+    def search(self, text, view=None, category=None):
+        """備註含有 text 的 (類別總額, 類別記錄, 月份列表)
+
+        第一次搜尋時讀出所有備註建立索引,之後只處理新增的資料列。
+        """
+        self._update_note_index()
+        note_ids = self.note_index.match(text)
+        if note_ids is None:
+            note_ids = self._note_rows.keys()
+        rows = sorted(i for note_id in note_ids for i in self._note_rows[note_id])
+
+        code = self.ledger.category_codes.get(category) if category else None
+        span = (day_number(view[0]), day_number(view[1])) if isinstance(view, tuple) else None
+        totals, records = {}, {}
+        views = self.ledger.views if rows else {}
+        for i in rows:
+            cat, day = views['category'][i], views['date'][i]
+            if category and cat != code:
+                continue
+            if day and span and not span[0] <= day <= span[1]:
+                continue
+            if day and view and not span and day_to_month(day) != view:
+                continue
+            if cat not in totals:
+                totals[cat] = 0
+                records[cat] = RecordColumns()
+            totals[cat] += views['amount'][i]
+            records[cat].append(*self.ledger.record(i))
+        names = self.ledger.categories
+        categories = {names[code]: cents / 100 for code, cents in sorted(totals.items())}
+        months = sorted((m for m in self.rollup if m), reverse=True)
+        return categories, {names[code]: records[code] for code in sorted(records)}, months
+
+    def category_records(self, category, filter_month=None):
+        """單一類別的記錄;filter_month 也可以是日序號區間 (起, 迄)
+
+        月份換成該月第一天到最後一天的區間,再由類別的日期索引二分搜尋。
+        """
+        records = RecordColumns()
+        index = self.date_index.get(self.ledger.category_codes.get(category))
+        if index is None or not self.ledger.count:
+            return records
+        if isinstance(filter_month, tuple):
+            rows = index.select(*filter_month)
+        elif filter_month:
+            year, month = (int(part) for part in filter_month.split('-'))
+            first = day_number(f"{filter_month}-01")
+            rows = index.select(first, first + calendar.monthrange(year, month)[1] - 1)
+        else:
+            rows = index.select(1, 0xFFFFFFFF)
+        for i in rows:
+            records.append(*self.ledger.record(i))
+        return records
+
+    def scan_stats(self):
+        # 固定寬度的欄位不會有格式錯誤的資料列
+        return self.scanned, Counter()
+
+    # 彙總直接在固定寬度陣列上計算,不需要快取
+    def load_cache(self):
+        return 'hit'
+
+    def save_cache(self):
+        pass
+
+    def pending_bytes(self):
+        return 0
+
+    def fingerprint(self):
+        return file_state(self.watch_path)
+
+    def close(self):
+        self.ledger.close()
+
+
+class CategoryRecords(Mapping):
+    """類別 → 記錄列表;只在實際取用某個類別時才查詢資料庫"""
+
+    def __init__(self, store, filter_month, categories):
+        self.store = store
+        self.filter_month = filter_month
+        self.categories = categories
+        self._cache = {}
+
+    def __getitem__(self, category):
+        if category not in self.categories:
+            raise KeyError(category)
+        if category not in self._cache:
+            self._cache[category] = self.store.category_records(category, self.filter_month)
+        return self._cache[category]
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+
+STORE_TYPES = {'csv': CsvStore, 'sqlite': SqliteStore, 'columnar': ColumnarStore}
+
+
+def open_store(spec=None, engine=None):
+    """依「種類:路徑」開啟儲存後端
+
+    未指定時讀取環境變數 EXPENSE_STORE / EXPENSE_ENGINE。
+    """
+    spec = spec or os.environ.get(STORE_ENV) or DEFAULT_STORE
+    engine = engine or os.environ.get(ENGINE_ENV) or 'python'
+    kind, _, path = spec.partition(':')
+    if kind not in STORE_TYPES:
+        raise ValueError(f"未知的儲存方式: {kind}")
+    if engine not in ENGINES:
+        raise ValueError(f"未知的彙總引擎: {engine}")
+    if path:
+        return STORE_TYPES[kind](path, engine=engine)
+    return STORE_TYPES[kind](engine=engine)
+
+
+def migrate_csv_to_sqlite(csv_path, db_path):
+    """把 CSV 記帳檔一次匯入 SQLite,回傳 (匯入筆數, 略過筆數)"""
+    store = SqliteStore(db_path)
+    try:
+        if store.conn.execute('SELECT 1 FROM expenses LIMIT 1').fetchone():
+            raise ValueError(f"{db_path} 已經有資料,不重複匯入")
+
+        skipped = 0
+
+        def rows():
+            nonlocal skipped
+            # 只轉換有效的記錄(已套用修改與刪除)
+            for _, row in ledger_compact.live_rows(csv_path):
+                try:
+                    cat, _, date, amount, note = parse_row(row)
+                except PARSE_ERRORS:
+                    skipped += 1
+                    continue
+                yield date, amount, cat, note
+
+        store.append_many(rows())
+        imported = store.conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+        return imported, skipped
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="記帳資料儲存工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help="將 CSV 記帳檔匯入 SQLite")
+    migrate.add_argument('csv_path', nargs='?', default=DATA_FILE)
+    migrate.add_argument('db_path', nargs='?', default='expenses.db')
+    args = parser.parse_args()
+
+    try:
+        imported, skipped = migrate_csv_to_sqlite(args.csv_path, args.db_path)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ 匯入失敗: {e}")
+    print(f"✅ 已匯入 {imported} 筆記錄到 {args.db_path}(略過 {skipped} 筆格式錯誤的資料)")
+    print(f"💡 設定環境變數 {STORE_ENV}=sqlite:{args.db_path} 即可改用 SQLite")
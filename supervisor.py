@@ -0,0 +1,225 @@
+import logging
+import os
+import select
+import subprocess
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+import readiness
+
+LOG_DIR = 'logs'
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+STDERR_TAIL = 20           # 異常結束時顯示的最後幾行錯誤訊息
+POLL_INTERVAL = 0.2        # 秒
+RESTART_BASE_DELAY = 1.0   # 第一次重新啟動前等待的秒數,之後每次加倍
+RESTART_MAX_DELAY = 30.0
+RESTART_WINDOW = 60.0      # 這段時間內
+RESTART_LIMIT = 5          # 重新啟動超過這個次數就放棄
+STOP_TIMEOUT = 3.0
+
+
+class ChildWindow:
+    """一個視窗子程序
+
+    stdout / stderr 由背景執行緒持續讀取並寫入輪替的記錄檔,
+    輸出再多也不會塞滿 pipe 讓視窗卡住。
+    """
+
+    def __init__(self, name, script, python_exe, env, log_dir=LOG_DIR, args=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.python_exe = python_exe
+        self.env = dict(env, PYTHONUNBUFFERED='1')  # 輸出即時寫入記錄檔
+        self.proc = None
+        self.ready_fd = None
+        self.threads = []
+        self.tail = deque(maxlen=STDERR_TAIL)
+        self.restarts = deque()   # 最近幾次重新啟動的時間
+        self.restart_at = None    # 排定重新啟動的時間
+        self.closed = False       # 使用者已關閉視窗(不再重新啟動)
+
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_path = os.path.join(log_dir, os.path.splitext(script)[0] + '.log')
+        self.logger = logging.getLogger(f'expense.{os.path.splitext(script)[0]}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s [%(stream)s] %(message)s'))
+            self.logger.addHandler(handler)
+
+    def start(self):
+        """啟動程序與讀取執行緒;可使用就緒通知時會設定 ready_fd"""
+        self.tail.clear()
+        pass_fds = ()
+        env = self.env
+        ready_w = None
+        if readiness.available():
+            self.ready_fd, ready_w = os.pipe()
+            env = dict(env, **{readiness.READY_ENV: str(ready_w)})
+            pass_fds = (ready_w,)
+        try:
+            self.proc = subprocess.Popen(
+                [self.python_exe, self.script] + self.args,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                pass_fds=pass_fds
+            )
+        except Exception:
+            self.close_ready()
+            raise
+        finally:
+            # 父程序不保留寫入端,子程序結束時讀取端才會收到 EOF
+            if ready_w is not None:
+                os.close(ready_w)
+
+        self.logger.info("=== 啟動 (pid %s) ===", self.proc.pid, extra={'stream': 'main'})
+        self.threads = [
+            threading.Thread(target=self._drain, args=(self.proc.stdout, 'stdout'), daemon=True),
+            threading.Thread(target=self._drain, args=(self.proc.stderr, 'stderr'), daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _drain(self, pipe, stream):
+        with pipe:
+            for line in iter(pipe.readline, b''):
+                text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+                self.logger.info(text, extra={'stream': stream})
+                if stream == 'stderr':
+                    self.tail.append(text)
+
+    def close_ready(self):
+        if self.ready_fd is not None:
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+    def finish_output(self, timeout=1.0):
+        """等待讀取執行緒把剩下的輸出寫完(程序結束後使用)"""
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def schedule_restart(self, now):
+        """依最近的重新啟動次數決定等待時間;次數太多時回傳 None(放棄)"""
+        while self.restarts and now - self.restarts[0] > RESTART_WINDOW:
+            self.restarts.popleft()
+        if len(self.restarts) >= RESTART_LIMIT:
+            return None
+        delay = min(RESTART_MAX_DELAY, RESTART_BASE_DELAY * 2 ** len(self.restarts))
+        self.restarts.append(now)
+        self.restart_at = now + delay
+        return delay
+
+
+class Supervisor:
+    """管理所有視窗子程序:持續讀取輸出、偵測異常結束並延遲重新啟動
+
+    視窗被使用者關閉(結束代碼 0)時不會重新啟動;所有視窗都關閉後 run() 返回。
+    """
+
+    def __init__(self, python_exe, env, log_dir=LOG_DIR):
+        self.python_exe = python_exe
+        self.env = env
+        self.log_dir = log_dir
+        self.children = {}
+
+    def start(self, name, script, args=()):
+        child = ChildWindow(name, script, self.python_exe, self.env, self.log_dir, args)
+        self.children[name] = child
+        child.start()
+        return child
+
+    def ready_channels(self):
+        """{名稱: 就緒通知讀取端},交給 readiness.wait_ready 後由它關閉"""
+        channels = {}
+        for name, child in self.children.items():
+            if child.ready_fd is not None:
+                channels[name] = child.ready_fd
+                child.ready_fd = None
+        return channels
+
+    def run(self):
+        """監看子程序直到所有視窗都被關閉"""
+        while True:
+            now = time.monotonic()
+            alive = False
+            for child in self.children.values():
+                if child.closed:
+                    continue
+                alive = True
+                if child.restart_at is not None:
+                    if now >= child.restart_at:
+                        self._restart(child)
+                    continue
+                code = child.proc.poll()
+                if code is None:
+                    continue
+                child.finish_output()
+                if code == 0:
+                    print(f"👋 {child.name}已關閉")
+                    child.closed = True
+                    child.close_ready()
+                    continue
+                self._on_crash(child, code, now)
+            if not alive:
+                return
+            self._wait_ready_messages(POLL_INTERVAL)
+
+    def _on_crash(self, child, code, now):
+        child.close_ready()
+        print(f"\n⚠️  {child.name}異常結束(結束代碼 {code}),記錄檔: {child.log_path}")
+        for line in list(child.tail)[-5:]:
+            print(f"    {line}")
+        delay = child.schedule_restart(now)
+        if delay is None:
+            print(f"❌ {child.name}在 {RESTART_WINDOW:.0f} 秒內重新啟動超過 {RESTART_LIMIT} 次,不再重試")
+            child.closed = True
+        else:
+            print(f"🔄 {delay:.1f} 秒後重新啟動{child.name}")
+
+    def _restart(self, child):
+        child.restart_at = None
+        try:
+            child.start()
+        except OSError as e:
+            print(f"❌ {child.name}重新啟動失敗: {e}")
+            child.closed = True
+
+    def _wait_ready_messages(self, timeout):
+        """等待重新啟動的視窗送出就緒通知(同時作為主迴圈的間隔)"""
+        fds = {child.ready_fd: child for child in self.children.values()
+               if child.ready_fd is not None}
+        if not fds:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select(list(fds), [], [], timeout)
+        for fd in readable:
+            child = fds[fd]
+            if os.read(fd, 64):
+                print(f"✅ {child.name}已重新啟動")
+            child.close_ready()
+
+    def shutdown(self):
+        """結束所有仍在執行的視窗:同時 terminate,逾時再 kill"""
+        running = [child for child in self.children.values()
+                   if child.proc is not None and child.proc.poll() is None]
+        for child in running:
+            child.proc.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for child in running:
+            try:
+                child.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                child.proc.kill()
+                child.proc.wait()
+        for child in self.children.values():
+            child.close_ready()
+            child.finish_output()
+            for handler in child.logger.handlers:
+                handler.flush()
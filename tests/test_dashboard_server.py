@@ -0,0 +1,121 @@
+"""在本機啟動儀表板伺服器(埠號 0),以 HTTP 要求檢查回應與 ETag"""
+import http.client
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+pytest.importorskip('matplotlib')
+
+from dashboard_server import Dashboard, DashboardServer  # noqa: E402
+from ledger_writer import LedgerWriter  # noqa: E402
+from storage import CSV_HEADER, open_store  # noqa: E402
+
+ROWS = [
+    ('2024-01-05', '120', '食物', '午餐'),
+    ('2024-01-20', '60', '交通', '公車'),
+    ('2024-02-03', '300', '娛樂', '電影'),
+    ('2024-02-10', '80', '食物', '咖啡'),
+]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    writer = LedgerWriter(str(tmp_path / 'expenses.csv'), CSV_HEADER,
+                          id_column=CSV_HEADER.index('Id'))
+    for row in ROWS:
+        writer.append(row + ('',))
+    yield writer
+    writer.close()
+
+
+@pytest.fixture
+def server(ledger):
+    dashboard = Dashboard(open_store(f'csv:{ledger.path}'))
+    server = DashboardServer(dashboard, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    dashboard.close()
+
+
+def request(server, path, headers=None):
+    """回傳 (狀態碼, 標頭, 內容)"""
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request('GET', path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+
+def get_json(server, path):
+    status, headers, body = request(server, path)
+    assert status == 200
+    assert headers['Content-Type'].startswith('application/json')
+    return json.loads(body)
+
+
+def test_summary_and_months(server):
+    summary = get_json(server, '/api/summary')
+    assert summary['total'] == pytest.approx(560)
+    assert [c['name'] for c in summary['categories']] == ['食物', '交通', '娛樂']
+    assert summary['months'] == ['2024-02', '2024-01']
+
+    february = get_json(server, '/api/summary?month=2024-02')
+    assert {c['name']: c['amount'] for c in february['categories']} == {'娛樂': 300, '食物': 80}
+    assert get_json(server, '/api/months') == {'months': ['2024-02', '2024-01']}
+
+    ranged = get_json(server, '/api/summary?from=2024-01-10&to=2024-02-05')
+    assert ranged['total'] == pytest.approx(360)
+
+
+def test_category_records(server):
+    food = get_json(server, '/api/categories/' + quote('食物'))
+    assert food['count'] == 2
+    assert food['total'] == pytest.approx(200)
+    # 依日期由新到舊
+    assert [r['note'] for r in food['records']] == ['咖啡', '午餐']
+
+    page = get_json(server, '/api/categories/' + quote('食物') + '?limit=1&offset=1')
+    assert [r['date'] for r in page['records']] == ['2024-01-05']
+
+
+def test_errors(server):
+    assert request(server, '/api/summary?month=2024-13')[0] == 400
+    assert request(server, '/api/summary?from=2024-02-01&to=2024-01-01')[0] == 400
+    assert request(server, '/api/categories/' + quote('不存在'))[0] == 404
+    status, headers, body = request(server, '/nope')
+    assert status == 404
+    assert 'error' in json.loads(body)
+
+
+def test_chart_image(server):
+    status, headers, body = request(server, '/chart.png?month=2024-01')
+    assert status == 200
+    assert headers['Content-Type'] == 'image/png'
+    assert body.startswith(b'\x89PNG')
+
+
+def test_etag_not_modified_until_append(server, ledger):
+    status, headers, body = request(server, '/api/summary')
+    etag = headers['ETag']
+    assert status == 200 and etag
+
+    status, headers, body = request(server, '/api/summary', {'If-None-Match': etag})
+    assert status == 304
+    assert body == b''
+    assert headers['ETag'] == etag
+
+    # 不同的要求有不同的 ETag
+    assert request(server, '/api/summary?month=2024-01')[1]['ETag'] != etag
+
+    ledger.append(('2024-02-15', '40', '交通', '捷運', ''))
+    status, headers, body = request(server, '/api/summary', {'If-None-Match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert json.loads(body)['total'] == pytest.approx(600)
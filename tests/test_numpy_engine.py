@@ -0,0 +1,149 @@
+"""NumPy 引擎與逐列 Python 引擎(LedgerReader)的結果必須相同"""
+import pytest
+
+pytest.importorskip('numpy')
+
+from expense_data import LedgerReader  # noqa: E402
+from numpy_engine import NumpyLedgerReader, check_parity  # noqa: E402
+
+HEADER = 'Date,Amount,Category,Note,Id\n'
+
+# 第一批:格式錯誤的金額、沒有日期、欄位不足、空白的記錄編號
+BASE_ROWS = [
+    '2024-01-05,120,🍔 食物,午餐,1',
+    '2024-01-06,abc,食物,壞金額,2',
+    ',50,交通,沒有日期,3',
+    '2024-02-10,300,娛樂,電影,4',
+    '2024-02-11,80,食物,咖啡,5',
+    '2024-01-07,20',
+    '2024-03-01,60,交通,公車,6',
+    '2024-02-12,90,食物,咖啡 拿鐵,7',
+    '2024-03-03,10,交通,空白編號,',
+    '2024-03-04,15,其他,咖啡豆,8',
+]
+
+# 第二批:修改(同一編號的新內容,含換類別、換月份)、刪除、找不到原記錄的刪除
+FIX_ROWS = [
+    '2024-03-02,130,食物,午餐 改,1',
+    '2024-02-11,85,交通,咖啡,5',
+    ',,,,4',
+    ',,,,99',
+    '2024-04-01,40,娛樂,桌遊,9',
+]
+
+RANGES = [('2024-01-01', '2024-01-31'), ('2024-02-11', '2024-03-02'), ('2025-01-01', '2025-12-31')]
+SEARCHES = [('咖啡', None, None), ('咖啡', '2024-02', None), ('', None, '食物'),
+            ('午餐', ('2024-03-01', '2024-03-31'), None), ('不存在', None, None)]
+
+
+def write_ledger(path, rows, header=HEADER, mode='w'):
+    with open(path, mode, encoding='utf-8', newline='') as file:
+        if mode == 'w':
+            file.write(header)
+        file.write(''.join(row + '\n' for row in rows))
+
+
+def records_of(result):
+    categories, records, months = result
+    return {cat: sorted(records[cat].rows()) for cat in categories}
+
+
+def assert_same(expected, actual):
+    """比對兩個 (類別總額, 類別記錄, 月份列表);類別順序也必須相同"""
+    assert list(actual[0]) == list(expected[0])
+    assert actual[0] == pytest.approx(expected[0])
+    assert records_of(actual) == records_of(expected)
+    assert actual[2] == expected[2]
+
+
+def assert_parity(path):
+    python_reader = LedgerReader(path)
+    numpy_reader = NumpyLedgerReader(path)
+    python_reader.refresh()
+    numpy_reader.refresh()
+    compare(python_reader, numpy_reader)
+    return python_reader, numpy_reader
+
+
+def compare(python_reader, numpy_reader):
+    months = python_reader.sorted_months()
+    assert numpy_reader.sorted_months() == months
+    assert all(type(month) is str for month in numpy_reader.sorted_months())
+    for month in [None] + months:
+        assert_same(python_reader.query(month), numpy_reader.query(month))
+    for first, last in RANGES:
+        assert_same(python_reader.query_range(first, last), numpy_reader.query_range(first, last))
+    for text, view, category in SEARCHES:
+        expected = python_reader.search(text, view, category)
+        actual = numpy_reader.search(text, view, category)
+        assert list(actual[0]) == list(expected[0])
+        assert actual[0] == pytest.approx(expected[0])
+        assert records_of(actual) == records_of(expected)
+    assert numpy_reader.rejected == python_reader.rejected
+    assert numpy_reader.recent(5) == python_reader.recent(5)
+    assert numpy_reader.dead_rows() == python_reader.dead_rows()
+
+
+def test_parity_with_bad_and_undated_rows(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, BASE_ROWS)
+    python_reader, _ = assert_parity(str(path))
+    assert sum(python_reader.rejected.values()) == 3
+    assert python_reader.query()[0]['交通'] == pytest.approx(110)
+
+
+def test_parity_with_corrections_and_tombstones(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, BASE_ROWS + FIX_ROWS)
+    python_reader, _ = assert_parity(str(path))
+    assert '娛樂' in python_reader.query()[0]
+    assert python_reader.query('2024-02')[0].get('娛樂') is None
+    assert python_reader.dead_rows() == 5  # 4 筆被取代或刪除的資料列,加上找不到原記錄的刪除列
+    assert python_reader.rejected['找不到要刪除的記錄'] == 1
+
+
+def test_parity_after_incremental_refresh(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, BASE_ROWS)
+    python_reader, numpy_reader = assert_parity(str(path))
+    write_ledger(path, FIX_ROWS, mode='a')
+    python_reader.refresh()
+    numpy_reader.refresh()
+    compare(python_reader, numpy_reader)
+
+
+def test_parity_with_legacy_header(tmp_path):
+    # 舊版記帳檔沒有 Id 欄,以資料列序號作為記錄編號
+    path = tmp_path / 'expenses.csv'
+    rows = [row.rsplit(',', 1)[0] for row in BASE_ROWS if row.count(',') == 4]
+    write_ledger(path, rows, header='Date,Amount,Category,Note\n')
+    assert_parity(str(path))
+
+
+def test_parity_with_missing_columns(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, ['2024-01-05,120,1', '2024-01-06,80,2'], header='Date,Amount,Id\n')
+    python_reader, _ = assert_parity(str(path))
+    assert python_reader.rejected['缺少欄位 Category'] == 2
+
+
+def test_check_parity_reports_no_problems(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, BASE_ROWS + FIX_ROWS)
+    assert check_parity(str(path)) == []
+
+
+def test_category_records_are_cached_until_the_ledger_changes(tmp_path):
+    path = tmp_path / 'expenses.csv'
+    write_ledger(path, BASE_ROWS)
+    reader = NumpyLedgerReader(str(path))
+    reader.refresh()
+    first = reader.query('2024-02')[1]['食物']
+    assert reader.query('2024-02')[1]['食物'] is first
+    assert reader.query_range('2024-02-01', '2024-02-29')[1]['食物'] is not first
+
+    write_ledger(path, ['2024-02-20,30,食物,晚餐,10'], mode='a')
+    reader.refresh()
+    records = reader.query('2024-02')[1]['食物']
+    assert records is not first
+    assert len(records) == len(first) + 1